@@ -0,0 +1,49 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Decode/encode time of large list responses per JSON codec:
+#
+#   python -m benchmarks.bench_codec [count]
+
+import sys
+
+from benchmarks.common import bench
+from benchmarks.common import dns_record
+from benchmarks.common import ipam_record
+from benchmarks.common import list_response
+
+from menandmice.codec import get_codec
+from menandmice.codec import orjson
+
+
+def main(count=20000):
+    codecs = [get_codec('json')]
+    if orjson is not None:
+        codecs.append(get_codec('orjson'))
+    else:
+        print("orjson is not installed, only the json module is measured")
+    for key, make in (('ipamRecords', ipam_record), ('dnsRecords', dns_record)):
+        response = list_response(key, make, count)
+        body = get_codec('json').dumps_bytes(response)
+        print("{0}: {1} records, {2} bytes".format(key, count, len(body)))
+        for codec in codecs:
+            bench("  {0} loads".format(codec.name), lambda: codec.loads(body))
+            bench("  {0} dumps".format(codec.name), lambda: codec.dumps_bytes(response))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,60 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Memory and build time of entities vs compact records (Python 3):
+#
+#   python -m benchmarks.bench_compact [count]
+
+import gc
+import sys
+import tracemalloc
+
+from benchmarks.common import bench
+from benchmarks.common import dns_record
+from benchmarks.common import ipam_record
+
+from menandmice.compact import compact_class
+from menandmice.dns import DNSRecord
+from menandmice.ipam import IPAMRecord
+
+
+def measure(factory, rows):
+    # bytes allocated by the entities themselves, the decoded rows they are
+    # built from are shared by both modes and not counted
+    gc.collect()
+    tracemalloc.start()
+    entities = [factory(row) for row in rows]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del entities
+    return size
+
+
+def main(count=100000):
+    for entity_class, make in ((IPAMRecord, ipam_record), (DNSRecord, dns_record)):
+        rows = [make(i) for i in range(count)]
+        print("{0}: {1} records".format(entity_class.__name__, count))
+        for name, factory in (("entity", entity_class),
+                              ("compact", compact_class(entity_class))):
+            size = measure(factory, rows)
+            print("  {0:<38} {1:10.1f} MB ({2} bytes/record)".format(
+                name + " memory", size / 1e6, size // count))
+            bench("  {0} build".format(name), lambda: [factory(row) for row in rows], 1)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,64 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Building a RangeIndex and resolving addresses against it:
+#
+#   python -m benchmarks.bench_rangeindex [subnets] [lookups]
+
+import random
+import sys
+
+from benchmarks.common import bench
+
+from menandmice.addresses import int_to_address
+from menandmice.rangeindex import RangeIndex
+
+
+def make_ranges(count):
+    # a 10.0.0.0/8 container with /16 blocks holding /24 subnets
+    ranges = [{'ref': "Ranges/0", 'from': "10.0.0.0", 'to': "10.255.255.255"}]
+    for block in range(256):
+        ranges.append({'ref': "Ranges/b{0}".format(block),
+                       'from': "10.{0}.0.0".format(block),
+                       'to': "10.{0}.255.255".format(block),
+                       'parentRef': "Ranges/0"})
+    for i in range(count):
+        ranges.append({'ref': "Ranges/{0}".format(i + 1),
+                       'from': "10.{0}.{1}.0".format(i >> 8 & 255, i & 255),
+                       'to': "10.{0}.{1}.255".format(i >> 8 & 255, i & 255),
+                       'parentRef': "Ranges/b{0}".format(i >> 8 & 255)})
+    return ranges
+
+
+def main(count=50000, lookups=200000):
+    ranges = make_ranges(count)
+    rng = random.Random(1)
+    addresses = [int_to_address(4, 0x0A000000 + rng.randrange(2 ** 24)) for _ in range(lookups)]
+    print("{0} ranges, {1} lookups".format(len(ranges), lookups))
+
+    def build():
+        index = RangeIndex(ranges)
+        index.segments(4)
+        return index
+
+    bench("build", build, 1)
+    index = build()
+    bench("lookup", lambda: [index.lookup_ref(address) for address in addresses], 1)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,67 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Payload sanitizing of a DNSRecords.add() batch:
+#
+#   python -m benchmarks.bench_sanitize [count]
+
+import copy
+import sys
+
+from benchmarks.common import bench
+
+from menandmice.client import strip_empty
+from menandmice.dns import DNSRecord
+
+
+def legacy_sanitize(value):
+    # the previous in-place sanitizer (iterating over a copy of the items so
+    # it runs on Python 3), callers had to deepcopy to keep their objects
+    if isinstance(value, list):
+        for idx, item in enumerate(value):
+            if isinstance(item, (list, dict)):
+                value[idx] = legacy_sanitize(item)
+        return [x for x in value if x]
+    for k, v in list(value.items()):
+        if not v:
+            del value[k]
+        elif isinstance(v, (list, dict)):
+            value[k] = legacy_sanitize(v)
+    return value
+
+
+def main(count=10000):
+    records = [DNSRecord(name="host{0}".format(i),
+                         type="A",
+                         data="10.0.{0}.{1}".format(i >> 8 & 255, i & 255),
+                         dnsZoneRef="DNSZones/1")
+               for i in range(count)]
+    clean = [dict((k, v) for k, v in r.items() if v is not None) for r in records]
+    print("DNSRecords.add() payload with {0} records".format(count))
+    for name, batch in (("entities", records), ("already clean", clean)):
+        payload = {"saveComment": "",
+                   "autoAssignRangeRef": "",
+                   "dnsZoneRef": "",
+                   "forceOverrideOfNamingConflictCheck": "",
+                   "dnsRecords": batch}
+        bench("  {0}: deepcopy + legacy".format(name),
+              lambda: legacy_sanitize(copy.deepcopy(payload)))
+        bench("  {0}: strip_empty".format(name), lambda: strip_empty(payload))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,72 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import timeit
+
+
+def ipam_record(i):
+    return {
+        "addrRef": "IPAMRecords/{0}".format(i),
+        "address": "10.{0}.{1}.{2}".format(i >> 16 & 255, i >> 8 & 255, i & 255),
+        "claimed": bool(i % 2),
+        "dnsHosts": [{"dnsRecord": {"ref": "DNSRecords/{0}".format(i),
+                                    "name": "host{0}".format(i),
+                                    "type": "A",
+                                    "ttl": None,
+                                    "data": "10.0.0.1",
+                                    "enabled": True,
+                                    "dnsZoneRef": "DNSZones/1"},
+                      "ptrStatus": "OK"}],
+        "dhcpReservations": [],
+        "dhcpLeases": [],
+        "discoveryType": "None",
+        "lastSeenDate": "",
+        "lastDiscoveryDate": "",
+        "lastKnownClientIdentifier": "",
+        "device": "",
+        "interface": "",
+        "ptrStatus": "OK",
+        "extraneousPTR": False,
+        "customProperties": {"Owner": "team{0}".format(i % 10), "Location": ""},
+        "state": "Assigned",
+        "usage": 9,
+    }
+
+
+def dns_record(i):
+    return {
+        "ref": "DNSRecords/{0}".format(i),
+        "name": "host{0}".format(i),
+        "type": "A",
+        "ttl": None,
+        "data": "10.{0}.{1}.{2}".format(i >> 16 & 255, i >> 8 & 255, i & 255),
+        "comment": "",
+        "enabled": True,
+        "aging": 0,
+        "dnsZoneRef": "DNSZones/1",
+    }
+
+
+def list_response(key, make, count):
+    return {"result": {key: [make(i) for i in range(count)], "totalResults": count}}
+
+
+def bench(name, func, number=5, repeat=3):
+    # best of 'repeat' runs, in milliseconds per call
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    print("{0:<40} {1:10.2f} ms".format(name, best * 1000))
+    return best
@@ -0,0 +1,93 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# IPv4 and IPv6 addresses as integers.
+#
+# The local range and address structures (rangeindex, ...) keep addresses as
+# (version, integer) and ranges as inclusive (first, last) integer bounds, so
+# both address families are compared and stored the same way.
+
+import socket
+import struct
+
+from past.builtins import basestring
+
+BITS = {4: 32, 6: 128}
+MAX_ADDRESS = {4: 2 ** 32 - 1, 6: 2 ** 128 - 1}
+
+
+def address_version(address):
+    return 6 if ':' in address else 4
+
+
+def address_to_int(address):
+    # returns (version, integer)
+    if ':' in address:
+        hi, lo = struct.unpack('!QQ', socket.inet_pton(socket.AF_INET6, address))
+        return 6, hi << 64 | lo
+    return 4, struct.unpack('!I', socket.inet_aton(address))[0]
+
+
+def int_to_address(version, value):
+    if version == 6:
+        return socket.inet_ntop(socket.AF_INET6,
+                                struct.pack('!QQ', value >> 64, value & 0xFFFFFFFFFFFFFFFF))
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+def prefix_bounds(version, value, prefix_length):
+    # (first, last) of the prefix_length network containing value
+    host_bits = BITS[version] - prefix_length
+    if host_bits < 0:
+        raise ValueError("Invalid IPv{0} prefix length: {1}".format(version, prefix_length))
+    first = value >> host_bits << host_bits
+    return first, first + (1 << host_bits) - 1
+
+
+def parse_subnet(subnet):
+    # "10.0.0.0/8" -> (version, first, last), a plain address is a /32 or /128
+    address, _, prefix_length = subnet.partition('/')
+    version, value = address_to_int(address.strip())
+    if not prefix_length:
+        return version, value, value
+    first, last = prefix_bounds(version, value, int(prefix_length))
+    return version, first, last
+
+
+def range_bounds(range_):
+    # (version, first, last) of a Range or AddressBlock (any mapping with
+    # 'from' and 'to', or named "address/prefix"), or of a subnet string
+    if isinstance(range_, basestring):
+        return parse_subnet(range_)
+    start = range_.get('from')
+    end = range_.get('to')
+    if start and end:
+        version, first = address_to_int(start)
+        end_version, last = address_to_int(end)
+        if end_version != version:
+            raise ValueError("Range mixes IPv4 and IPv6: {0} - {1}".format(start, end))
+        return version, first, last
+    # 'subnet' is a flag on ranges, subnets are named after their prefix
+    for key in ('subnet', 'name'):
+        value = range_.get(key)
+        if isinstance(value, basestring) and '/' in value:
+            return parse_subnet(value)
+    raise ValueError("Range has neither from/to nor a prefix: {0!r}".format(range_))
+
+
+def format_bounds(version, first, last):
+    return int_to_address(version, first), int_to_address(version, last)
@@ -0,0 +1,954 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# asyncio version of menandmice.client.Client (Python 3 only).
+#
+# Requires the optional 'aiohttp' package:
+#
+#   from menandmice.aio import AsyncClient
+#
+#   async with AsyncClient(server, username, password) as client:
+#       zones = await client.DNSZones.get()
+#
+# The async services subclass the sync services, so they return the same entity
+# classes and raise the same requests.exceptions.HTTPError on errors. Service
+# methods that only hand off to the client (delete, update, set_access, ...)
+# are inherited as-is and return an awaitable, everything that post-processes
+# a response is overridden below as a coroutine.
+
+import asyncio
+import logging
+
+import aiohttp
+import requests
+
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from urllib.parse import urlparse
+
+from menandmice.base import DEFAULT_PAGE_SIZE
+from menandmice.base import collect_many
+from menandmice.base import raw_entity
+from menandmice.cache import changed_by
+from menandmice.cache import copy_json
+from menandmice.codec import resolve_codec
+from menandmice.columnar import ColumnarResult
+from menandmice.columnar import DNS_RECORD_COLUMNS
+from menandmice.columnar import IPAM_RECORD_COLUMNS
+from menandmice.client import Client
+from menandmice.client import Event
+from menandmice.client import ObjectAccess
+from menandmice.client import PropertyDefinition
+from menandmice.concurrency import DEFAULT_MAX_WORKERS
+from menandmice.retry import RetryPolicy
+from menandmice.streaming import JSONArrayParser
+from menandmice.streaming import STREAM_CHUNK_SIZE
+
+from menandmice.dns import DNSGenerateDirective
+from menandmice.dns import DNSRecord
+from menandmice.dns import DNSRecords
+from menandmice.dns import DNSViews
+from menandmice.dns import DNSZone
+from menandmice.dns import DNSZones
+
+from menandmice.ipam import AddressBlock
+from menandmice.ipam import ChangeRequests
+from menandmice.ipam import Devices
+from menandmice.ipam import Folders
+from menandmice.ipam import GetRangeStatisticsResponse
+from menandmice.ipam import Interfaces
+from menandmice.ipam import IPAMRecord
+from menandmice.ipam import IPAMRecords
+from menandmice.ipam import Range
+from menandmice.ipam import Ranges
+
+from menandmice.users import Group
+from menandmice.users import Groups
+from menandmice.users import Role
+from menandmice.users import Roles
+from menandmice.users import User
+from menandmice.users import Users
+
+
+class AsyncBaseService(object):
+
+    async def get(self, obj_or_ref="", **kwargs):
+        ref = self.ref_or_raise(obj_or_ref, self.ref_key)
+        query_string = self.make_query_str(**kwargs)
+        if self.get_is_singular or ref:
+            response = await self.client.get("{0}{1}{2}".format(self.client.baseurl,
+                                                                ref,
+                                                                query_string))
+            return [self.build(response['result'][self.get_response_entity_key])]
+        response = await self.client.get("{0}{1}{2}".format(self.client.baseurl,
+                                                            self.url_base,
+                                                            query_string))
+        return [self.build(entity) for entity in response['result'][self.get_response_all_key]]
+
+    async def get_list(self, url, key, entity_class):
+        response = await self.client.get(url)
+        factory = self.entity_factory(entity_class)
+        return [factory(entity) for entity in response['result'][key]]
+
+    async def iter_list(self,
+                        path,
+                        response_key,
+                        entity_class,
+                        page_size=DEFAULT_PAGE_SIZE,
+                        stream=False,
+                        **kwargs):
+        # async generator version of BaseService.iter_list()
+        if entity_class is None:
+            entity_class = raw_entity
+        entity_class = self.entity_factory(entity_class)
+        offset = kwargs.pop('offset', 0)
+        limit = kwargs.pop('limit', None)
+        yielded = 0
+        while limit is None or yielded < limit:
+            if page_size is None:
+                count = limit
+            elif limit is None:
+                count = page_size
+            else:
+                count = min(page_size, limit - yielded)
+            query = dict(kwargs)
+            if offset:
+                query['offset'] = offset
+            if count is not None:
+                query['limit'] = count
+            url = "{0}{1}{2}".format(self.client.baseurl, path, self.make_query_str(**query))
+            total = None
+            received = 0
+            if stream:
+                async for entity in self.client.get_stream(url, response_key):
+                    received += 1
+                    yield entity_class(entity)
+            else:
+                response = await self.client.get(url)
+                if not isinstance(response, dict):
+                    return
+                total = response['result'].get('totalResults')
+                for entity in response['result'][response_key]:
+                    received += 1
+                    yield entity_class(entity)
+            yielded += received
+            offset += received
+            if (count is None or received < count or
+                    (total is not None and offset >= total)):
+                return
+
+    async def get_refs(self, refs, max_workers=None):
+        # fetch the objects concurrently, at most max_workers at a time (None
+        # for no limit), gather() keeps them in the same order
+        if max_workers is None:
+            results = await asyncio.gather(*[self.get(ref) for ref in refs])
+            return [result[0] for result in results]
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def get(ref):
+            async with semaphore:
+                return (await self.get(ref))[0]
+
+        return await asyncio.gather(*[get(ref) for ref in refs])
+
+    async def get_many(self, refs, max_workers=DEFAULT_MAX_WORKERS, timeout=None):
+        # async version of BaseService.get_many()
+        refs = list(OrderedDict.fromkeys(self.ref_or_raise(ref, self.ref_key)
+                                         for ref in refs))
+        if not refs:
+            return OrderedDict(), OrderedDict()
+        semaphore = asyncio.Semaphore(max_workers) if max_workers else None
+
+        async def get(ref):
+            if semaphore is None:
+                return (await self.get(ref))[0]
+            async with semaphore:
+                return (await self.get(ref))[0]
+
+        tasks = [asyncio.ensure_future(get(ref)) for ref in refs]
+        await asyncio.wait(tasks, timeout=timeout)
+        results = {}
+        for index, task in enumerate(tasks):
+            if not task.done():
+                task.cancel()
+            elif task.exception() is not None:
+                results[index] = (None, task.exception())
+            else:
+                results[index] = (task.result(), None)
+        return collect_many(refs, results, timeout)
+
+    async def get_created(self, refs, refs_only=False, max_workers=None):
+        if refs_only:
+            return list(refs)
+        return await self.get_refs(refs, max_workers)
+
+    async def add_payload(self, payload):
+        response = await self.client.post("{0}{1}".format(self.client.baseurl,
+                                                          self.url_base),
+                                          payload)
+        return response
+
+
+class AsyncDNSZones(AsyncBaseService, DNSZones):
+
+    async def add(self, dns_zone, master_zones="", save_comment=""):
+        payload = {
+            "masters": master_zones,
+            "saveComment": save_comment,
+            "dnsZone": dns_zone
+        }
+        zone_json = await self.add_payload(payload)
+        dns_zone_return = await self.get(zone_json['result']['ref'])
+        return dns_zone_return[0]
+
+    async def get_records(self, dns_zone, **kwargs):
+        zone_ref = self.ref_or_raise(dns_zone)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list("{0}{1}/DNSRecords{2}".format(self.client.baseurl,
+                                                                 zone_ref,
+                                                                 query_string),
+                                   'dnsRecords',
+                                   DNSRecord)
+
+    async def get_records_columns(self,
+                                  dns_zone,
+                                  columns=DNS_RECORD_COLUMNS,
+                                  result=None,
+                                  page_size=DEFAULT_PAGE_SIZE,
+                                  stream=False,
+                                  **kwargs):
+        zone_ref = self.ref_or_raise(dns_zone)
+        if result is None:
+            result = ColumnarResult(columns)
+        async for record in self.iter_list("{0}/DNSRecords".format(zone_ref),
+                                           'dnsRecords',
+                                           None,
+                                           page_size,
+                                           stream,
+                                           **kwargs):
+            result.append(record)
+        return result
+
+    async def get_zone_folder(self, dns_zone, **kwargs):
+        zone_ref = self.ref_or_raise(dns_zone)
+        query_string = self.make_query_str(**kwargs)
+        folder_response = await self.client.get("{0}{1}/Folders{2}".format(self.client.baseurl,
+                                                                           zone_ref,
+                                                                           query_string))
+        return await self.client.Folders.get(folder_response['result']['folder'])
+
+    async def get_generate_directive(self, dns_zone="", directive=""):
+        zone_ref = self.ref_or_raise(dns_zone)
+        directive_ref = self.ref_or_raise(directive)
+        all_directives = []
+        if zone_ref:
+            url = "{0}{1}/GenerateDirectives".format(self.client.baseurl, zone_ref)
+            all_directives = await self.get_list(url,
+                                                 'dnsGenerateDirectives',
+                                                 DNSGenerateDirective)
+        elif directive_ref:
+            url = "{0}{1}{2}".format(self.client.baseurl, self.url_base, directive_ref)
+            directive_response = await self.client.get(url)
+            all_directives.append(
+                DNSGenerateDirective(directive_response['result']['dnsGenerateDirective']))
+        return all_directives
+
+    async def add_aenerate_directive(self, dns_zone, dns_generate_directive, save_comment=""):
+        zone_ref = self.ref_or_raise(dns_zone)
+        payload = {
+            "saveComment": save_comment,
+            "dnsGenerateDirective": dns_generate_directive
+        }
+        directive_json = await self.client.post(
+            "{0}{1}/GenerateDirectives".format(self.client.baseurl, zone_ref),
+            payload)
+        directive_return = await self.get_generate_directive(
+            directive=directive_json['result']['ref'])
+        return directive_return[0]
+
+    async def get_ley_storage_providers(self, dns_zone):
+        zone_ref = self.ref_or_raise(dns_zone)
+        providers_response = await self.client.get(
+            "{0}{1}/KeyStorageProviders".format(self.client.baseurl, zone_ref))
+        return providers_response['result']['keyStorageProviders']
+
+    async def get_zone_options(self, dns_zone):
+        zone_ref = self.ref_or_raise(dns_zone)
+        options_response = await self.client.get("{0}{1}/Options".format(self.client.baseurl,
+                                                                         zone_ref))
+        return options_response['result']['dnsZoneOptions']
+
+    async def get_zone_scopes(self, dns_zone, **kwargs):
+        zone_ref = self.ref_or_raise(dns_zone)
+        query_string = self.make_query_str(**kwargs)
+        dns_zone_response = await self.client.get("{0}{1}/Scopes{2}".format(self.client.baseurl,
+                                                                            zone_ref,
+                                                                            query_string))
+        return dns_zone_response['result']['dnsScopes']
+
+
+class AsyncDNSRecords(AsyncBaseService, DNSRecords):
+
+    async def add(self,
+                  dns_record,
+                  save_comment="",
+                  auto_assign_range_ref="",
+                  dns_zone_ref="",
+                  force_override="",
+                  refs_only=False,
+                  max_workers=None):
+        if not isinstance(dns_record, list):
+            dns_record = [dns_record]
+        payload = {
+            "saveComment": save_comment,
+            "autoAssignRangeRef": auto_assign_range_ref,
+            "dnsZoneRef": dns_zone_ref,
+            "forceOverrideOfNamingConflictCheck": force_override,
+            "dnsRecords": dns_record
+        }
+        response = await self.add_payload(payload)
+
+        # see DNSRecords.add(), a 201 can still carry per-record errors
+        if ('result' in response and response['result'] and
+            'errors' in response['result'] and response['result']['errors']):  # noqa
+            raise RuntimeError(response['result']['errors'])
+
+        return await self.get_created(response['result']['objRefs'], refs_only, max_workers)
+
+    async def get_related_records(self, dns_record):
+        record_ref = self.ref_or_raise(dns_record)
+        return await self.get_list("{0}{1}/RelatedDNSRecords".format(self.client.baseurl,
+                                                                     record_ref),
+                                   'dnsRecords',
+                                   DNSRecord)
+
+
+class AsyncDNSViews(AsyncBaseService, DNSViews):
+
+    async def get_zones(self, dns_view):
+        view_ref = self.ref_or_raise(dns_view)
+        return await self.get_list("{0}{1}/DNSZones".format(self.client.baseurl, view_ref),
+                                   'dnsZones',
+                                   DNSZone)
+
+
+class AsyncIPAMRecords(AsyncBaseService, IPAMRecords):
+
+    async def get_record_range(self, ipam_record):
+        addr_ref = self.ref_or_raise(ipam_record, key=self.ref_key)
+        range_response = await self.client.get("{0}{1}/Range".format(self.client.baseurl,
+                                                                     addr_ref))
+        return Range(range_response['result']['range'])
+
+
+class AsyncRanges(AsyncBaseService, Ranges):
+
+    async def add(self, range_, discovery="", save_comment=""):
+        payload = {
+            "discovery": discovery,
+            "saveComment": save_comment,
+            "range": range_
+        }
+        range_json = await self.add_payload(payload)
+        range_return = await self.get(range_json['result']['ref'])
+        return range_return[0]
+
+    async def get_range_folder(self, range_, **kwargs):
+        range_ref = self.ref_or_raise(range_)
+        query_string = self.make_query_str(**kwargs)
+        folder_response = await self.client.get("{0}{1}/Folders{2}".format(self.client.baseurl,
+                                                                           range_ref,
+                                                                           query_string))
+        return await self.client.Folders.get(folder_response['result']['folder'])
+
+    async def get_address_blocks(self, range_):
+        range_ref = self.ref_or_raise(range_)
+        return await self.get_list("{0}{1}/AddressBlocks".format(self.client.baseurl,
+                                                                 range_ref),
+                                   'addressBlocks',
+                                   AddressBlock)
+
+    async def get_available_address_blocks(self, range_, **kwargs):
+        range_ref = self.ref_or_raise(range_)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list(
+            "{0}{1}/AvailableAddressBlocks{2}".format(self.client.baseurl,
+                                                      range_ref,
+                                                      query_string),
+            'addressBlocks',
+            AddressBlock)
+
+    async def get_inherit_access(self, range_):
+        range_ref = self.ref_or_raise(range_)
+        inherit_access_response = await self.client.get(
+            "{0}{1}/InheritAccess".format(self.client.baseurl, range_ref))
+        return inherit_access_response['result']['inheritAccess']
+
+    async def get_ipam_records(self, range_, **kwargs):
+        range_ref = self.ref_or_raise(range_)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list("{0}{1}/IPAMRecords{2}".format(self.client.baseurl,
+                                                                  range_ref,
+                                                                  query_string),
+                                   'ipamRecords',
+                                   IPAMRecord)
+
+    async def get_ipam_records_columns(self,
+                                       range_,
+                                       columns=IPAM_RECORD_COLUMNS,
+                                       result=None,
+                                       page_size=DEFAULT_PAGE_SIZE,
+                                       stream=False,
+                                       **kwargs):
+        range_ref = self.ref_or_raise(range_)
+        if result is None:
+            result = ColumnarResult(columns)
+        async for record in self.iter_list("{0}/IPAMRecords".format(range_ref),
+                                           'ipamRecords',
+                                           None,
+                                           page_size,
+                                           stream,
+                                           **kwargs):
+            result.append(record)
+        return result
+
+    async def get_next_free_address(self, range_, **kwargs):
+        range_ref = self.ref_or_raise(range_)
+        query_string = self.make_query_str(**kwargs)
+        address_response = await self.client.get(
+            "{0}{1}/NextFreeAddress{2}".format(self.client.baseurl,
+                                               range_ref,
+                                               query_string))
+        return address_response['result']['address']
+
+    async def get_statistics(self, range_):
+        range_ref = self.ref_or_raise(range_)
+        statistics_response = await self.client.get(
+            "{0}{1}/Statistics".format(self.client.baseurl, range_ref))
+        return GetRangeStatisticsResponse(statistics_response['result'])
+
+    async def get_subranges(self, range_, **kwargs):
+        range_ref = self.ref_or_raise(range_)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list("{0}{1}/Subranges{2}".format(self.client.baseurl,
+                                                                range_ref,
+                                                                query_string),
+                                   'ranges',
+                                   Range)
+
+
+class AsyncInterfaces(AsyncBaseService, Interfaces):
+
+    async def add(self, interface, save_comment="", refs_only=False, max_workers=None):
+        payload = {
+            "saveComment": save_comment,
+            "interface": interface
+        }
+        interface_json = await self.add_payload(payload)
+        return await self.get_created(interface_json['result']['objRefs'], refs_only, max_workers)
+
+
+class AsyncDevices(AsyncBaseService, Devices):
+
+    async def add(self, device, save_comment="", refs_only=False, max_workers=None):
+        payload = {
+            "saveComment": save_comment,
+            "device": device
+        }
+        device_json = await self.add_payload(payload)
+        return await self.get_created(device_json['result']['objRefs'], refs_only, max_workers)
+
+
+class AsyncChangeRequests(AsyncBaseService, ChangeRequests):
+
+    async def add(self,
+                  dns_zone_changes="",
+                  dns_record_changes="",
+                  dhcp_scope_changes="",
+                  dhcp_reservation_changes="",
+                  dhcp_exclusion_changes="",
+                  dhcp_address_pool_changes="",
+                  dhcp_option_changes="",
+                  custom_property_changes="",
+                  request_date="",
+                  custom_properties="",
+                  save_comment="",
+                  refs_only=False,
+                  max_workers=None):
+        if not isinstance(dns_zone_changes, list):
+            dns_zone_changes = [dns_zone_changes]
+        if not isinstance(dns_record_changes, list):
+            dns_record_changes = [dns_record_changes]
+        if not isinstance(dhcp_scope_changes, list):
+            dhcp_scope_changes = [dhcp_scope_changes]
+        if not isinstance(dhcp_reservation_changes, list):
+            dhcp_reservation_changes = [dhcp_reservation_changes]
+        if not isinstance(dhcp_exclusion_changes, list):
+            dhcp_exclusion_changes = [dhcp_exclusion_changes]
+        if not isinstance(dhcp_address_pool_changes, list):
+            dhcp_address_pool_changes = [dhcp_address_pool_changes]
+        if not isinstance(dhcp_option_changes, list):
+            dhcp_option_changes = [dhcp_option_changes]
+        if not isinstance(custom_property_changes, list):
+            custom_property_changes = [custom_property_changes]
+        if not isinstance(custom_properties, list):
+            custom_properties = [custom_properties]
+        payload = {
+            "dnsZoneChanges": dns_zone_changes,
+            "dnsRecordChanges": dns_record_changes,
+            "dhcpScopeChanges": dhcp_scope_changes,
+            "dhcpReservationChanges": dhcp_reservation_changes,
+            "dhcpExclusionChanges": dhcp_exclusion_changes,
+            "dhcpAddressPoolChanges": dhcp_address_pool_changes,
+            "dhcpOptionChanges": dhcp_option_changes,
+            "customPropertyChanges": custom_property_changes,
+            "requestDate": request_date,
+            "customProperties": custom_properties,
+            "saveComment": save_comment,
+        }
+        change_json = await self.add_payload(payload)
+        return await self.get_created(change_json['result']['objRefs'], refs_only, max_workers)
+
+
+class AsyncFolders(AsyncBaseService, Folders):
+
+    async def add(self, folder, save_comment=""):
+        payload = {
+            "saveComment": save_comment,
+            "folder": folder
+        }
+        folder_json = await self.add_payload(payload)
+        folder_return = await self.get(folder_json['result']['ref'])
+        return folder_return[0]
+
+    async def get_object_folder(self, ref, **kwargs):
+        query_string = self.make_query_str(**kwargs)
+        url = "{0}{1}/{2}/{3}{4}".format(self.client.baseurl,
+                                         self.url_base,
+                                         ref,
+                                         self.url_base,
+                                         query_string)
+        folder_response = await self.client.get(url)
+        if isinstance(folder_response, str):
+            return folder_response
+        return await self.get(folder_response['result']['folder'])
+
+    async def get_folder_objects(self, folder):
+        folder_ref = self.ref_or_raise(folder)
+        object_json = await self.client.get("{0}{1}/Objects".format(self.client.baseurl,
+                                                                    folder_ref))
+        return object_json['result']['objects']
+
+    async def get_all_objects(self, folder, max_workers=None):
+        # the objects in folder in order, at most max_workers requests at a
+        # time (None for no limit)
+        getters = self.object_getters(await self.get_folder_objects(folder))
+        if max_workers is None:
+            results = await asyncio.gather(*[service.get(ref) for service, ref in getters])
+            return [result[0] for result in results]
+        return [obj async for obj in self.iter_objects(getters, max_workers)]
+
+    async def iter_all_objects(self, folder, max_workers=DEFAULT_MAX_WORKERS):
+        # async generator version of get_all_objects(), yields each object as
+        # soon as it and all objects before it have been fetched
+        getters = self.object_getters(await self.get_folder_objects(folder))
+        async for obj in self.iter_objects(getters, max_workers):
+            yield obj
+
+    async def iter_objects(self, getters, max_workers):
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def get(service, ref):
+            async with semaphore:
+                return (await service.get(ref))[0]
+
+        tasks = [asyncio.ensure_future(get(service, ref)) for service, ref in getters]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+class AsyncGroups(AsyncBaseService, Groups):
+
+    async def add(self, group_input, save_comment="", refs_only=False, max_workers=None):
+        payload = {
+            "saveComment": save_comment,
+            "group": group_input
+        }
+        group_json = await self.add_payload(payload)
+        return await self.get_created(group_json['result']['objRefs'], refs_only, max_workers)
+
+    async def get_group_roles(self, group, **kwargs):
+        group_ref = self.ref_or_raise(group)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list("{0}{1}/Roles{2}".format(self.client.baseurl,
+                                                            group_ref,
+                                                            query_string),
+                                   'roles',
+                                   Role)
+
+    async def get_group_users(self, group, **kwargs):
+        group_ref = self.ref_or_raise(group)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list("{0}{1}/Users{2}".format(self.client.baseurl,
+                                                            group_ref,
+                                                            query_string),
+                                   'users',
+                                   User)
+
+
+class AsyncRoles(AsyncBaseService, Roles):
+
+    async def add(self, role, save_comment="", refs_only=False, max_workers=None):
+        payload = {
+            "saveComment": save_comment,
+            "role": role
+        }
+        role_json = await self.add_payload(payload)
+        return await self.get_created(role_json['result']['objRefs'], refs_only, max_workers)
+
+    async def get_role_groups(self, role, **kwargs):
+        role_ref = self.ref_or_raise(role)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list("{0}{1}/Groups{2}".format(self.client.baseurl,
+                                                             role_ref,
+                                                             query_string),
+                                   'groups',
+                                   Group)
+
+    async def get_role_users(self, role, **kwargs):
+        role_ref = self.ref_or_raise(role)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list("{0}{1}/Users{2}".format(self.client.baseurl,
+                                                            role_ref,
+                                                            query_string),
+                                   'users',
+                                   User)
+
+
+class AsyncUsers(AsyncBaseService, Users):
+
+    async def add(self, user, save_comment="", refs_only=False, max_workers=None):
+        payload = {
+            "saveComment": save_comment,
+            "user": user
+        }
+        user_json = await self.add_payload(payload)
+        return await self.get_created(user_json['result']['objRefs'], refs_only, max_workers)
+
+    async def get_user_groups(self, user, **kwargs):
+        user_ref = self.ref_or_raise(user)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list("{0}{1}/Groups{2}".format(self.client.baseurl,
+                                                             user_ref,
+                                                             query_string),
+                                   'groups',
+                                   Group)
+
+    async def get_user_roles(self, user, **kwargs):
+        user_ref = self.ref_or_raise(user)
+        query_string = self.make_query_str(**kwargs)
+        return await self.get_list("{0}{1}/Roles{2}".format(self.client.baseurl,
+                                                            user_ref,
+                                                            query_string),
+                                   'roles',
+                                   Role)
+
+
+class AsyncClient(Client):
+    # limit - maximum number of open connections
+    # limit_per_host - maximum number of open connections per host (0 = no limit)
+    # retry_policy, circuit_breaker, cache, single_flight, codec, compact - see
+    #   menandmice.client.Client
+    def __init__(self,
+                 server,
+                 username,
+                 password,
+                 limit=100,
+                 limit_per_host=0,
+                 retry_policy=None,
+                 circuit_breaker=None,
+                 cache=None,
+                 single_flight=False,
+                 codec=None,
+                 compact=False):
+        self.baseurl = "http://{0}/mmws/api/".format(server)
+        self.auth = aiohttp.BasicAuth(username, password)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=0)
+        self.circuit_breaker = circuit_breaker
+        self.cache = cache
+        # url -> [future, number of waiters]
+        self.in_flight = {} if single_flight else None
+        self.codec = resolve_codec(codec)
+        self.compact = compact
+        self._session = None
+        self.DNSZones = AsyncDNSZones(self)
+        self.DNSRecords = AsyncDNSRecords(self)
+        self.DNSViews = AsyncDNSViews(self)
+        self.Folders = AsyncFolders(self)
+        self.Users = AsyncUsers(self)
+        self.Groups = AsyncGroups(self)
+        self.Roles = AsyncRoles(self)
+        self.IPAMRecords = AsyncIPAMRecords(self)
+        self.Ranges = AsyncRanges(self)
+        self.Interfaces = AsyncInterfaces(self)
+        self.Devices = AsyncDevices(self)
+        self.ChangeRequests = AsyncChangeRequests(self)
+        self.logger = logging.getLogger('menandmice.aio.AsyncClient')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def session(self):
+        # aiohttp sessions must be created inside a running event loop
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit,
+                                             limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(auth=self.auth, connector=connector)
+        return self._session
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, method, url, payload=None):
+        try:
+            return await self.request_with_retry(method, url, payload)
+        finally:
+            if method != 'GET':
+                self.written(url)
+
+    def written(self, url):
+        if self.cache is not None:
+            self.invalidate(url)
+        if self.in_flight:
+            changed = changed_by(self.cache_key(url))
+            for key in [key for key in self.in_flight if changed(self.cache_key(key))]:
+                del self.in_flight[key]
+
+    async def request_with_retry(self, method, url, payload=None, send=None):
+        # same retry and circuit breaker handling as RetryPolicy.send()
+        # send - coroutine function like send() performing a single attempt
+        send = send or self.send
+        policy = self.retry_policy
+        breaker = self.circuit_breaker
+        host = urlparse(url).netloc
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.before_request(host)
+            retry_after = None
+            try:
+                result = await send(method, url, payload)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if breaker is not None:
+                    breaker.record_failure(host)
+                if not policy.can_retry(method, attempt):
+                    if attempt:
+                        policy.count('exhausted')
+                    raise
+            except asyncio.CancelledError:
+                # the caller gave up (a deadline, cleanup), not the server
+                if breaker is not None:
+                    breaker.release(host)
+                raise
+            except Exception:
+                # not retried, but a failure all the same (and the end of a
+                # half-open trial)
+                if breaker is not None:
+                    breaker.record_failure(host)
+                raise
+            else:
+                status, reason, response_json, retry_after = result
+                if status not in policy.statuses:
+                    if breaker is not None:
+                        breaker.record_success(host)
+                    return status, reason, response_json
+                if breaker is not None:
+                    breaker.record_failure(host)
+                if not policy.can_retry(method, attempt):
+                    if attempt:
+                        policy.count('exhausted')
+                    return status, reason, response_json
+            policy.count('retries')
+            await asyncio.sleep(policy.backoff(attempt, retry_after))
+            attempt += 1
+
+    async def send(self, method, url, payload=None):
+        kwargs = {}
+        if payload is not None:
+            kwargs = self.encode(payload)
+        async with self.session.request(method, url, **kwargs) as response:
+            self.logger.debug(response.status)
+            body = await response.read()
+            error_json = None
+            if body:
+                try:
+                    error_json = self.codec.loads(body)
+                except ValueError:
+                    if response.status in (200, 201):
+                        raise
+            return (response.status,
+                    response.reason,
+                    error_json,
+                    response.headers.get('Retry-After'))
+
+    def raise_error(self, url, status, reason, error_json):
+        # same errors as the sync client raises, with a response carrying the
+        # status code (the body is already consumed)
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason
+        response.url = url
+        if error_json and 'error' in error_json:
+            code = error_json['error']['code']
+            message = error_json['error']['message']
+            raise requests.exceptions.HTTPError(
+                "{0}: {1}".format(code, message), response=response)
+        raise requests.exceptions.HTTPError(
+            "{0} Error: {1} for url: {2}".format(status, reason, url), response=response)
+
+    async def get(self, url):
+        if self.cache is not None:
+            cached = self.cache.get(self.cache_key(url))
+            if cached is not None:
+                self.logger.debug("GET (cached) " + url)
+                return cached
+        if self.in_flight is None:
+            return await self.fetch(url)
+        call = self.in_flight.get(url)
+        if call is not None:
+            call[1] += 1
+            # shield() so a cancelled waiter doesn't cancel the shared request
+            return copy_json(await asyncio.shield(call[0]))
+        call = [asyncio.ensure_future(self.fetch(url)), 0]
+        self.in_flight[url] = call
+        try:
+            result = await asyncio.shield(call[0])
+        finally:
+            # written() may have replaced it with a newer call already
+            if self.in_flight.get(url) is call:
+                del self.in_flight[url]
+        return copy_json(result) if call[1] else result
+
+    async def fetch(self, url):
+        self.logger.debug("GET " + url)
+        generation = self.cache.generation if self.cache is not None else None
+        status, reason, response_json = await self.request("GET", url)
+        if status == 200:
+            if self.cache is not None:
+                self.cache.set(self.cache_key(url), response_json, generation)
+            return response_json
+        elif status == 204:
+            return "No data to display"
+        self.raise_error(url, status, reason, response_json)
+
+    async def get_stream(self, url, response_key, chunk_size=STREAM_CHUNK_SIZE):
+        # async generator version of Client.get_stream(), opening the
+        # response goes through the retry policy and circuit breaker
+        self.logger.debug("GET (stream) " + url)
+        async with AsyncExitStack() as responses:
+
+            async def open_stream(method, url, payload=None):
+                # a successful response stays open, the others are read
+                response = await responses.enter_async_context(self.session.request(method, url))
+                self.logger.debug(response.status)
+                if response.status == 200:
+                    return response.status, response.reason, response, None
+                body = await response.read()
+                try:
+                    error_json = self.codec.loads(body) if body else None
+                except ValueError:
+                    error_json = None
+                return (response.status,
+                        response.reason,
+                        error_json,
+                        response.headers.get('Retry-After'))
+
+            status, reason, result = await self.request_with_retry("GET", url, send=open_stream)
+            if status == 200:
+                parser = JSONArrayParser(('result', response_key))
+                async for chunk in result.content.iter_chunked(chunk_size):
+                    for element in parser.feed(chunk):
+                        yield element
+                    if parser.done:
+                        return
+                for element in parser.close():
+                    yield element
+            elif status != 204:
+                self.raise_error(url, status, reason, result)
+
+    async def post(self, url, payload):
+        self.logger.debug("POST " + url)
+        sanitized_payload = self.sanitize_dict(payload)
+        self.logger.debug(sanitized_payload)
+        status, reason, response_json = await self.request("POST", url, sanitized_payload)
+        if status != 201:
+            self.raise_error(url, status, reason, response_json)
+        return response_json
+
+    async def delete(self, url):
+        self.logger.debug("DELETE " + url)
+        status, reason, response_json = await self.request("DELETE", url)
+        if status == 204:
+            return "Successfully removed!"
+        self.raise_error(url, status, reason, response_json)
+
+    async def put(self, url, payload, sanitize_override=False):
+        self.logger.debug("PUT " + url)
+        if not sanitize_override:
+            payload = self.sanitize_dict(payload)
+        self.logger.debug(payload)
+        status, reason, response_json = await self.request("PUT", url, payload)
+        if status == 204:
+            return "Successfully updated!"
+        self.raise_error(url, status, reason, response_json)
+
+    async def get_item_access(self, ref, **kwargs):
+        query_string = self.make_query_str(**kwargs)
+        access_response_json = await self.get(
+            "{0}{1}/Access{2}".format(self.baseurl, ref, query_string))
+        return ObjectAccess(access_response_json['result']['objectAccess'])
+
+    async def get_item_history(self, ref, **kwargs):
+        query_string = self.make_query_str(**kwargs)
+        history_response_json = await self.get(
+            "{0}{1}/History{2}".format(self.baseurl, ref, query_string))
+        return [Event(event) for event in history_response_json['result']['events']]
+
+    async def get_property_definitions(self, ref, property_name):
+        if property_name:
+            url = "{0}{1}/PropertyDefinitions/{2}".format(self.baseurl, ref, property_name)
+        else:
+            url = "{0}{1}/PropertyDefinitions".format(self.baseurl, ref)
+        property_definitions_json = await self.get(url)
+        return [PropertyDefinition(definition) for definition in
+                property_definitions_json['result']['propertyDefinitions']]
@@ -0,0 +1,278 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Client-side address allocation for one range.
+#
+# RangeAllocator loads the IPAM records of a range once into a bitmap (one
+# bit per address, set = in use) and hands out free addresses from it
+# without a NextFreeAddress call per address. Reservations are thread safe,
+# so threads sharing an allocator never reserve the same address, also not
+# across a reload of the bitmap. Each reserved address is then claimed on
+# the server: the record is read and only claimed while it is still free,
+# together with the allocator's token in the claim_property custom property.
+# The record is read again and the claim only counts when it still carries
+# that token, someone else claiming the same address in between makes it a
+# conflict and the next free address is tried. After too many conflicts the
+# bitmap is reloaded, someone else is allocating from the same range.
+#
+# This narrows the race with other allocators, it doesn't close it: the
+# server has no compare-and-set, a PUT of another allocator that lands after
+# our second read overwrites the claim, and both consider the address
+# theirs. Allocators in different processes need a shared lock, or distinct
+# ranges, when that must not happen.
+#
+# When allocate() fails, the addresses it already claimed are unclaimed
+# again; the ones that couldn't be are in the error's leaked_addresses.
+
+import re
+import threading
+import uuid
+
+from menandmice.addresses import int_to_address
+from menandmice.addresses import address_to_int
+from menandmice.addresses import range_bounds
+from menandmice.base import DEFAULT_PAGE_SIZE
+from menandmice.concurrency import iter_bounded
+
+# largest range (in addresses) loaded into a bitmap, 2 MB of memory
+MAX_BITMAP_SIZE = 2 ** 24
+
+# custom property of IPAM records holding the token of the claiming
+# allocator, it has to be defined on the server
+DEFAULT_CLAIM_PROPERTY = "AllocationToken"
+
+FREE_BYTE = re.compile(b'[^\xff]')
+
+
+class AllocationError(Exception):
+    pass
+
+
+def record_in_use(record):
+    return record.get('state') != 'Free' or bool(record.get('claimed'))
+
+
+class RangeAllocator(object):
+    # range_ - a Range (with 'ref' and 'from'/'to'), fetched when a ref is given
+    # max_conflicts - conflicts after which the bitmap is reloaded
+    # claim_property - custom property the claim token is written to
+    def __init__(self, client, range_, save_comment="", max_conflicts=8,
+                 page_size=DEFAULT_PAGE_SIZE, claim_property=DEFAULT_CLAIM_PROPERTY):
+        if not hasattr(range_, 'get'):
+            range_ = client.Ranges.get(range_)[0]
+        self.client = client
+        self.range = range_
+        self.ref = range_['ref']
+        self.version, self.first, self.last = range_bounds(range_)
+        self.size = self.last - self.first + 1
+        if self.size > MAX_BITMAP_SIZE:
+            raise ValueError("Range {0} has {1} addresses, more than a bitmap can hold ({2})"
+                             .format(self.ref, self.size, MAX_BITMAP_SIZE))
+        self.save_comment = save_comment
+        self.max_conflicts = max_conflicts
+        self.page_size = page_size
+        self.claim_property = claim_property
+        self.token = uuid.uuid4().hex
+        self.stats = {'reserved': 0, 'claimed': 0, 'conflicts': 0, 'loads': 0}
+        self._lock = threading.Lock()
+        self._bitmap = None
+        self._cursor = 0
+        self._conflicts = 0
+        # offsets reserved whose claim isn't done yet, and the ones whose
+        # claim finished since the last load started; a load may not see
+        # them on the server
+        self._pending = set()
+        self._settled = set()
+        self.load()
+
+    def load(self):
+        # (re)builds the bitmap from the IPAM records of the range
+        with self._lock:
+            self._settled = set()
+        bitmap = bytearray((self.size + 7) // 8)
+        # the bits past the end of the range are never free
+        for offset in range(self.size, len(bitmap) * 8):
+            bitmap[offset >> 3] |= 1 << (offset & 7)
+        if self.range.get('subnet') and self.version == 4 and self.size > 2:
+            # network and broadcast address
+            for offset in (0, self.size - 1):
+                bitmap[offset >> 3] |= 1 << (offset & 7)
+        for record in self.client.Ranges.iter_ipam_records(self.ref, self.page_size):
+            if record_in_use(record):
+                offset = address_to_int(record['address'])[1] - self.first
+                if 0 <= offset < self.size:
+                    bitmap[offset >> 3] |= 1 << (offset & 7)
+        with self._lock:
+            # the reservations of other threads stay in use
+            for offset in self._pending | self._settled:
+                bitmap[offset >> 3] |= 1 << (offset & 7)
+            self._bitmap = bitmap
+            self._cursor = 0
+            self._conflicts = 0
+            self.stats['loads'] += 1
+
+    def is_free(self, address):
+        offset = address_to_int(address)[1] - self.first
+        if not 0 <= offset < self.size:
+            raise ValueError("{0} is not in range {1}".format(address, self.ref))
+        return not self._bitmap[offset >> 3] & 1 << (offset & 7)
+
+    def free_count(self):
+        with self._lock:
+            used = sum(bin(byte).count('1') for byte in self._bitmap)
+        return len(self._bitmap) * 8 - used
+
+    def _reserve(self):
+        # offset of the next free address, marked as in use, or None
+        bitmap = self._bitmap
+        for start in (self._cursor >> 3, 0):
+            match = FREE_BYTE.search(bitmap, start)
+            if match is not None:
+                index = match.start()
+                byte = bitmap[index]
+                bit = 0
+                while byte & 1 << bit:
+                    bit += 1
+                bitmap[index] = byte | 1 << bit
+                self._cursor = index << 3 | bit
+                return self._cursor
+        return None
+
+    def reserve(self, count=1):
+        # reserves count free addresses locally, without claiming them
+        offsets = []
+        with self._lock:
+            for _ in range(count):
+                offset = self._reserve()
+                if offset is None:
+                    for offset in offsets:
+                        self._set(offset, False)
+                    raise AllocationError("Range {0} has less than {1} free addresses"
+                                          .format(self.ref, count))
+                offsets.append(offset)
+            self._pending.update(offsets)
+            self.stats['reserved'] += count
+        return [int_to_address(self.version, self.first + offset) for offset in offsets]
+
+    def release(self, address):
+        # gives a reserved (or freed on the server) address back
+        offset = address_to_int(address)[1] - self.first
+        with self._lock:
+            self._pending.discard(offset)
+            self._settled.discard(offset)
+            self._set(offset, False)
+
+    def settle(self, addresses):
+        # the claims of reserved addresses are done, they stay in use
+        offsets = [address_to_int(address)[1] - self.first for address in addresses]
+        with self._lock:
+            self._pending.difference_update(offsets)
+            self._settled.update(offsets)
+
+    def _set(self, offset, used):
+        if used:
+            self._bitmap[offset >> 3] |= 1 << (offset & 7)
+        else:
+            self._bitmap[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+            self._cursor = min(self._cursor, offset)
+
+    def record_ref(self, address):
+        return "{0}/{1}".format(self.client.IPAMRecords.url_base, address)
+
+    def owns(self, record):
+        properties = record.get('customProperties') or {}
+        return bool(record.get('claimed')) and properties.get(self.claim_property) == self.token
+
+    def claim(self, address):
+        # claims address on the server if it is still free there, returns
+        # False on a conflict
+        ref = self.record_ref(address)
+        record = self.client.IPAMRecords.get(ref)[0]
+        if record_in_use(record):
+            return False
+        self.client.IPAMRecords.update(ref,
+                                       {'claimed': True, self.claim_property: self.token},
+                                       'IPAMRecord',
+                                       self.save_comment)
+        # another allocator may have claimed it since it was read
+        return self.owns(self.client.IPAMRecords.get(ref)[0])
+
+    def unclaim(self, address):
+        # gives an address claimed by this allocator back on the server and
+        # locally, an address claimed by someone else is left alone
+        ref = self.record_ref(address)
+        if self.owns(self.client.IPAMRecords.get(ref)[0]):
+            # sent unsanitized, update() would strip the emptied token
+            payload = {
+                "ref": ref,
+                "objType": 'IPAMRecord',
+                "saveComment": self.save_comment,
+                "deleteUnspecified": False,
+                "properties": [{'claimed': False, self.claim_property: ""}]
+            }
+            self.client.put("{0}{1}".format(self.client.baseurl, ref), payload,
+                            sanitize_override=True)
+        self.release(address)
+
+    def allocate(self, count=1, max_workers=1):
+        # Reserves and claims count addresses, returns them in allocation
+        # order. max_workers > 1 claims them concurrently. On an error the
+        # addresses claimed so far, and the ones whose claim failed halfway,
+        # are unclaimed before the error is raised.
+        allocated = []
+        while len(allocated) < count:
+            addresses = self.reserve(count - len(allocated))
+            error = None
+            failed = []
+            claimed = {}
+            for index, ok, e in iter_bounded(self.claim, addresses, max_workers,
+                                             self.client.release_session):
+                if e is not None:
+                    error = error or e
+                    failed.append(addresses[index])
+                else:
+                    claimed[index] = ok
+            self.settle([address for index, address in enumerate(addresses)
+                         if index in claimed])
+            conflicts = 0
+            for index, address in enumerate(addresses):
+                if claimed.get(index):
+                    allocated.append(address)
+                elif index in claimed:
+                    conflicts += 1
+            with self._lock:
+                self.stats['claimed'] += sum(1 for ok in claimed.values() if ok)
+                self.stats['conflicts'] += conflicts
+                self._conflicts += conflicts
+                reload = self._conflicts > self.max_conflicts
+            if error is not None:
+                self.rollback(allocated + failed, error)
+                raise error
+            if reload:
+                self.load()
+        return allocated
+
+    def rollback(self, addresses, error):
+        # unclaims addresses after error, the ones still claimed are left in
+        # error.leaked_addresses
+        leaked = []
+        for address in addresses:
+            try:
+                self.unclaim(address)
+            except Exception:
+                leaked.append(address)
+        error.leaked_addresses = leaked
@@ -15,15 +15,112 @@
 # specific language governing permissions and limitations
 # under the License.
 
-import json
+# loads()/dumps() of the default codec, see menandmice.codec
+from menandmice import codec as json
+
+from collections import OrderedDict
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from future.utils import viewkeys
+from past.builtins import basestring
+
+from menandmice.compact import compact_class
+from menandmice.concurrency import bounded_map
+from menandmice.concurrency import DeadlineExceeded
+from menandmice.concurrency import DEFAULT_MAX_WORKERS
+from menandmice.concurrency import iter_bounded
 
 # Python 2 and 3 compatible
 from future.standard_library import install_aliases
 install_aliases()
 from urllib.parse import urlencode
 
+# number of entities requested per call by the iter_* methods
+DEFAULT_PAGE_SIZE = 1000
+
+
+def raw_entity(entity):
+    return entity
+
+
+def collect_many(refs, results, timeout):
+    # the (entities, errors) of get_many() from results, a dict of
+    # index -> (entity, error) that lacks the refs not done in time
+    entities = OrderedDict()
+    errors = OrderedDict()
+    for index, ref in enumerate(refs):
+        if index not in results:
+            errors[ref] = DeadlineExceeded("{0} not fetched within {1}s".format(ref, timeout))
+            continue
+        entity, error = results[index]
+        if error is not None:
+            errors[ref] = error
+        else:
+            entities[ref] = entity
+    return entities, errors
+
+
+class Schema(object):
+    # BaseObject.fields compiled once per class
+    def __init__(self, cls, fields):
+        self.cls = cls
+        self.fields = []
+        self.defaults = {}
+        self.factories = []
+        for field in fields:
+            if isinstance(field, basestring):
+                name, default = field, None
+            else:
+                name, default = field
+            if callable(default):
+                self.fields.append((name, None, default))
+                self.factories.append((name, default))
+            else:
+                self.fields.append((name, default, None))
+                self.defaults[name] = default
+        self.names = frozenset(name for name, _, _ in self.fields)
+
 
 class BaseObject(dict):
+    # Entity classes declare their keys instead of calling add_key():
+    #
+    #   fields = ('ref',
+    #             'name',
+    #             ('roles', list))
+    #
+    # A field is a key defaulting to None or a (key, default) pair. Callable
+    # defaults are factories, they are only called for keys missing from the
+    # data, so nested defaults (lists, option objects) are never shared and
+    # never built when the response already has the key.
+    fields = ()
+    _schema = None
+
+    def __init__(self, *args, **kwargs):
+        super(BaseObject, self).__init__(*args, **kwargs)
+        schema = self._schema
+        if schema is None or schema.cls is not type(self):
+            schema = self.schema()
+        if not self:
+            self.update(schema.defaults)
+            for name, factory in schema.factories:
+                self[name] = factory()
+        elif not viewkeys(self) >= schema.names:
+            for name, default, factory in schema.fields:
+                if name not in self:
+                    self[name] = factory() if factory is not None else default
+
+    @classmethod
+    def schema(cls):
+        # compiled once per class
+        schema = cls.__dict__.get('_schema')
+        if schema is None:
+            schema = Schema(cls, cls.fields)
+            cls._schema = schema
+        return schema
 
     def add_key(self, key, default=None):
         if key not in self:
@@ -63,8 +160,17 @@ class BaseService(BaseObject):
     def build(self, json_or_dict):
         if isinstance(json_or_dict, basestring):
             json_or_dict = json.loads(json_or_dict)
+        if getattr(self.client, 'compact', False):
+            return compact_class(self.entity_class)(json_or_dict)
         return self.entity_class(**json_or_dict)
 
+    def entity_factory(self, entity_class):
+        # class used to create entity_class entities from a response, the
+        # compact record class when the client is in compact mode
+        if getattr(self.client, 'compact', False) and isinstance(entity_class, type):
+            return compact_class(entity_class)
+        return entity_class
+
     def get(self, obj_or_ref="", **kwargs):
         ref = self.ref_or_raise(obj_or_ref, self.ref_key)
         entities = []
@@ -83,6 +189,99 @@ class BaseService(BaseObject):
                 entities.append(self.build(entity))
         return entities
 
+    def get_refs(self, refs, max_workers=1):
+        # the entities for refs in the same order, max_workers > 1 fetches
+        # them concurrently on that many threads
+        return bounded_map(lambda ref: self.get(ref)[0],
+                           refs,
+                           max_workers,
+                           self.client.release_session)
+
+    def get_many(self, refs, max_workers=DEFAULT_MAX_WORKERS, timeout=None):
+        # Fetches the entities of refs (refs or objects) concurrently, each
+        # distinct ref once, and returns (entities, errors): OrderedDicts
+        # keyed by ref in the order of refs. A ref that failed is in errors
+        # with its exception instead of aborting the others, refs that weren't
+        # fetched within timeout seconds get a DeadlineExceeded error.
+        refs = list(OrderedDict.fromkeys(self.ref_or_raise(ref, self.ref_key)
+                                         for ref in refs))
+        results = {}
+        for index, entity, error in iter_bounded(lambda ref: self.get(ref)[0],
+                                                 refs,
+                                                 max_workers,
+                                                 self.client.release_session,
+                                                 timeout):
+            results[index] = (entity, error)
+        return collect_many(refs, results, timeout)
+
+    def get_created(self, refs, refs_only=False, max_workers=1):
+        # what add() returns for the objRefs of the objects it created: the
+        # refs themselves, or the objects fetched by get_refs()
+        if refs_only:
+            return list(refs)
+        return self.get_refs(refs, max_workers)
+
+    def iter_get(self, page_size=DEFAULT_PAGE_SIZE, stream=False, **kwargs):
+        return self.iter_list(self.url_base,
+                              self.get_response_all_key,
+                              self.build,
+                              page_size,
+                              stream,
+                              **kwargs)
+
+    def iter_list(self,
+                  path,
+                  response_key,
+                  entity_class,
+                  page_size=DEFAULT_PAGE_SIZE,
+                  stream=False,
+                  **kwargs):
+        # Generator that pages through a list endpoint using limit/offset and
+        # yields one entity at a time, so only a single page is held in memory.
+        # 'limit' and 'offset' in kwargs bound the whole iteration, not a page.
+        # page_size=None fetches everything with a single request.
+        # stream=True additionally decodes each page element by element while
+        # it is being received (see Client.get_stream()).
+        # entity_class=None yields the decoded dicts as they are.
+        if entity_class is None:
+            entity_class = raw_entity
+        entity_class = self.entity_factory(entity_class)
+        offset = kwargs.pop('offset', 0)
+        limit = kwargs.pop('limit', None)
+        yielded = 0
+        while limit is None or yielded < limit:
+            if page_size is None:
+                count = limit
+            elif limit is None:
+                count = page_size
+            else:
+                count = min(page_size, limit - yielded)
+            query = dict(kwargs)
+            if offset:
+                query['offset'] = offset
+            if count is not None:
+                query['limit'] = count
+            url = "{0}{1}{2}".format(self.client.baseurl, path, self.make_query_str(**query))
+            total = None
+            received = 0
+            if stream:
+                page = self.client.get_stream(url, response_key)
+            else:
+                response = self.client.get(url)
+                # 204, nothing (more) to list
+                if not isinstance(response, dict):
+                    return
+                page = response['result'][response_key]
+                total = response['result'].get('totalResults')
+            for entity in page:
+                received += 1
+                yield entity_class(entity)
+            yielded += received
+            offset += received
+            if (count is None or received < count or
+                    (total is not None and offset >= total)):
+                return
+
     def delete(self, obj_or_ref, **kwargs):
         ref = self.ref_or_raise(obj_or_ref, self.ref_key)
         return self.client.delete_item(ref, **kwargs)
@@ -114,7 +313,7 @@ class BaseService(BaseObject):
         # object, and then pass it to this set_access() function.
         # Note: 'identityAccess' is a member of ObjectAccess that we will use
         #        for setting this object's access
-        if isinstance(identity_access, dict) and 'identityAccess' in identity_access:
+        if isinstance(identity_access, Mapping) and 'identityAccess' in identity_access:
             identity_access = identity_access['identityAccess']
         return self.client.set_item_access(ref, identity_access, obj_type, save_comment)
 
@@ -151,8 +350,9 @@ class BaseService(BaseObject):
         # is the object a string (ref)
         if isinstance(dict_or_ref, basestring):
             return dict_or_ref
-        # is the object a dictionary (note, our objects are all dicts)
-        elif isinstance(dict_or_ref, dict):
+        # is the object a dictionary (note, our objects are all dicts or,
+        # for compact records, mappings)
+        elif isinstance(dict_or_ref, Mapping):
             return dict_or_ref[key]
         else:
             raise TypeError("Input must be of type basestring or dict")
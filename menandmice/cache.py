@@ -0,0 +1,132 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+
+from collections import OrderedDict
+
+# sub-collections whose listings change when an object of the given type is
+# written, e.g. adding a DNSRecord changes DNSZones/<ref>/DNSRecords
+RELATED_COLLECTIONS = {
+    'Ranges': frozenset(['Subranges']),
+    'IPAMRecords': frozenset(['AddressBlocks', 'AvailableAddressBlocks', 'Statistics']),
+}
+
+
+def copy_json(value):
+    # much cheaper than copy.deepcopy() for decoded JSON
+    if isinstance(value, dict):
+        return dict((k, copy_json(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return [copy_json(v) for v in value]
+    return value
+
+
+def split_path(path):
+    # "DNSZones/123/DNSRecords?limit=5" -> ['DNSZones', '123', 'DNSRecords']
+    return path.split('?', 1)[0].strip('/').split('/')
+
+
+def changed_by(path):
+    # Returns a function telling whether a write to 'path' may have changed
+    # the response of another path:
+    #  - the object itself and everything below it (DNSZones/1, DNSZones/1/Access, ...)
+    #  - listings of its collection (DNSZones?filter=...)
+    #  - sub-collection listings of the same type (Ranges/7/IPAMRecords for IPAMRecords/x)
+    segments = split_path(path)
+    collection = segments[0]
+    related = RELATED_COLLECTIONS.get(collection, frozenset()) | frozenset([collection])
+    obj = segments[:2]
+
+    def changed(key):
+        key_segments = split_path(key)
+        return (key_segments[:len(obj)] == obj or
+                key_segments == [collection] or
+                (len(key_segments) > 2 and key_segments[2] in related))
+    return changed
+
+
+class ResponseCache(object):
+    # TTL + LRU cache for decoded GET responses, keyed by the request path
+    # (relative to the API base url) including the query string.
+    #
+    # maxsize - maximum number of cached responses, the least recently used
+    #           response is evicted first
+    # ttl - seconds a response stays valid
+    #
+    # Callers always get a private copy of the cached response, so modifying
+    # a returned entity never changes the cache.
+    #
+    # generation counts invalidations, a response read before one (its GET
+    # may have raced the write) is not cached, see set().
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = time.time
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[path]
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            # mark as most recently used
+            del self._entries[path]
+            self._entries[path] = entry
+        return copy_json(entry[1])
+
+    def set(self, path, value, generation=None):
+        # generation - self.generation before the request, value is dropped
+        #              when something was invalidated since
+        entry = (self.clock() + self.ttl, copy_json(value))
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._entries.pop(path, None)
+            self._entries[path] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return True
+
+    def invalidate(self, path):
+        # drops everything a write to 'path' may have changed, see changed_by()
+        changed = changed_by(path)
+        with self._lock:
+            self.generation += 1
+            stale = [key for key in self._entries if changed(key)]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidations'] += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
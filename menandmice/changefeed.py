@@ -0,0 +1,242 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Change feed over History endpoints.
+#
+# ChangeFeed polls the History of a set of objects or containers and delivers
+# every new Event once, oldest first, to callbacks or through iteration.
+#
+#  - every source has its own interval: it drops to min_interval when the
+#    source had events and grows by 'backoff' up to max_interval while it
+#    stays quiet
+#  - a cursor per source (the newest timestamp seen and the events seen at
+#    that timestamp) limits the History read to the events since then,
+#    newest first, and filters out what was already delivered; the same
+#    event reported by overlapping sources is delivered once
+#  - the cursors only move, and with a path are saved, once every event of
+#    a poll was delivered (and, when iterating, consumed), a restarted feed
+#    continues where it stopped (events are delivered at least once)
+#  - invalidate=True drops the client's cached responses (see
+#    menandmice.cache) for the objects in the events before delivering them
+
+import os
+import threading
+import time
+
+from collections import deque
+
+from menandmice import codec
+from menandmice.concurrency import DEFAULT_MAX_WORKERS
+from menandmice.concurrency import iter_bounded
+from menandmice.history import event_key
+from menandmice.history import event_time
+from menandmice.history import iter_history
+
+# event keys remembered for the dedup across sources
+DEFAULT_SEEN_SIZE = 10000
+
+
+class Source(object):
+    def __init__(self, ref, interval):
+        self.ref = ref
+        self.interval = interval
+        self.next_poll = 0
+        # newest event time delivered and the keys of the events at that time
+        self.timestamp = None
+        self.keys = set()
+
+    def is_new(self, timestamp, key):
+        if self.timestamp is None or timestamp is None:
+            return True
+        return timestamp > self.timestamp or (timestamp == self.timestamp and
+                                              key not in self.keys)
+
+    def advance(self, events):
+        for timestamp, key, _ in events:
+            if timestamp is None:
+                continue
+            if self.timestamp is None or timestamp > self.timestamp:
+                self.timestamp = timestamp
+                self.keys = set([key])
+            elif timestamp == self.timestamp:
+                self.keys.add(key)
+
+    def to_dict(self):
+        return {'timestamp': self.timestamp, 'keys': [list(key) for key in self.keys]}
+
+
+class ChangeFeed(object):
+    # refs - objects or containers whose History is polled
+    # start - epoch seconds, only events after it are delivered on the first
+    #         poll of a source without a cursor, None delivers its history
+    def __init__(self,
+                 client,
+                 refs,
+                 path=None,
+                 min_interval=5.0,
+                 max_interval=300.0,
+                 backoff=2.0,
+                 start=None,
+                 invalidate=False,
+                 max_workers=DEFAULT_MAX_WORKERS,
+                 history_kwargs=None):
+        self.client = client
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.invalidate = invalidate
+        self.max_workers = max_workers
+        self.history_kwargs = history_kwargs or {}
+        self.clock = time.time
+        self.callbacks = []
+        self.stats = {'polls': 0, 'events': 0, 'duplicates': 0}
+        self.sources = dict((ref, Source(ref, min_interval)) for ref in refs)
+        self._seen = set()
+        self._seen_order = deque()
+        self._stopped = threading.Event()
+        if start is not None:
+            for source in self.sources.values():
+                source.timestamp = int(start)
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def subscribe(self, callback):
+        # callback(event) is called for every new event, in order
+        self.callbacks.append(callback)
+        return callback
+
+    def load(self):
+        with open(self.path, 'rb') as f:
+            cursors = codec.loads(f.read())
+        for ref, cursor in cursors.items():
+            source = self.sources.get(ref)
+            if source is not None:
+                source.timestamp = cursor['timestamp']
+                source.keys = set(tuple(key) for key in cursor['keys'])
+
+    def checkpoint(self):
+        if self.path is None:
+            return
+        data = codec.dumps(dict((ref, source.to_dict()) for ref, source in self.sources.items()))
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data.encode('utf-8'))
+        getattr(os, 'replace', os.rename)(temp_path, self.path)
+
+    def due(self):
+        now = self.clock()
+        return [source for source in self.sources.values() if source.next_poll <= now]
+
+    def next_poll(self):
+        # seconds until the next source is due
+        return max(min(source.next_poll for source in self.sources.values()) - self.clock(), 0)
+
+    def remember(self, key):
+        self._seen.add(key)
+        self._seen_order.append(key)
+        if len(self._seen_order) > DEFAULT_SEEN_SIZE:
+            self._seen.discard(self._seen_order.popleft())
+
+    def poll(self, sources=None):
+        # polls the due sources (or all given ones) once, returns the new
+        # events oldest first after they have been delivered
+        return list(self.iter_poll(sources))
+
+    def fetch(self, source):
+        # the events of source since its cursor, newest first
+        return list(iter_history(self.client, source.ref, source.timestamp,
+                                 **self.history_kwargs))
+
+    def iter_poll(self, sources=None):
+        # poll() yielding every event once it was delivered, the cursors
+        # move after the last one was consumed
+        if sources is None:
+            sources = self.due()
+        if not sources:
+            return
+        new = []
+        updates = []
+        errors = []
+        for index, history, error in iter_bounded(self.fetch,
+                                                  sources,
+                                                  self.max_workers,
+                                                  self.client.release_session):
+            source = sources[index]
+            if error is not None:
+                errors.append(error)
+                self.schedule(source, False)
+                continue
+            events = []
+            for event in history:
+                key = event_key(event)
+                timestamp = event_time(event)
+                if source.is_new(timestamp, key):
+                    events.append((timestamp, key, event))
+            updates.append((source, events))
+            self.schedule(source, bool(events))
+            new.extend(events)
+        self.stats['polls'] += len(sources)
+
+        new.sort(key=lambda item: item[0] or 0)
+        delivered = 0
+        for timestamp, key, event in new:
+            if key in self._seen:
+                self.stats['duplicates'] += 1
+                continue
+            # remembered once delivered, a failing callback gets the event
+            # again on the next poll
+            self.deliver(event)
+            self.remember(key)
+            delivered += 1
+            self.stats['events'] += 1
+            yield event
+        # the cursors only move once the events were delivered
+        for source, events in updates:
+            source.advance(events)
+        if delivered:
+            self.checkpoint()
+        if errors:
+            raise errors[0]
+
+    def schedule(self, source, active):
+        if active:
+            source.interval = self.min_interval
+        else:
+            source.interval = min(source.interval * self.backoff, self.max_interval)
+        source.next_poll = self.clock() + source.interval
+
+    def deliver(self, event):
+        if self.invalidate and event.get('objRef'):
+            self.client.invalidate(event['objRef'])
+        for callback in self.callbacks:
+            callback(event)
+
+    def stop(self):
+        self._stopped.set()
+
+    def __iter__(self):
+        # yields events as they arrive until stop() is called
+        while not self._stopped.is_set():
+            for event in self.iter_poll():
+                yield event
+            self._stopped.wait(self.next_poll())
+
+    def run(self):
+        # polls and calls the callbacks until stop() is called
+        for _ in self:
+            pass
@@ -17,10 +17,24 @@
 
 import requests
 import pprint
-import json
 import logging
+import threading
+
+from itertools import islice
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 from menandmice.base import BaseObject
+from menandmice.cache import changed_by
+from menandmice.cache import copy_json
+from menandmice.codec import resolve_codec
+from menandmice.concurrency import SingleFlight
+from menandmice.retry import RetryPolicy
+from menandmice.streaming import iter_json_array
+from menandmice.streaming import STREAM_CHUNK_SIZE
 
 from menandmice.dns import DNSGenerateDirective
 from menandmice.dns import DNSRecord
@@ -54,62 +68,148 @@ from menandmice.users import Roles
 from menandmice.users import User
 from menandmice.users import Users
 
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def strip_empty(value):
+    # Returns value without None, '', [] and {} at any depth (False and 0 are
+    # real values), containers left empty by this are removed as well. value
+    # itself is never modified: a dict or list is only copied when something
+    # below it was removed, everything else is returned as-is. Other mappings
+    # (compact records) are turned into dicts.
+    if isinstance(value, Mapping) and not isinstance(value, dict):
+        value = dict(value.items())
+    if isinstance(value, dict):
+        result = None
+        for index, (key, item) in enumerate(value.items()):
+            if isinstance(item, (Mapping, list)):
+                stripped = strip_empty(item)
+                keep = bool(stripped)
+            else:
+                stripped = item
+                keep = item is not None and item != ''
+            if keep and stripped is item:
+                if result is not None:
+                    result[key] = item
+                continue
+            if result is None:
+                # first removal, take over the items before this one
+                result = dict(islice(value.items(), index))
+            if keep:
+                result[key] = stripped
+        return value if result is None else result
+    elif isinstance(value, list):
+        result = None
+        for index, item in enumerate(value):
+            if isinstance(item, (Mapping, list)):
+                stripped = strip_empty(item)
+                keep = bool(stripped)
+            else:
+                stripped = item
+                keep = item is not None and item != ''
+            if keep and stripped is item:
+                if result is not None:
+                    result.append(item)
+                continue
+            if result is None:
+                result = value[:index]
+            if keep:
+                result.append(stripped)
+        return value if result is None else result
+    return value
+
 
 class AccessEntry(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(AccessEntry, self).__init__(*args, **kwargs)
-        self.add_key('name')
-        self.add_key('access')
+    fields = ('name',
+              'access')
 
 
 class IdentityAccess(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(IdentityAccess, self).__init__(*args, **kwargs)
-        self.add_key('identityRef')
-        self.add_key('identityName')
-        self.add_key('accessEntries', [AccessEntry()])
+    fields = ('identityRef',
+              'identityName',
+              ('accessEntries', lambda: [AccessEntry()]))
 
 
 class ObjectAccess(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(ObjectAccess, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('identityAccess', [IdentityAccess()])
+    fields = ('ref',
+              'name',
+              ('identityAccess', lambda: [IdentityAccess()]))
 
 
 class Event(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(Event, self).__init__(*args, **kwargs)
-        self.add_key('eventType')
-        self.add_key('objType')
-        self.add_key('objRef')
-        self.add_key('objName')
-        self.add_key('timestamp')
-        self.add_key('username')
-        self.add_key('saveComment')
-        self.add_key('eventText')
+    fields = ('eventType',
+              'objType',
+              'objRef',
+              'objName',
+              'timestamp',
+              'username',
+              'saveComment',
+              'eventText')
 
 
 class PropertyDefinition(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(PropertyDefinition, self).__init__(*args, **kwargs)
-        self.add_key('name')
-        self.add_key('type')
-        self.add_key('system')
-        self.add_key('mandatory')
-        self.add_key('readOnly')
-        self.add_key('multiLine')
-        self.add_key('defaultValue')
-        self.add_key('listItems')
-        self.add_key('parentProperty')
+    fields = ('name',
+              'type',
+              'system',
+              'mandatory',
+              'readOnly',
+              'multiLine',
+              'defaultValue',
+              'listItems',
+              'parentProperty')
 
 
 class Client(BaseObject):
-    def __init__(self, server, username, password):
+    # A single Client may be shared by any number of threads. Every thread gets
+    # its own requests.Session (so cookies and per-request state never race),
+    # but all of those sessions are mounted on the same HTTPAdapter, so TCP
+    # connections to the web service are pooled and kept alive across threads.
+    # All BaseService methods only read from the Client, which makes them safe
+    # to call concurrently as well.
+    #
+    # pool_connections - number of host pools to cache
+    # pool_maxsize - maximum number of connections kept open per host, this
+    #                should be at least the number of threads sharing the Client
+    # pool_block - when True, never open more than pool_maxsize connections to
+    #              a host, instead block until a connection is released
+    # retry_policy - menandmice.retry.RetryPolicy, by default nothing is retried
+    # circuit_breaker - menandmice.retry.CircuitBreaker shared by all threads
+    # cache - menandmice.cache.ResponseCache for GET responses, writes made
+    #         through this Client invalidate the cached objects they touch
+    # single_flight - when True, concurrent GETs for the same url share a
+    #                 single request, GETs after a write don't join one
+    #                 started before it
+    # codec - JSON codec for request and response bodies, a menandmice.codec
+    #         codec or its name ('json', 'orjson'), see menandmice.codec
+    # compact - when True, services return read-only compact records instead
+    #           of entities, see menandmice.compact
+    def __init__(self,
+                 server,
+                 username,
+                 password,
+                 pool_connections=10,
+                 pool_maxsize=10,
+                 pool_block=False,
+                 retry_policy=None,
+                 circuit_breaker=None,
+                 cache=None,
+                 single_flight=False,
+                 codec=None,
+                 compact=False):
         self.baseurl = "http://{0}/mmws/api/".format(server)
-        self.session = requests.Session()
-        self.session.auth = (username, password)
+        self.auth = (username, password)
+        self.adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                                     pool_maxsize=pool_maxsize,
+                                                     pool_block=pool_block)
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=0)
+        self.circuit_breaker = circuit_breaker
+        self.cache = cache
+        self.single_flight = SingleFlight() if single_flight else None
+        self.codec = resolve_codec(codec)
+        self.compact = compact
         self.DNSZones = DNSZones(self)
         self.DNSRecords = DNSRecords(self)
         self.DNSViews = DNSViews(self)
@@ -124,6 +224,53 @@ class Client(BaseObject):
         self.ChangeRequests = ChangeRequests(self)
         self.logger = logging.getLogger('menandmice.client.Client')
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self.new_session()
+            self._local.session = session
+        return session
+
+    @session.setter
+    def session(self, session):
+        self._local.session = session
+
+    def new_session(self):
+        session = requests.Session()
+        session.auth = self.auth
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        with self._sessions_lock:
+            self._sessions.append(session)
+        return session
+
+    def release_session(self):
+        # Forgets the calling thread's session, for short-lived worker threads.
+        # It isn't closed: that would close the HTTPAdapter shared by all
+        # sessions, its connections stay in the pool.
+        session = getattr(self._local, 'session', None)
+        self._local.session = None
+        if session is not None:
+            with self._sessions_lock:
+                if session in self._sessions:
+                    self._sessions.remove(session)
+
+    def close(self):
+        with self._sessions_lock:
+            sessions = self._sessions
+            self._sessions = []
+        for session in sessions:
+            session.close()
+        self.adapter.close()
+        self._local = threading.local()
+
     def new_dns_zone(self, *args, **kwargs):
         return DNSZone(*args, **kwargs)
 
@@ -191,80 +338,132 @@ class Client(BaseObject):
         return ChangeRequest(*args, **kwargs)
 
     def sanitize_list(self, dirty_list):
-        for idx, value in enumerate(dirty_list):
-            if isinstance(value, list):
-                dirty_list[idx] = self.sanitize_list(value)
-            elif isinstance(value, dict):
-                dirty_list[idx] = self.sanitize_dict(value)
-
-        # remove all None and empty elements
-        dirty_list = [x for x in dirty_list if x]
-        return dirty_list
+        return strip_empty(dirty_list)
 
     def sanitize_dict(self, dirty_dict):
-        for k, v in dirty_dict.items():
-            if not v:
-                del dirty_dict[k]
-            elif isinstance(v, list):
-                dirty_dict[k] = self.sanitize_list(v)
-            elif isinstance(v, dict):
-                dirty_dict[k] = self.sanitize_dict(v)
-        return dirty_dict
+        return strip_empty(dirty_dict)
+
+    def send(self, method, url, **kwargs):
+        # every request goes through here so retries and the circuit breaker
+        # apply to all verbs
+        request = getattr(self.session, method.lower())
+        try:
+            return self.retry_policy.send(method,
+                                          url,
+                                          lambda: request(url, **kwargs),
+                                          self.circuit_breaker)
+        finally:
+            # even a failed write may have changed something on the server
+            if method != 'GET':
+                self.written(url)
+
+    def written(self, url):
+        # drops what a write to url may have made stale: cached responses and
+        # GETs in flight since before the write
+        if self.cache is not None:
+            self.invalidate(url)
+        if self.single_flight is not None:
+            changed = changed_by(self.cache_key(url))
+            self.single_flight.forget(lambda key: changed(self.cache_key(key)))
+
+    def cache_key(self, url):
+        if url.startswith(self.baseurl):
+            return url[len(self.baseurl):]
+        return url
+
+    def invalidate(self, ref_or_url):
+        # drop cached responses for a ref (or url), see ResponseCache.invalidate()
+        if self.cache is None:
+            return 0
+        return self.cache.invalidate(self.cache_key(ref_or_url))
+
+    def decode(self, response):
+        if self.codec.stdlib:
+            return response.json()
+        return self.codec.loads(response.content)
+
+    def encode(self, payload):
+        # keyword arguments that send payload as the JSON request body
+        if self.codec.stdlib:
+            return {'json': payload}
+        return {'data': self.codec.dumps_bytes(payload), 'headers': JSON_HEADERS}
+
+    def raise_for_error(self, response):
+        error_json = self.decode(response)
+        if error_json:
+            code = error_json['error']['code']
+            message = error_json['error']['message']
+            raise requests.exceptions.HTTPError(
+                "{0}: {1}".format(code, message), response=response)
+        else:
+            response.raise_for_status()
 
     def get(self, url):
+        if self.cache is not None:
+            cached = self.cache.get(self.cache_key(url))
+            if cached is not None:
+                self.logger.debug("GET (cached) " + url)
+                return cached
+        if self.single_flight is None:
+            return self.fetch(url)
+        result, shared = self.single_flight.do(url, lambda: self.fetch(url))
+        # every caller gets its own copy of a shared response
+        return copy_json(result) if shared else result
+
+    def fetch(self, url):
         self.logger.debug("GET " + url)
-        response = self.session.get(url)
+        # a write invalidating the cache while this GET runs keeps its
+        # (possibly stale) response out of the cache
+        generation = self.cache.generation if self.cache is not None else None
+        response = self.send('GET', url)
         return_val = ""
         self.logger.debug(response.status_code)
         if response.status_code == 200:
-            return_val = response.json()
+            return_val = self.decode(response)
+            if self.cache is not None:
+                self.cache.set(self.cache_key(url), return_val, generation)
         elif response.status_code == 204:
             return_val = "No data to display"
         else:
-            error_json = response.json()
-            if error_json:
-                code = error_json['error']['code']
-                message = error_json['error']['message']
-                raise requests.exceptions.HTTPError(
-                    "{0}: {1}".format(code, message))
-            else:
-                response.raise_for_status()
+            self.raise_for_error(response)
         return return_val
 
+    def get_stream(self, url, response_key, chunk_size=STREAM_CHUNK_SIZE):
+        # Generator version of get() for list endpoints, the elements of
+        # result.<response_key> are decoded one at a time while the body is
+        # read from the socket instead of loading the whole body at once.
+        self.logger.debug("GET (stream) " + url)
+        response = self.send('GET', url, stream=True)
+        try:
+            self.logger.debug(response.status_code)
+            if response.status_code == 200:
+                for element in iter_json_array(response.iter_content(chunk_size),
+                                               ('result', response_key)):
+                    yield element
+            elif response.status_code != 204:
+                self.raise_for_error(response)
+        finally:
+            response.close()
+
     def post(self, url, payload):
         self.logger.debug("POST " + url)
         sanitized_payload = self.sanitize_dict(payload)
         self.logger.debug(sanitized_payload)
-        self.logger.debug(json.dumps(sanitized_payload))
-        response = self.session.post(url, json=sanitized_payload)
+        response = self.send('POST', url, **self.encode(sanitized_payload))
         self.logger.debug(response.status_code)
         if response.status_code != 201:
-            error_json = response.json()
-            if error_json:
-                code = error_json['error']['code']
-                message = error_json['error']['message']
-                raise requests.exceptions.HTTPError(
-                    "{0}: {1}".format(code, message))
-            else:
-                response.raise_for_status()
-        return response.json()
+            self.raise_for_error(response)
+        return self.decode(response)
 
     def delete(self, url):
         self.logger.debug("DELETE " + url)
-        response = self.session.delete(url)
+        response = self.send('DELETE', url)
         return_status = ""
         self.logger.debug(response.status_code)
         if response.status_code == 204:
             return_status = "Successfully removed!"
         else:
-            error_json = response.json()
-            if error_json:
-                code = error_json['error']['code']
-                message = error_json['error']['message']
-                raise requests.exceptions.HTTPError(
-                    "{0}: {1}".format(code, message))
-            else:
-                response.raise_for_status()
+            self.raise_for_error(response)
         return return_status
 
     def put(self, url, payload, sanitize_override=False):
@@ -272,20 +471,13 @@ class Client(BaseObject):
         if not sanitize_override:
             payload = self.sanitize_dict(payload)
         self.logger.debug(payload)
-        response = self.session.put(url, json=payload)
+        response = self.send('PUT', url, **self.encode(payload))
         return_status = ""
         self.logger.debug(response.status_code)
         if response.status_code == 204:
             return_status = "Successfully updated!"
         else:
-            error_json = response.json()
-            if error_json:
-                code = error_json['error']['code']
-                message = error_json['error']['message']
-                raise requests.exceptions.HTTPError(
-                    "{0}: {1}".format(code, message))
-            else:
-                response.raise_for_status()
+            self.raise_for_error(response)
         return return_status
 
     def delete_item(self, ref, **kwargs):
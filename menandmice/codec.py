@@ -0,0 +1,107 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+
+from past.builtins import basestring
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONCodec(object):
+    # Codec backed by the standard library json module. Requests made with it
+    # are encoded and decoded by requests/aiohttp themselves (json=payload,
+    # response.json()), exactly as before codecs were pluggable.
+    name = 'json'
+    stdlib = True
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj).encode('utf-8')
+
+
+class OrjsonCodec(JSONCodec):
+    # orjson decodes straight from the response bytes and is several times
+    # faster than the json module on large list responses
+    name = 'orjson'
+    stdlib = False
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, obj):
+        return orjson.dumps(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj)
+
+
+CODECS = {
+    'json': JSONCodec,
+    'orjson': OrjsonCodec,
+}
+
+
+def get_codec(name=None):
+    # name - 'json', 'orjson' or None for the fastest installed codec, falls
+    #        back to the json module when the requested library is missing
+    if name is None:
+        name = 'orjson'
+    if name not in CODECS:
+        raise ValueError("Unknown JSON codec: {0}".format(name))
+    if name == 'orjson' and orjson is None:
+        name = 'json'
+    return CODECS[name]()
+
+
+# codec used by BaseObject.to_json()/from_json(), BaseService.build() and
+# every Client created without an explicit codec
+default_codec = JSONCodec()
+
+
+def resolve_codec(codec):
+    # codec - a codec instance, a name accepted by get_codec() or None for
+    #         the default codec
+    if codec is None:
+        return default_codec
+    if isinstance(codec, basestring):
+        return get_codec(codec)
+    return codec
+
+
+def set_default_codec(codec):
+    global default_codec
+    default_codec = resolve_codec(codec)
+    return default_codec
+
+
+def loads(data):
+    return default_codec.loads(data)
+
+
+def dumps(obj):
+    return default_codec.dumps(obj)
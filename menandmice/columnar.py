@@ -0,0 +1,407 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Column-oriented result sets for bulk listings.
+#
+# Instead of a list of dicts, every field is kept in one array.array:
+#  - 'address': IP addresses as integers (version, high and low 64 bits)
+#  - 'code': strings from a small set (state, type, ...) as int32 codes into
+#            a list of categories, -1 for None
+#  - 'int': int64, NULL_INT for None
+#  - 'bool': int8 0/1, -1 for None
+#  - 'time': int64 seconds since the epoch (UTC), NULL_INT for None
+#  - 'str': everything else, a plain list
+#
+# to_numpy() and to_pandas() return views on the same buffers (numpy and
+# pandas are optional and only imported when called). The arrays can't grow
+# while such a view exists, so extend() a result before converting it.
+#
+# A row is converted field by field before anything is appended, a value
+# that fails to convert raises without leaving a partial row behind.
+
+import array
+import calendar
+import re
+import socket
+import struct
+import time
+
+from collections import OrderedDict
+
+from past.builtins import basestring
+
+# also NaT when the column is viewed as datetime64
+NULL_INT = -2 ** 63
+
+
+def typecode(size, signed=True):
+    # array typecode of the given item size, 'q'/'Q' don't exist on Python 2
+    codes = 'bhilq' if signed else 'BHILQ'
+    for code in codes:
+        try:
+            if array.array(code).itemsize == size:
+                return code
+        except ValueError:
+            pass
+    raise ValueError("No array typecode with item size {0}".format(size))
+
+
+INT8 = typecode(1)
+INT32 = typecode(4)
+INT64 = typecode(8)
+UINT8 = typecode(1, signed=False)
+UINT64 = typecode(8, signed=False)
+
+TIME_FORMATS = ('%Y-%m-%dT%H:%M:%S',
+                '%Y-%m-%d %H:%M:%S',
+                '%b %d, %Y %H:%M:%S')
+
+# fractions of a second and a UTC offset (Z, +02:00, -0500) at the end
+TIME_SUFFIX = re.compile(r'(\.\d*)?(Z|[+-]\d\d:?\d\d)?$')
+
+
+def parse_address(address):
+    # returns (version, high 64 bits, low 64 bits)
+    if ':' in address:
+        hi, lo = struct.unpack('!QQ', socket.inet_pton(socket.AF_INET6, address))
+        return 6, hi, lo
+    return 4, 0, struct.unpack('!I', socket.inet_aton(address))[0]
+
+
+def format_address(version, hi, lo):
+    if version == 6:
+        return socket.inet_ntop(socket.AF_INET6, struct.pack('!QQ', hi, lo))
+    return socket.inet_ntoa(struct.pack('!I', lo))
+
+
+def parse_time(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    # fractions of a second are dropped, an offset is applied
+    match = TIME_SUFFIX.search(value)
+    zone = match.group(2)
+    offset = 0
+    if zone and zone != 'Z':
+        digits = zone[1:].replace(':', '')
+        offset = int(digits[:2]) * 3600 + int(digits[2:]) * 60
+        if zone[0] == '-':
+            offset = -offset
+    for time_format in TIME_FORMATS:
+        try:
+            return calendar.timegm(time.strptime(value[:match.start()], time_format)) - offset
+        except ValueError:
+            pass
+    raise ValueError("Unknown time format: {0}".format(value))
+
+
+class StrColumn(object):
+    kind = 'str'
+
+    def __init__(self):
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def prepare(self, value):
+        # the value as it is stored, raises before anything is appended
+        return value
+
+    def add(self, value):
+        self.values.append(value)
+
+    def append(self, value):
+        self.add(self.prepare(value))
+
+    def to_numpy(self, np):
+        return np.array(self.values, dtype=object)
+
+    def to_pandas(self, np, pd):
+        return pd.Series(self.values, dtype=object)
+
+
+class IntColumn(object):
+    kind = 'int'
+    typecode = INT64
+    null = NULL_INT
+
+    def __init__(self):
+        self.values = array.array(self.typecode)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        value = self.values[index]
+        return None if value == self.null else value
+
+    def convert(self, value):
+        value = int(value)
+        # array.append() would raise after other columns took the row
+        if not self.null < value < 2 ** 63:
+            raise OverflowError("{0} doesn't fit into an int64 column".format(value))
+        return value
+
+    def prepare(self, value):
+        if value is None or value == '':
+            return self.null
+        return self.convert(value)
+
+    def add(self, value):
+        self.values.append(value)
+
+    def append(self, value):
+        self.add(self.prepare(value))
+
+    def to_numpy(self, np):
+        return np.frombuffer(self.values, dtype=np.int64)
+
+    def to_pandas(self, np, pd):
+        # nullable integers, None stays missing
+        values = self.to_numpy(np)
+        return pd.Series(pd.arrays.IntegerArray(values, values == self.null))
+
+
+class BoolColumn(IntColumn):
+    kind = 'bool'
+    typecode = INT8
+    null = -1
+
+    def __getitem__(self, index):
+        value = self.values[index]
+        return None if value == self.null else bool(value)
+
+    def convert(self, value):
+        return 1 if value else 0
+
+    def to_numpy(self, np):
+        return np.frombuffer(self.values, dtype=np.int8)
+
+    def to_pandas(self, np, pd):
+        values = self.to_numpy(np)
+        return pd.Series(pd.arrays.BooleanArray(values == 1, values == self.null))
+
+
+class TimeColumn(IntColumn):
+    kind = 'time'
+
+    def convert(self, value):
+        return super(TimeColumn, self).convert(parse_time(value))
+
+    def to_pandas(self, np, pd):
+        return pd.Series(self.to_numpy(np).view('datetime64[s]'))
+
+
+class CodeColumn(object):
+    kind = 'code'
+
+    def __init__(self):
+        # int32, a code column can hold more than 32767 distinct values (zone
+        # refs of a large DNS listing)
+        self.codes = array.array(INT32)
+        self.categories = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+        return None if code < 0 else self.categories[code]
+
+    def code(self, value):
+        # code of value, -1 if it doesn't occur in this column
+        return self.index.get(value, -1)
+
+    def prepare(self, value):
+        # unhashable values fail here
+        if value is not None:
+            hash(value)
+        return value
+
+    def add(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(value)
+            self.index[value] = code
+        self.codes.append(code)
+
+    def append(self, value):
+        self.add(self.prepare(value))
+
+    def to_numpy(self, np):
+        return np.frombuffer(self.codes, dtype=np.int32)
+
+    def to_pandas(self, np, pd):
+        return pd.Series(pd.Categorical.from_codes(self.to_numpy(np), self.categories))
+
+
+class AddressColumn(object):
+    kind = 'address'
+
+    def __init__(self):
+        self.versions = array.array(UINT8)
+        self.hi = array.array(UINT64)
+        self.lo = array.array(UINT64)
+
+    def __len__(self):
+        return len(self.versions)
+
+    def __getitem__(self, index):
+        # the address as an integer, or None
+        version = self.versions[index]
+        if not version:
+            return None
+        return self.hi[index] << 64 | self.lo[index]
+
+    def format(self, index):
+        version = self.versions[index]
+        if not version:
+            return None
+        return format_address(version, self.hi[index], self.lo[index])
+
+    @property
+    def ipv4_only(self):
+        return self.versions.count(6) == 0
+
+    def prepare(self, value):
+        if value:
+            return parse_address(value)
+        return 0, 0, 0
+
+    def add(self, value):
+        version, hi, lo = value
+        self.versions.append(version)
+        self.hi.append(hi)
+        self.lo.append(lo)
+
+    def append(self, value):
+        self.add(self.prepare(value))
+
+    def to_numpy(self, np):
+        # IPv4 addresses fit into the low 64 bits, IPv6 needs hi and lo
+        if not self.ipv4_only:
+            raise ValueError("IPv6 addresses don't fit into one uint64 array, "
+                             "use the hi, lo and versions arrays")
+        return np.frombuffer(self.lo, dtype=np.uint64)
+
+    def to_pandas(self, np, pd):
+        if self.ipv4_only:
+            return pd.Series(self.to_numpy(np))
+        return pd.Series([self[i] for i in range(len(self))], dtype=object)
+
+
+COLUMN_TYPES = {
+    'str': StrColumn,
+    'int': IntColumn,
+    'bool': BoolColumn,
+    'time': TimeColumn,
+    'code': CodeColumn,
+    'address': AddressColumn,
+}
+
+IPAM_RECORD_COLUMNS = (('addrRef', 'str'),
+                       ('address', 'address'),
+                       ('state', 'code'),
+                       ('usage', 'int'),
+                       ('claimed', 'bool'),
+                       ('ptrStatus', 'code'),
+                       ('extraneousPTR', 'bool'),
+                       ('discoveryType', 'code'),
+                       ('lastSeenDate', 'time'),
+                       ('lastDiscoveryDate', 'time'))
+
+DNS_RECORD_COLUMNS = (('ref', 'str'),
+                      ('name', 'str'),
+                      ('type', 'code'),
+                      ('ttl', 'int'),
+                      ('data', 'str'),
+                      ('enabled', 'bool'),
+                      ('aging', 'int'),
+                      ('dnsZoneRef', 'code'))
+
+
+class ColumnarResult(object):
+    # columns - (name, kind) pairs, kind is a key of COLUMN_TYPES
+    def __init__(self, columns, rows=None):
+        self.columns = OrderedDict()
+        for name, kind in columns:
+            if isinstance(kind, basestring):
+                kind = COLUMN_TYPES[kind]
+            self.columns[name] = kind()
+        if rows is not None:
+            self.extend(rows)
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def names(self):
+        return list(self.columns)
+
+    def append(self, row):
+        self.extend((row,))
+
+    def extend(self, rows):
+        # rows - any iterable of dicts (entities, compact records, ...), it is
+        #        consumed one row at a time. Rows before one that fails to
+        #        convert stay appended.
+        columns = list(self.columns.items())
+        for row in rows:
+            values = [column.prepare(row.get(name)) for name, column in columns]
+            for (_, column), value in zip(columns, values):
+                column.add(value)
+        return self
+
+    def row(self, index):
+        result = {}
+        for name, column in self.columns.items():
+            if column.kind == 'address':
+                result[name] = column.format(index)
+            else:
+                result[name] = column[index]
+        return result
+
+    def to_numpy(self):
+        # dict of name -> numpy array, numeric columns share the buffers
+        import numpy as np
+        return OrderedDict((name, column.to_numpy(np))
+                           for name, column in self.columns.items())
+
+    def to_pandas(self):
+        import numpy as np
+        import pandas as pd
+        return pd.DataFrame(OrderedDict((name, column.to_pandas(np, pd))
+                                        for name, column in self.columns.items()))
@@ -0,0 +1,151 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Compact, read-only versions of the entity classes.
+#
+# An entity (IPAMRecord, DNSRecord, ...) is a dict with a hash table sized for
+# all of its keys. A compact record stores the same fields in __slots__ and
+# only allocates a dict for keys the entity class doesn't know about, which
+# makes large listings several times smaller. Compact records support the
+# read-only mapping interface (record['address'], .get(), .items(), ==, ...),
+# to_dict() and to_entity() convert them back to plain dicts and entities.
+
+import copy
+import numbers
+
+from menandmice import codec
+from past.builtins import basestring
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+# slots are only set for fields that were present, MISSING marks the others
+MISSING = object()
+
+# defaults of these types can be shared by all records of a class, the others
+# (lists, dicts, option objects) are copied on every access
+SHARED_DEFAULT_TYPES = (type(None), bool, numbers.Number, basestring, tuple, frozenset)
+
+_compact_classes = {}
+
+
+class CompactRecord(Mapping):
+    __slots__ = ('_extra',)
+
+    # set on every generated class
+    entity_class = None
+    fields = ()
+    field_set = frozenset()
+    defaults = {}
+    mutable_defaults = frozenset()
+
+    def __init__(self, *args, **kwargs):
+        data = args[0] if len(args) == 1 and not kwargs else dict(*args, **kwargs)
+        extra = None
+        field_set = self.field_set
+        for key, value in data.items():
+            if key in field_set:
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    def __getitem__(self, key):
+        if key in self.field_set:
+            value = getattr(self, key, MISSING)
+            if value is MISSING:
+                if key in self.mutable_defaults:
+                    return copy.deepcopy(self.defaults[key])
+                return self.defaults[key]
+            return value
+        if self._extra is not None:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        for field in self.fields:
+            yield field
+        if self._extra is not None:
+            for key in self._extra:
+                yield key
+
+    def __len__(self):
+        return len(self.fields) + (len(self._extra) if self._extra is not None else 0)
+
+    def __contains__(self, key):
+        return key in self.field_set or (self._extra is not None and key in self._extra)
+
+    def __repr__(self):
+        return "{0}({1!r})".format(type(self).__name__, self.to_dict())
+
+    def __reduce__(self):
+        # generated classes can't be pickled by name
+        return (compact_record, (self.entity_class, self.present()))
+
+    def present(self):
+        # the fields and extra keys that were set, without defaults
+        data = {}
+        for field in self.fields:
+            value = getattr(self, field, MISSING)
+            if value is not MISSING:
+                data[field] = value
+        if self._extra is not None:
+            data.update(self._extra)
+        return data
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def to_entity(self):
+        # a full entity, with fresh defaults for the missing fields
+        return self.entity_class(self.present())
+
+    def to_json(self):
+        return codec.dumps(self.to_dict())
+
+
+def compact_class(entity_class):
+    # Returns the compact record class for entity_class, its fields are the
+    # keys (and defaults) of an empty entity_class().
+    cls = _compact_classes.get(entity_class)
+    if cls is None:
+        prototype = entity_class()
+        fields = tuple(prototype.keys())
+        clashes = [field for field in fields if hasattr(CompactRecord, field)]
+        if clashes:
+            raise ValueError("{0} fields can't be used in a compact record: {1}"
+                             .format(entity_class.__name__, ", ".join(clashes)))
+        cls = type(str("Compact" + entity_class.__name__),
+                   (CompactRecord,),
+                   {'__slots__': tuple(str(field) for field in fields),
+                    'entity_class': entity_class,
+                    'fields': fields,
+                    'field_set': frozenset(fields),
+                    'defaults': dict(prototype),
+                    'mutable_defaults': frozenset(
+                        field for field, value in prototype.items()
+                        if not isinstance(value, SHARED_DEFAULT_TYPES))})
+        _compact_classes[entity_class] = cls
+    return cls
+
+
+def compact_record(entity_class, data):
+    return compact_class(entity_class)(data)
@@ -0,0 +1,192 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+
+import requests
+
+# Python 2 and 3 compatible
+from future.standard_library import install_aliases
+install_aliases()
+import queue  # noqa: E402
+
+# default number of threads used by the concurrent fetch helpers
+DEFAULT_MAX_WORKERS = 8
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    pass
+
+
+class InFlightCall(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    # Coalesces concurrent calls with the same key: the first caller runs the
+    # function, everybody else arriving while it is running waits for it and
+    # gets the same result (or the same exception).
+    def __init__(self):
+        self.stats = {'calls': 0, 'shared': 0}
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        # returns (result, shared), shared is True when more than one caller
+        # received this result, so the caller knows it must not be mutated
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = InFlightCall()
+                self._calls[key] = call
+                self.stats['calls'] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.stats['shared'] += 1
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # forget() may have replaced it with a newer call already
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                shared = call.waiters > 0
+            call.event.set()
+        return call.result, shared
+
+    def forget(self, predicate):
+        # callers arriving after this start a new call instead of joining a
+        # running call whose key matches predicate (e.g. a GET that started
+        # before a write to the object), the running call's waiters still
+        # get its result
+        with self._lock:
+            keys = [key for key in self._calls if predicate(key)]
+            for key in keys:
+                del self._calls[key]
+        return len(keys)
+
+
+def iter_bounded(func, items, max_workers=DEFAULT_MAX_WORKERS, cleanup=None,
+                 timeout=None):
+    # Calls func(item) for every item on up to max_workers threads and yields
+    # (index, result, error) tuples in the order the calls finish. Exceptions
+    # raised by func are yielded as 'error', never raised. cleanup() is
+    # called by every worker thread before it exits.
+    #
+    # timeout - seconds after which no more results are yielded and no more
+    #           calls are started, calls already running finish in the
+    #           background and their results are dropped (also with a
+    #           single worker, the calls then run on one thread)
+    items = list(items)
+    if not items:
+        return
+    deadline = None if timeout is None else time.time() + timeout
+    max_workers = max_workers or 1
+    if deadline is None and (max_workers <= 1 or len(items) == 1):
+        for index, item in enumerate(items):
+            if deadline is not None and time.time() >= deadline:
+                return
+            try:
+                result = func(item)
+            except Exception as e:
+                yield index, None, e
+            else:
+                yield index, result, None
+        return
+
+    todo = iter(enumerate(items))
+    lock = threading.Lock()
+    done = queue.Queue()
+    stopped = threading.Event()
+
+    def worker():
+        try:
+            while not stopped.is_set():
+                with lock:
+                    try:
+                        index, item = next(todo)
+                    except StopIteration:
+                        return
+                try:
+                    done.put((index, func(item), None))
+                except Exception as e:
+                    done.put((index, None, e))
+        finally:
+            if cleanup is not None:
+                cleanup()
+
+    for _ in range(max(min(max_workers, len(items)), 1)):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+    try:
+        for _ in range(len(items)):
+            if deadline is None:
+                yield done.get()
+                continue
+            try:
+                yield done.get(timeout=max(deadline - time.time(), 0))
+            except queue.Empty:
+                return
+    finally:
+        # the caller stopped early, don't start any more calls
+        stopped.set()
+
+
+def iter_ordered(func, items, max_workers=DEFAULT_MAX_WORKERS, cleanup=None):
+    # Like iter_bounded() but yields the results in the order of items, each
+    # one as soon as it and all results before it are available. The first
+    # exception raised by func is re-raised when its turn comes.
+    pending = {}
+    next_index = 0
+    for index, result, error in iter_bounded(func, items, max_workers, cleanup):
+        pending[index] = (result, error)
+        while next_index in pending:
+            result, error = pending.pop(next_index)
+            if error is not None:
+                raise error
+            yield result
+            next_index += 1
+
+
+def bounded_map(func, items, max_workers=DEFAULT_MAX_WORKERS, cleanup=None):
+    # [func(item) for item in items] with up to max_workers calls in flight,
+    # the first exception raised by func is re-raised
+    items = list(items)
+    results = [None] * len(items)
+    for index, result, error in iter_bounded(func, items, max_workers, cleanup):
+        if error is not None:
+            raise error
+        results[index] = result
+    return results
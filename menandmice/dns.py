@@ -18,140 +18,119 @@
 from menandmice.ipam import Folders
 from menandmice.base import BaseObject
 from menandmice.base import BaseService
+from menandmice.base import DEFAULT_PAGE_SIZE
+from menandmice.columnar import ColumnarResult
+from menandmice.columnar import DNS_RECORD_COLUMNS
 
 
 class DNSZone(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(DNSZone, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('dnsScopeName')
-        self.add_key('dynamic')
-        self.add_key('adIntegrated')
-        self.add_key('adReplicationType')
-        self.add_key('adPartition')
-        self.add_key('dnsViewRef')
-        self.add_key('dnsViewRefs')
-        self.add_key('authority')
-        self.add_key('type')
-        self.add_key('dnssecSigned')
-        self.add_key('kskIDs')
-        self.add_key('zskIDs')
-        self.add_key('customProperties')
-
-
-class DNSZoneOptions(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(DNSZoneOptions, self).__init__(*args, **kwargs)
-        self.add_key('zonetype')
-        self.add_key('timestamp')
-        self.add_key('masters')
-        self.add_key('msSpecific', MSSpecificDNSZoneOptions())
-        self.add_key('bindSpecific', BINDSpecificDNSZoneOptions())
-        self.add_key('dnssec', DNSSECZoneOptions())
-        self.add_key('additional')
-
-
-class MSSpecificDNSZoneOptions(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(MSSpecificDNSZoneOptions, self).__init__(*args, **kwargs)
-        self.add_key('notify', NotifyOption())
-        self.add_key('allowTransferData', AllowTransferOption())
-        self.add_key('allowUpdate')
-        self.add_key('scavenge', ScavengeOption())
-        self.add_key('replication', ADReplicationOption())
+    fields = ('ref',
+              'name',
+              'dnsScopeName',
+              'dynamic',
+              'adIntegrated',
+              'adReplicationType',
+              'adPartition',
+              'dnsViewRef',
+              'dnsViewRefs',
+              'authority',
+              'type',
+              'dnssecSigned',
+              'kskIDs',
+              'zskIDs',
+              'customProperties')
 
 
 class NotifyOption(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(NotifyOption, self).__init__(*args, **kwargs)
-        self.add_key('authoritative')
-        self.add_key('alsoNotify')
+    fields = ('authoritative',
+              'alsoNotify')
 
 
 class AllowTransferOption(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(AllowTransferOption, self).__init__(*args, **kwargs)
-        self.add_key('allowTo')
-        self.add_key('allowToServers')
+    fields = ('allowTo',
+              'allowToServers')
 
 
 class ScavengeOption(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(ScavengeOption, self).__init__(*args, **kwargs)
-        self.add_key('noRefresh')
-        self.add_key('refresh')
+    fields = ('noRefresh',
+              'refresh')
 
 
 class ADReplicationOption(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(ADReplicationOption, self).__init__(*args, **kwargs)
-        self.add_key('type')
-        self.add_key('partition')
+    fields = ('type',
+              'partition')
 
 
 class BINDSpecificDNSZoneOptions(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(BINDSpecificDNSZoneOptions, self).__init__(*args, **kwargs)
-        self.add_key('allowQuery')
-        self.add_key('allowTransfer')
-        self.add_key('zonefile')
-        self.add_key('forwarders')
+    fields = ('allowQuery',
+              'allowTransfer',
+              'zonefile',
+              'forwarders')
 
 
 class DNSSECZoneOptions(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(DNSSECZoneOptions, self).__init__(*args, **kwargs)
-        self.add_key('SignWithNSEC3')
-        self.add_key('NSEC3OptOut')
-        self.add_key('NSEC3RandomSaltLength')
-        self.add_key('NSEC3Iterations')
-        self.add_key('DSRecordSetTTL')
-        self.add_key('DNSKEYRecordSetTTL')
-        self.add_key('DsRecordAlgorithms')
-        self.add_key('MaintainTrustAnchor')
-        self.add_key('Keymaster')
-        self.add_key('ParentHasSecureDelegation')
-        self.add_key('RFC5011KeyRollovers')
-        self.add_key('SecureDelegationPollingPeriod')
-        self.add_key('SignatureInceptionOffset')
-        self.add_key('NSEC3UserSalt')
-        self.add_key('NSEC3CurrentSalt')
-        self.add_key('NSEC3HashAlgorithm')
+    fields = ('SignWithNSEC3',
+              'NSEC3OptOut',
+              'NSEC3RandomSaltLength',
+              'NSEC3Iterations',
+              'DSRecordSetTTL',
+              'DNSKEYRecordSetTTL',
+              'DsRecordAlgorithms',
+              'MaintainTrustAnchor',
+              'Keymaster',
+              'ParentHasSecureDelegation',
+              'RFC5011KeyRollovers',
+              'SecureDelegationPollingPeriod',
+              'SignatureInceptionOffset',
+              'NSEC3UserSalt',
+              'NSEC3CurrentSalt',
+              'NSEC3HashAlgorithm')
+
+
+class MSSpecificDNSZoneOptions(BaseObject):
+    fields = (('notify', NotifyOption),
+              ('allowTransferData', AllowTransferOption),
+              'allowUpdate',
+              ('scavenge', ScavengeOption),
+              ('replication', ADReplicationOption))
+
+
+class DNSZoneOptions(BaseObject):
+    fields = ('zonetype',
+              'timestamp',
+              'masters',
+              ('msSpecific', MSSpecificDNSZoneOptions),
+              ('bindSpecific', BINDSpecificDNSZoneOptions),
+              ('dnssec', DNSSECZoneOptions),
+              'additional')
 
 
 class DNSGenerateDirective(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(DNSGenerateDirective, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('rangeStart')
-        self.add_key('rangeEnd')
-        self.add_key('lhs')
-        self.add_key('dumbclass')
-        self.add_key('type')
-        self.add_key('rhs')
+    fields = ('ref',
+              'rangeStart',
+              'rangeEnd',
+              'lhs',
+              'dumbclass',
+              'type',
+              'rhs')
 
 
 class DNSRecord(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(DNSRecord, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('type')
-        self.add_key('ttl')
-        self.add_key('data')
-        self.add_key('comment')
-        self.add_key('enabled')
-        self.add_key('aging')
-        self.add_key('dnsZoneRef')
+    fields = ('ref',
+              'name',
+              'type',
+              'ttl',
+              'data',
+              'comment',
+              'enabled',
+              'aging',
+              'dnsZoneRef')
 
 
 class DNSView(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(DNSView, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('dnsServerRef')
+    fields = ('ref',
+              'name',
+              'dnsServerRef')
 
 
 class DNSZones(BaseService):
@@ -181,10 +160,39 @@ class DNSZones(BaseService):
         dns_record_response = self.client.get("{0}{1}/DNSRecords{2}".format(self.client.baseurl,
                                                                             zone_ref,
                                                                             query_string))
+        factory = self.entity_factory(DNSRecord)
         for record in dns_record_response['result']['dnsRecords']:
-            all_records.append(DNSRecord(record))
+            all_records.append(factory(record))
         return all_records
 
+    def iter_records(self, dns_zone, page_size=DEFAULT_PAGE_SIZE, stream=False, **kwargs):
+        zone_ref = self.ref_or_raise(dns_zone)
+        return self.iter_list("{0}/DNSRecords".format(zone_ref),
+                              'dnsRecords',
+                              DNSRecord,
+                              page_size,
+                              stream,
+                              **kwargs)
+
+    def get_records_columns(self,
+                            dns_zone,
+                            columns=DNS_RECORD_COLUMNS,
+                            result=None,
+                            page_size=DEFAULT_PAGE_SIZE,
+                            stream=False,
+                            **kwargs):
+        # the records of dns_zone as a menandmice.columnar.ColumnarResult,
+        # pass result to append the records of another zone to it
+        zone_ref = self.ref_or_raise(dns_zone)
+        if result is None:
+            result = ColumnarResult(columns)
+        return result.extend(self.iter_list("{0}/DNSRecords".format(zone_ref),
+                                            'dnsRecords',
+                                            None,
+                                            page_size,
+                                            stream,
+                                            **kwargs))
+
     def get_zone_folder(self, dns_zone, **kwargs):
         zone_ref = self.ref_or_raise(dns_zone)
         query_string = self.make_query_str(**kwargs)
@@ -216,8 +224,9 @@ class DNSZones(BaseService):
         if zone_ref:
             url = "{0}{1}/GenerateDirectives".format(self.client.baseurl, zone_ref)
             directive_response = self.client.get(url)
+            factory = self.entity_factory(DNSGenerateDirective)
             for directive in directive_response['result']['dnsGenerateDirectives']:
-                all_directives.append(DNSGenerateDirective(directive))
+                all_directives.append(factory(directive))
         elif directive_ref:
             url = "{0}{1}{2}".format(self.client.baseurl, self.url_base, directive_ref)
             directive_response = self.client.get(url)
@@ -285,7 +294,9 @@ class DNSRecords(BaseService):
             save_comment="",
             auto_assign_range_ref="",
             dns_zone_ref="",
-            force_override=""):
+            force_override="",
+            refs_only=False,
+            max_workers=1):
         if not isinstance(dns_record, list):
             dns_record = [dns_record]
         payload = {
@@ -298,7 +309,6 @@ class DNSRecords(BaseService):
         response = self.client.post("{0}{1}".format(self.client.baseurl,
                                                     self.url_base),
                                     payload)
-        dns_record_return = []
 
         # POST /api/DNSRecords can return a valid (201) status but still not
         # create a record, in this case the 'errors' property is filled in
@@ -307,9 +317,7 @@ class DNSRecords(BaseService):
             'errors' in response['result'] and response['result']['errors']):  # noqa
             raise RuntimeError(response['result']['errors'])
 
-        for ref in response['result']['objRefs']:
-            dns_record_return.append(self.get(ref)[0])
-        return dns_record_return
+        return self.get_created(response['result']['objRefs'], refs_only, max_workers)
 
     def get_related_records(self, dns_record):
         record_ref = self.ref_or_raise(dns_record)
@@ -317,8 +325,9 @@ class DNSRecords(BaseService):
         dns_record_response = self.client.get(
             "{0}{1}/RelatedDNSRecords".format(self.client.baseurl,
                                               record_ref))
+        factory = self.entity_factory(DNSRecord)
         for record in dns_record_response['result']['dnsRecords']:
-            all_records.append(DNSRecord(record))
+            all_records.append(factory(record))
         return all_records
 
     def delete_related_records(self, dns_record, **kwargs):
@@ -343,6 +352,7 @@ class DNSViews(BaseService):
         all_zones = []
         dns_zone_response = self.client.get("{0}{1}/DNSZones".format(self.client.baseurl,
                                                                      view_ref))
+        factory = self.entity_factory(DNSZone)
         for zone in dns_zone_response['result']['dnsZones']:
-            all_zones.append(DNSZone(zone))
+            all_zones.append(factory(zone))
         return all_zones
@@ -0,0 +1,243 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Local mirror of DNS zones and their records, kept current incrementally.
+#
+# ZoneMirror.sync() takes a full snapshot the first time (every zone and its
+# records). After that it reads the History of the mirrored zones, or of the
+# containers given as history_refs, and only fetches the zones that have
+# events newer than the watermark again. The zone list is re-read as well,
+# one paged listing, to pick up created and deleted zones. With a path the
+# mirror and its watermark are saved after every sync and loaded on start,
+# so a restarted process continues incrementally.
+#
+# The watermark is the newest server event timestamp seen, the History is
+# read newest first and only down to 'overlap' seconds before it, so events
+# written late with an older timestamp are not missed. The events already
+# applied within that window are remembered and skipped. A History error
+# other than 404 (a zone deleted since the last sync) fails the sync
+# without moving the watermark, as does any error reading the zone of a
+# record created since, other than 404 (the record is gone again).
+#
+# Cost per sync: one History request per history ref, plus one paged zone
+# listing. Without history_refs that is one History request for every
+# mirrored zone, for large servers pass the few containers (DNS views,
+# servers) whose History covers all of the zones instead.
+
+import os
+
+from menandmice import codec
+from menandmice.concurrency import DEFAULT_MAX_WORKERS
+from menandmice.concurrency import bounded_map
+from menandmice.concurrency import iter_bounded
+from menandmice.dns import DNSRecord
+from menandmice.dns import DNSZone
+from menandmice.history import event_key
+from menandmice.history import event_time
+from menandmice.history import is_not_found
+from menandmice.history import iter_history
+from menandmice.history import newest_event_time
+
+# seconds before the watermark read again on every sync
+DEFAULT_OVERLAP = 300
+
+
+def is_delete(event):
+    return 'delete' in (event.get('eventType') or '').lower()
+
+
+class ZoneMirror(object):
+    # zone_kwargs - filters for DNSZones.get(), e.g. {'filter': ...}
+    # history_refs - refs whose History covers all zone changes, None reads
+    #                the History of every mirrored zone
+    def __init__(self,
+                 client,
+                 path=None,
+                 zone_kwargs=None,
+                 history_refs=None,
+                 max_workers=DEFAULT_MAX_WORKERS,
+                 overlap=DEFAULT_OVERLAP):
+        self.client = client
+        self.path = path
+        self.zone_kwargs = zone_kwargs or {}
+        self.history_refs = history_refs
+        self.max_workers = max_workers
+        self.overlap = overlap
+        self.zones = {}
+        self.records = {}
+        self.watermark = None
+        # keys of the applied events within overlap of the watermark
+        self.seen = set()
+        self.stats = {'snapshots': 0, 'syncs': 0, 'zones_fetched': 0, 'events': 0}
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path, 'rb') as f:
+            data = codec.loads(f.read())
+        self.watermark = data['watermark']
+        self.seen = set(tuple(key) for key in data.get('seen', []))
+        self.zones = dict((ref, DNSZone(zone)) for ref, zone in data['zones'].items())
+        self.records = dict((ref, [DNSRecord(record) for record in records])
+                            for ref, records in data['records'].items())
+
+    def save(self):
+        if self.path is None:
+            return
+        # compact records are mappings, not dicts
+        data = codec.dumps({'watermark': self.watermark,
+                            'seen': sorted(self.seen, key=repr),
+                            'zones': dict((ref, dict(zone.items()))
+                                          for ref, zone in self.zones.items()),
+                            'records': dict((ref, [dict(record.items()) for record in records])
+                                            for ref, records in self.records.items())})
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data.encode('utf-8'))
+        # atomic, a crash leaves the previous state
+        getattr(os, 'replace', os.rename)(temp_path, self.path)
+
+    def record_zones(self):
+        # record ref -> zone ref of the mirrored records
+        return dict((record['ref'], zone_ref)
+                    for zone_ref, records in self.records.items()
+                    for record in records)
+
+    def fetch_zones(self, zones):
+        # fetches the records of zones (DNSZones) concurrently into the mirror
+        def fetch(zone):
+            return list(self.client.DNSZones.iter_records(zone['ref']))
+
+        results = bounded_map(fetch, zones, self.max_workers, self.client.release_session)
+        for zone, records in zip(zones, results):
+            self.zones[zone['ref']] = zone
+            self.records[zone['ref']] = records
+        self.stats['zones_fetched'] += len(zones)
+
+    def remove_zone(self, ref):
+        self.zones.pop(ref, None)
+        self.records.pop(ref, None)
+
+    def history_refs_of(self, zone_refs):
+        return list(zone_refs) if self.history_refs is None else list(self.history_refs)
+
+    def recent_events(self, ref):
+        # the events of ref within overlap of its newest one
+        newest = newest_event_time(self.client, ref)
+        if newest is None:
+            return []
+        return list(iter_history(self.client, ref, newest - self.overlap))
+
+    def remember(self, events):
+        # the watermark moves to the newest event, the events within overlap
+        # of it are skipped by the next sync
+        timestamps = [event_time(event) for event in events]
+        self.watermark = max([self.watermark or 0] + [t for t in timestamps if t is not None])
+        self.seen = set(event_key(event) for event, timestamp in zip(events, timestamps)
+                        if timestamp is None or timestamp >= self.watermark - self.overlap)
+
+    def snapshot(self):
+        zones = list(self.client.DNSZones.iter_get(**self.zone_kwargs))
+        # the events before the records are read, anything after them is
+        # picked up by the next sync
+        recent = bounded_map(self.recent_events,
+                             self.history_refs_of(zone['ref'] for zone in zones),
+                             self.max_workers,
+                             self.client.release_session)
+        self.zones = {}
+        self.records = {}
+        self.fetch_zones(zones)
+        self.watermark = None
+        self.remember([event for events in recent for event in events])
+        self.stats['snapshots'] += 1
+        self.save()
+        return {'added': [zone['ref'] for zone in zones], 'changed': [], 'removed': []}
+
+    def fetch_events(self):
+        # the events of the history refs down to watermark - overlap, without
+        # duplicates, oldest first
+        since = self.watermark - self.overlap
+        refs = self.history_refs_of(self.zones)
+        events = {}
+        for index, result, error in iter_bounded(
+                lambda ref: list(iter_history(self.client, ref, since)),
+                refs,
+                self.max_workers,
+                self.client.release_session):
+            if error is not None:
+                # a zone deleted since the last sync has no history left
+                if self.history_refs is None and is_not_found(error):
+                    continue
+                raise error
+            for event in result:
+                events[event_key(event)] = event
+        return sorted(events.values(), key=lambda event: event_time(event) or 0)
+
+    def changed_zones(self, events):
+        # refs of the zones events changed, created and deleted zones are
+        # found by listing the zones
+        record_zones = None
+        changed = set()
+        for event in events:
+            ref = event.get('objRef') or ''
+            if ref.startswith('DNSZones/'):
+                if not is_delete(event):
+                    changed.add(ref)
+            elif ref.startswith('DNSRecords/'):
+                if record_zones is None:
+                    record_zones = self.record_zones()
+                zone_ref = record_zones.get(ref)
+                if zone_ref is None and not is_delete(event):
+                    zone_ref = self.record_zone(ref)
+                if zone_ref is not None:
+                    changed.add(zone_ref)
+        return changed
+
+    def record_zone(self, ref):
+        # zone of a record created since the last sync
+        try:
+            return self.client.DNSRecords.get(ref)[0]['dnsZoneRef']
+        except Exception as e:
+            # deleted again, the zone is picked up by its own event
+            if is_not_found(e):
+                return None
+            raise
+
+    def sync(self):
+        # returns {'added': [...], 'changed': [...], 'removed': [...]} zone refs
+        if self.watermark is None:
+            return self.snapshot()
+        events = self.fetch_events()
+        changed = self.changed_zones([event for event in events
+                                      if event_key(event) not in self.seen])
+
+        listed = dict((zone['ref'], zone)
+                      for zone in self.client.DNSZones.iter_get(**self.zone_kwargs))
+        added = [ref for ref in listed if ref not in self.zones]
+        removed = [ref for ref in self.zones if ref not in listed]
+        changed = [ref for ref in changed if ref in listed and ref in self.zones]
+
+        for ref in removed:
+            self.remove_zone(ref)
+        self.fetch_zones([listed[ref] for ref in added + changed])
+
+        self.stats['events'] += len([event for event in events
+                                     if event_key(event) not in self.seen])
+        self.remember(events)
+        self.stats['syncs'] += 1
+        self.save()
+        return {'added': sorted(added), 'changed': sorted(changed), 'removed': sorted(removed)}
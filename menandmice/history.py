@@ -0,0 +1,74 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Helpers for reading History (Event) listings incrementally.
+#
+# iter_history() asks the server for the newest events first, one page at a
+# time, and stops at the first event older than 'since', so reading the
+# changes of an object costs a call per page of new events instead of its
+# whole history. Event timestamps are only ever compared with each other,
+# never with the local clock.
+
+from menandmice.columnar import parse_time
+
+# events requested per History call
+DEFAULT_HISTORY_PAGE_SIZE = 100
+
+NEWEST_FIRST = {'sortBy': 'timestamp', 'sortOrder': 'Descending'}
+
+
+def event_time(event):
+    # seconds since the epoch of the event's (server) timestamp, or None
+    try:
+        return parse_time(event['timestamp'])
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def event_key(event):
+    return (event.get('timestamp'), event.get('objRef'), event.get('eventType'),
+            event.get('eventText'))
+
+
+def iter_history(client, ref, since=None, page_size=DEFAULT_HISTORY_PAGE_SIZE, **kwargs):
+    # the events of ref newest first, down to the ones at 'since' (epoch
+    # seconds of a server timestamp, None for all)
+    offset = 0
+    while True:
+        query = dict(NEWEST_FIRST, limit=page_size, offset=offset)
+        query.update(kwargs)
+        events = client.get_item_history(ref, **query)
+        for event in events:
+            timestamp = event_time(event)
+            if since is not None and timestamp is not None and timestamp < since:
+                return
+            yield event
+        if len(events) < page_size:
+            return
+        offset += page_size
+
+
+def newest_event_time(client, ref, **kwargs):
+    # timestamp of the newest event of ref, None if it has no history
+    for event in iter_history(client, ref, page_size=1, **kwargs):
+        return event_time(event)
+    return None
+
+
+def is_not_found(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) == 404
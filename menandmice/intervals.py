@@ -0,0 +1,301 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Sparse sets of IPv4/IPv6 addresses.
+#
+# An IntervalSet keeps the sorted, disjoint and non-adjacent (first, last)
+# integer runs of a set of addresses of one family, so its size depends on
+# the number of runs, not on the number of addresses: a /64 with three used
+# addresses is three intervals. Set operations are linear merges of the two
+# sorted run lists.
+
+from bisect import bisect_right
+from itertools import islice
+
+from past.builtins import basestring
+
+from menandmice.addresses import BITS
+from menandmice.addresses import address_to_int
+from menandmice.addresses import int_to_address
+from menandmice.addresses import range_bounds
+from menandmice.allocator import record_in_use
+from menandmice.ipam import AddressBlock
+
+
+def normalize(intervals):
+    # sorted, merged (first, last) runs
+    result = []
+    for first, last in sorted(intervals):
+        if first > last:
+            raise ValueError("Invalid interval: {0} > {1}".format(first, last))
+        if result and first <= result[-1][1] + 1:
+            if last > result[-1][1]:
+                result[-1] = (result[-1][0], last)
+        else:
+            result.append((first, last))
+    return result
+
+
+def split_prefixes(first, last, bits):
+    # the fewest aligned prefixes covering first..last, as (first, length)
+    result = []
+    while first <= last:
+        host_bits = (first & -first).bit_length() - 1 if first else bits
+        while 1 << host_bits > last - first + 1:
+            host_bits -= 1
+        result.append((first, bits - host_bits))
+        first += 1 << host_bits
+    return result
+
+
+class IntervalSet(object):
+    def __init__(self, intervals=(), version=4):
+        self.version = version
+        self.intervals = normalize(intervals)
+
+    @classmethod
+    def _from_sorted(cls, intervals, version):
+        result = cls(version=version)
+        result.intervals = intervals
+        return result
+
+    @classmethod
+    def from_blocks(cls, blocks, version=None):
+        # blocks - Ranges, AddressBlocks or subnet strings
+        intervals = []
+        for block in blocks:
+            block_version, first, last = range_bounds(block)
+            if version is None:
+                version = block_version
+            elif block_version != version:
+                raise ValueError("Can't mix IPv4 and IPv6 blocks")
+            intervals.append((first, last))
+        return cls(intervals, version or 4)
+
+    @classmethod
+    def from_range(cls, range_):
+        version, first, last = range_bounds(range_)
+        return cls._from_sorted([(first, last)], version)
+
+    @classmethod
+    def from_addresses(cls, addresses, version=None):
+        values = []
+        for address in addresses:
+            address_version, value = address_to_int(address)
+            if version is None:
+                version = address_version
+            elif address_version != version:
+                raise ValueError("Can't mix IPv4 and IPv6 addresses")
+            values.append(value)
+        values.sort()
+        intervals = []
+        for value in values:
+            if intervals and value <= intervals[-1][1] + 1:
+                if value > intervals[-1][1]:
+                    intervals[-1] = (intervals[-1][0], value)
+            else:
+                intervals.append((value, value))
+        return cls._from_sorted(intervals, version or 4)
+
+    @classmethod
+    def from_records(cls, records, version=None, in_use=record_in_use):
+        # the addresses of the IPAM records that are in use
+        return cls.from_addresses((record['address'] for record in records if in_use(record)),
+                                  version)
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        if not isinstance(other, IntervalSet):
+            return NotImplemented
+        return self.version == other.version and self.intervals == other.intervals
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return "IntervalSet({0!r})".format(self.to_strings())
+
+    def __contains__(self, address):
+        if isinstance(address, basestring):
+            version, value = address_to_int(address)
+            if version != self.version:
+                return False
+        else:
+            value = address
+        index = bisect_right(self.intervals, (value, float('inf'))) - 1
+        return index >= 0 and value <= self.intervals[index][1]
+
+    def count(self):
+        # number of addresses, can be far beyond sys.maxsize for IPv6
+        return sum(last - first + 1 for first, last in self.intervals)
+
+    def _check(self, other):
+        if other.version != self.version:
+            raise ValueError("Can't combine IPv{0} and IPv{1} address sets"
+                             .format(self.version, other.version))
+
+    def union(self, other):
+        self._check(other)
+        return IntervalSet(self.intervals + other.intervals, self.version)
+
+    def intersection(self, other):
+        self._check(other)
+        result = []
+        a = self.intervals
+        b = other.intervals
+        i = j = 0
+        while i < len(a) and j < len(b):
+            first = max(a[i][0], b[j][0])
+            last = min(a[i][1], b[j][1])
+            if first <= last:
+                result.append((first, last))
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return self._from_sorted(result, self.version)
+
+    def difference(self, other):
+        self._check(other)
+        result = []
+        b = other.intervals
+        j = 0
+        for first, last in self.intervals:
+            while j < len(b) and b[j][1] < first:
+                j += 1
+            k = j
+            while k < len(b) and b[k][0] <= last:
+                if b[k][0] > first:
+                    result.append((first, b[k][0] - 1))
+                first = b[k][1] + 1
+                if first > last:
+                    break
+                k += 1
+            if first <= last:
+                result.append((first, last))
+        return self._from_sorted(result, self.version)
+
+    def complement(self, within):
+        # the addresses of within (an IntervalSet, Range, AddressBlock or
+        # subnet) not in this set
+        if not isinstance(within, IntervalSet):
+            within = IntervalSet.from_range(within)
+        return within.difference(self)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def first_fit(self, size, alignment=1):
+        # first value of the lowest run of size addresses in the set starting
+        # at a multiple of alignment, or None
+        for first, last in self.intervals:
+            start = -(-first // alignment) * alignment
+            if start + size - 1 <= last:
+                return start
+        return None
+
+    def first_fit_address(self, size=1, alignment=1):
+        start = self.first_fit(size, alignment)
+        return None if start is None else int_to_address(self.version, start)
+
+    def prefixes(self):
+        # the set as the fewest aligned (first, prefix length) blocks
+        bits = BITS[self.version]
+        result = []
+        for first, last in self.intervals:
+            result.extend(split_prefixes(first, last, bits))
+        return result
+
+    def iter_subnets(self, prefix_length=None):
+        # the set as "address/length" subnets, with prefix_length every
+        # aligned subnet of that length inside the set (lazily, an IPv6 /64
+        # holds 2 ** 56 /120s)
+        bits = BITS[self.version]
+        for first, length in self.prefixes():
+            if prefix_length is None:
+                yield "{0}/{1}".format(int_to_address(self.version, first), length)
+            elif length <= prefix_length:
+                step = 1 << bits - prefix_length
+                last = first + (1 << bits - length)
+                while first < last:
+                    yield "{0}/{1}".format(int_to_address(self.version, first), prefix_length)
+                    first += step
+
+    def subnets(self, prefix_length=None, limit=None):
+        return list(islice(self.iter_subnets(prefix_length), limit))
+
+    def best_fit(self, prefix_length):
+        # first address of the aligned prefix_length block taken from the
+        # smallest free prefix that can hold it (the lowest one on ties), or
+        # None. Taking from the smallest block keeps the large ones intact.
+        best = None
+        for first, length in self.prefixes():
+            if length <= prefix_length and (best is None or length > best[1]):
+                best = (first, length)
+                if length == prefix_length:
+                    break
+        return None if best is None else best[0]
+
+    def best_fit_subnet(self, prefix_length):
+        first = self.best_fit(prefix_length)
+        if first is None:
+            return None
+        return "{0}/{1}".format(int_to_address(self.version, first), prefix_length)
+
+    def to_strings(self):
+        return ["{0}-{1}".format(int_to_address(self.version, first),
+                                 int_to_address(self.version, last))
+                for first, last in self.intervals]
+
+    def to_blocks(self):
+        # the runs as AddressBlock entities
+        return [AddressBlock({'from': int_to_address(self.version, first),
+                              'to': int_to_address(self.version, last)})
+                for first, last in self.intervals]
+
+
+def merge_blocks(blocks):
+    # overlapping and adjacent AddressBlocks merged into the fewest blocks
+    return IntervalSet.from_blocks(blocks).to_blocks()
+
+
+def subtract_blocks(blocks, other_blocks):
+    # the parts of blocks not covered by other_blocks, as AddressBlocks
+    result = IntervalSet.from_blocks(blocks)
+    return (result - IntervalSet.from_blocks(other_blocks, result.version)).to_blocks()
+
+
+def best_fit_among(candidates, prefix_length):
+    # candidates - {ref: IntervalSet of free addresses}
+    # returns (ref, first address) of the best fitting prefix_length block
+    # over all candidates (see IntervalSet.best_fit()), or None
+    best = None
+    for ref, free in candidates.items():
+        for first, length in free.prefixes():
+            if length <= prefix_length and (best is None or
+                                            (length, -first) > (best[2], -best[1])):
+                best = (ref, first, length)
+    return None if best is None else (best[0], best[1])
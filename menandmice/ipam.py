@@ -15,133 +15,123 @@
 # specific language governing permissions and limitations
 # under the License.
 
+from past.builtins import basestring
+
 from menandmice.base import BaseObject
 from menandmice.base import BaseService
+from menandmice.base import DEFAULT_PAGE_SIZE
+from menandmice.columnar import ColumnarResult
+from menandmice.columnar import IPAM_RECORD_COLUMNS
+from menandmice.concurrency import bounded_map
+from menandmice.concurrency import DEFAULT_MAX_WORKERS
+from menandmice.concurrency import iter_ordered
 
 
 class IPAMRecord(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(IPAMRecord, self).__init__(*args, **kwargs)
-        self.add_key('addrRef')
-        self.add_key('address')
-        self.add_key('claimed')
-        self.add_key('dnsHosts')
-        self.add_key('dhcpReservations')
-        self.add_key('dhcpLeases')
-        self.add_key('discoveryType')
-        self.add_key('lastSeenDate')
-        self.add_key('lastDiscoveryDate')
-        self.add_key('lastKnownClientIdentifier')
-        self.add_key('device')
-        self.add_key('interface')
-        self.add_key('ptrStatus')
-        self.add_key('extraneousPTR')
-        self.add_key('customProperties')
-        self.add_key('state')
-        self.add_key('usage')
+    fields = ('addrRef',
+              'address',
+              'claimed',
+              'dnsHosts',
+              'dhcpReservations',
+              'dhcpLeases',
+              'discoveryType',
+              'lastSeenDate',
+              'lastDiscoveryDate',
+              'lastKnownClientIdentifier',
+              'device',
+              'interface',
+              'ptrStatus',
+              'extraneousPTR',
+              'customProperties',
+              'state',
+              'usage')
 
 
 class Range(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(Range, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('from')
-        self.add_key('to')
-        self.add_key('parentRef')
-        self.add_key('adSiteRef')
-        self.add_key('childRanges')
-        self.add_key('dhcpScopes')
-        self.add_key('subnet')
-        self.add_key('locked')
-        self.add_key('autoAssign')
-        self.add_key('hasSchedule')
-        self.add_key('hasMonitor')
-        self.add_key('customProperties')
-        self.add_key('inheritAccess')
-        self.add_key('isContainer')
-        self.add_key('utilizationPercentage')
-        self.add_key('hasRogueAddresses')
-        self.add_key('cloudNetworkRef')
-        self.add_key('cloudAllocationPools')
-        self.add_key('discoveredProperties')
-        self.add_key('creationTime')
+    fields = ('ref',
+              'name',
+              'from',
+              'to',
+              'parentRef',
+              'adSiteRef',
+              'childRanges',
+              'dhcpScopes',
+              'subnet',
+              'locked',
+              'autoAssign',
+              'hasSchedule',
+              'hasMonitor',
+              'customProperties',
+              'inheritAccess',
+              'isContainer',
+              'utilizationPercentage',
+              'hasRogueAddresses',
+              'cloudNetworkRef',
+              'cloudAllocationPools',
+              'discoveredProperties',
+              'creationTime')
 
 
 class Discovery(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(Discovery, self).__init__(*args, **kwargs)
-        self.add_key('interval')
-        self.add_key('unit')
-        self.add_key('enabled')
-        self.add_key('startTime')
+    fields = ('interval',
+              'unit',
+              'enabled',
+              'startTime')
 
 
 class AddressBlock(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(AddressBlock, self).__init__(*args, **kwargs)
-        self.add_key('from')
-        self.add_key('to')
+    fields = ('from',
+              'to')
 
 
 class GetRangeStatisticsResponse(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(GetRangeStatisticsResponse, self).__init__(*args, **kwargs)
-        self.add_key('used')
-        self.add_key('free')
-        self.add_key('numInSubranges')
-        self.add_key('percentInSubranges')
+    fields = ('used',
+              'free',
+              'numInSubranges',
+              'percentInSubranges')
 
 
 class Interface(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(Interface, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('clientIdentifier')
-        self.add_key('addresses')
-        self.add_key('customProperties')
-        self.add_key('deviceRef')
+    fields = ('ref',
+              'name',
+              'clientIdentifier',
+              'addresses',
+              'customProperties',
+              'deviceRef')
 
 
 class Device(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(Device, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('customProperties')
-        self.add_key('interfaces')
+    fields = ('ref',
+              'name',
+              'customProperties',
+              'interfaces')
 
 
 class ChangeRequest(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(ChangeRequest, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('requester')
-        self.add_key('state')
-        self.add_key('creationDate')
-        self.add_key('objType')
-        self.add_key('requestDate')
-        self.add_key('customProperties')
-        self.add_key('saveComment')
-        self.add_key('processedDate')
-        self.add_key('dnsZoneChanges')
-        self.add_key('dnsRecordChanges')
-        self.add_key('dhcpScopeChanges')
-        self.add_key('dhcpReservationChanges')
-        self.add_key('dhcpExclusionChanges')
-        self.add_key('dhcpAddressPoolChanges')
-        self.add_key('dhcpOptionChanges')
-        self.add_key('customPropertyChanges')
+    fields = ('ref',
+              'requester',
+              'state',
+              'creationDate',
+              'objType',
+              'requestDate',
+              'customProperties',
+              'saveComment',
+              'processedDate',
+              'dnsZoneChanges',
+              'dnsRecordChanges',
+              'dhcpScopeChanges',
+              'dhcpReservationChanges',
+              'dhcpExclusionChanges',
+              'dhcpAddressPoolChanges',
+              'dhcpOptionChanges',
+              'customPropertyChanges')
 
 
 class Folder(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(Folder, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('contentType')
-        self.add_key('parentRef')
+    fields = ('ref',
+              'name',
+              'contentType',
+              'parentRef')
 
 
 class IPAMRecords(BaseService):
@@ -220,8 +210,9 @@ class Ranges(BaseService):
         all_blocks = []
         range_response = self.client.get("{0}{1}/AddressBlocks".format(self.client.baseurl,
                                                                        range_ref))
+        factory = self.entity_factory(AddressBlock)
         for block in range_response['result']['addressBlocks']:
-            all_blocks.append(AddressBlock(block))
+            all_blocks.append(factory(block))
         return all_blocks
 
     def get_available_address_blocks(self, range_, **kwargs):
@@ -232,8 +223,9 @@ class Ranges(BaseService):
             "{0}{1}/AvailableAddressBlocks{2}".format(self.client.baseurl,
                                                       range_ref,
                                                       query_string))
+        factory = self.entity_factory(AddressBlock)
         for block in range_response['result']['addressBlocks']:
-            all_blocks.append(AddressBlock(block))
+            all_blocks.append(factory(block))
         return all_blocks
 
     def get_inherit_access(self, range_):
@@ -250,10 +242,39 @@ class Ranges(BaseService):
         record_response = self.client.get("{0}{1}/IPAMRecords{2}".format(self.client.baseurl,
                                                                          range_ref,
                                                                          query_string))
+        factory = self.entity_factory(IPAMRecord)
         for record in record_response['result']['ipamRecords']:
-            all_records.append(IPAMRecord(record))
+            all_records.append(factory(record))
         return all_records
 
+    def iter_ipam_records(self, range_, page_size=DEFAULT_PAGE_SIZE, stream=False, **kwargs):
+        range_ref = self.ref_or_raise(range_)
+        return self.iter_list("{0}/IPAMRecords".format(range_ref),
+                              'ipamRecords',
+                              IPAMRecord,
+                              page_size,
+                              stream,
+                              **kwargs)
+
+    def get_ipam_records_columns(self,
+                                 range_,
+                                 columns=IPAM_RECORD_COLUMNS,
+                                 result=None,
+                                 page_size=DEFAULT_PAGE_SIZE,
+                                 stream=False,
+                                 **kwargs):
+        # the IPAM records of range_ as a menandmice.columnar.ColumnarResult,
+        # pass result to append the records of another range to it
+        range_ref = self.ref_or_raise(range_)
+        if result is None:
+            result = ColumnarResult(columns)
+        return result.extend(self.iter_list("{0}/IPAMRecords".format(range_ref),
+                                            'ipamRecords',
+                                            None,
+                                            page_size,
+                                            stream,
+                                            **kwargs))
+
     def get_next_free_address(self, range_, **kwargs):
         range_ref = self.ref_or_raise(range_)
         query_string = ""
@@ -278,10 +299,20 @@ class Ranges(BaseService):
             "{0}{1}/Subranges{2}".format(self.client.baseurl,
                                          range_ref,
                                          query_string))
+        factory = self.entity_factory(Range)
         for range_ in range_response['result']['ranges']:
-            all_ranges.append(Range(range_))
+            all_ranges.append(factory(range_))
         return all_ranges
 
+    def iter_subranges(self, range_, page_size=DEFAULT_PAGE_SIZE, stream=False, **kwargs):
+        range_ref = self.ref_or_raise(range_)
+        return self.iter_list("{0}/Subranges".format(range_ref),
+                              'ranges',
+                              Range,
+                              page_size,
+                              stream,
+                              **kwargs)
+
 
 class Interfaces(BaseService):
     def __init__(self, client):
@@ -291,7 +322,7 @@ class Interfaces(BaseService):
                                          get_response_entity_key="interface",
                                          get_response_all_key="interfaces")
 
-    def add(self, interface, save_comment=""):
+    def add(self, interface, save_comment="", refs_only=False, max_workers=1):
         payload = {
             "saveComment": save_comment,
             "interface": interface
@@ -299,10 +330,7 @@ class Interfaces(BaseService):
         interface_json = self.client.post("{0}{1}".format(self.client.baseurl,
                                                           self.url_base),
                                           payload)
-        interface_return = []
-        for ref in interface_json['result']['objRefs']:
-            interface_return.append(self.get(ref)[0])
-        return interface_return
+        return self.get_created(interface_json['result']['objRefs'], refs_only, max_workers)
 
 
 class Devices(BaseService):
@@ -313,7 +341,7 @@ class Devices(BaseService):
                                       get_response_entity_key="device",
                                       get_response_all_key="devices")
 
-    def add(self, device, save_comment=""):
+    def add(self, device, save_comment="", refs_only=False, max_workers=1):
         payload = {
             "saveComment": save_comment,
             "device": device
@@ -321,10 +349,7 @@ class Devices(BaseService):
         device_json = self.client.post("{0}{1}".format(self.client.baseurl,
                                                        self.url_base),
                                        payload)
-        device_return = []
-        for ref in device_json['result']['objRefs']:
-            device_return.append(self.get(ref)[0])
-        return device_return
+        return self.get_created(device_json['result']['objRefs'], refs_only, max_workers)
 
 
 class ChangeRequests(BaseService):
@@ -346,7 +371,9 @@ class ChangeRequests(BaseService):
             custom_property_changes="",
             request_date="",
             custom_properties="",
-            save_comment=""):
+            save_comment="",
+            refs_only=False,
+            max_workers=1):
         if not isinstance(dns_zone_changes, list):
             dns_zone_changes = [dns_zone_changes]
         if not isinstance(dns_record_changes, list):
@@ -381,10 +408,12 @@ class ChangeRequests(BaseService):
         change_json = self.client.post("{0}{1}".format(self.client.baseurl,
                                                        self.url_base),
                                        payload)
-        change_return = []
-        for ref in change_json['result']['objRefs']:
-            change_return.append(self.get(ref)[0])
-        return change_return
+        return self.get_created(change_json['result']['objRefs'], refs_only, max_workers)
+
+
+def get_object(getter):
+    service, ref = getter
+    return service.get(ref)[0]
 
 
 class Folders(BaseService):
@@ -441,11 +470,38 @@ class Folders(BaseService):
                                payload,
                                True)
 
-    def get_all_objects(self, folder):
+    def get_folder_objects(self, folder):
+        # the {'objType': ..., 'ref': ...} entries of the objects in folder
         folder_ref = self.ref_or_raise(folder)
         object_json = self.client.get("{0}{1}/Objects".format(self.client.baseurl,
                                                               folder_ref))
-        all_objects = []
-        for o in object_json['result']['objects']:
-            all_objects.append(getattr(self.client, o['objType']).get(o['ref'])[0])
-        return all_objects
+        return object_json['result']['objects']
+
+    def object_getters(self, objects):
+        # (service, ref) for every object, the service of each objType is
+        # looked up once
+        services = {}
+        getters = []
+        for o in objects:
+            obj_type = o['objType']
+            service = services.get(obj_type)
+            if service is None:
+                service = services[obj_type] = getattr(self.client, obj_type)
+            getters.append((service, o['ref']))
+        return getters
+
+    def get_all_objects(self, folder, max_workers=1):
+        # the objects in folder in order, max_workers > 1 fetches them
+        # concurrently on that many threads
+        return bounded_map(get_object,
+                           self.object_getters(self.get_folder_objects(folder)),
+                           max_workers,
+                           self.client.release_session)
+
+    def iter_all_objects(self, folder, max_workers=DEFAULT_MAX_WORKERS):
+        # generator version of get_all_objects(), yields each object as soon
+        # as it and all objects before it have been fetched
+        return iter_ordered(get_object,
+                            self.object_getters(self.get_folder_objects(folder)),
+                            max_workers,
+                            self.client.release_session)
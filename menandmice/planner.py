@@ -0,0 +1,153 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Best-fit subnet planning over a RangeTree.
+#
+# SubnetPlanner finds where a new subnet of a given prefix length fits best
+# below a parent range: the candidates are the non-subnet ranges of the tree
+# matching the constraints, their free space is kept as IntervalSets split
+# into aligned prefixes, and the block is taken from the smallest free prefix
+# that holds it (like a buddy allocator, large blocks stay intact). Only the
+# chosen parent is checked with the server before the range is created.
+
+from menandmice.addresses import BITS
+from menandmice.addresses import format_bounds
+from menandmice.addresses import int_to_address
+from menandmice.addresses import parse_subnet
+from menandmice.addresses import range_bounds
+from menandmice.concurrency import DEFAULT_MAX_WORKERS
+from menandmice.concurrency import bounded_map
+from menandmice.intervals import IntervalSet
+from menandmice.intervals import best_fit_among
+
+
+class PlanningError(Exception):
+    pass
+
+
+def matches(range_, custom_properties=None, ad_site_ref=None):
+    if ad_site_ref is not None and range_.get('adSiteRef') != ad_site_ref:
+        return False
+    if custom_properties:
+        properties = range_.get('customProperties') or {}
+        for name, value in custom_properties.items():
+            if properties.get(name) != value:
+                return False
+    return True
+
+
+class SubnetPlanner(object):
+    # free_blocks - {ref: IntervalSet} of already known free space, e.g.
+    #               UtilizationRollup.free_blocks, fetched when missing
+    def __init__(self, ranges_service, tree, free_blocks=None, max_workers=DEFAULT_MAX_WORKERS):
+        self.ranges_service = ranges_service
+        self.tree = tree
+        self.free_blocks = {} if free_blocks is None else free_blocks
+        self.max_workers = max_workers
+
+    def candidates(self, parent=None, custom_properties=None, ad_site_ref=None, version=None):
+        # the ranges below parent (a ref, None for the whole tree) a subnet
+        # can be created in, version (4 or 6) limits them to one family
+        result = []
+        for node in self.tree.walk(parent):
+            if node.range.get('subnet'):
+                continue
+            if version is not None and range_bounds(node.range)[0] != version:
+                continue
+            if matches(node.range, custom_properties, ad_site_ref):
+                result.append(node)
+        return result
+
+    def fetch_free_blocks(self, ref):
+        version = range_bounds(self.tree.get(ref))[0]
+        free = IntervalSet.from_blocks(self.ranges_service.get_available_address_blocks(ref),
+                                       version)
+        self.free_blocks[ref] = free
+        return free
+
+    def free_space(self, node):
+        # the free addresses of a range outside its (known) subranges
+        version = range_bounds(node.range)[0]
+        children = IntervalSet.from_blocks([child.range for child in node.children], version)
+        return self.free_blocks[node.ref] - children
+
+    def plan(self, prefix_length, parent=None, custom_properties=None, ad_site_ref=None,
+             version=None):
+        # (parent ref, "address/length") of the best fitting free block, or
+        # None; the free blocks of candidates not seen before are fetched
+        nodes = [node for node in self.candidates(parent, custom_properties, ad_site_ref, version)
+                 if prefix_length <= BITS[range_bounds(node.range)[0]]]
+        bounded_map(self.fetch_free_blocks,
+                    [node.ref for node in nodes if node.ref not in self.free_blocks],
+                    self.max_workers,
+                    self.ranges_service.client.release_session)
+        free = dict((node.ref, self.free_space(node)) for node in nodes)
+        best = best_fit_among(free, prefix_length)
+        if best is None:
+            return None
+        ref, first = best
+        return ref, "{0}/{1}".format(int_to_address(free[ref].version, first), prefix_length)
+
+    def verify(self, parent_ref, subnet):
+        # one server call: is subnet still free in parent_ref
+        _, first, last = parse_subnet(subnet)
+        free = self.fetch_free_blocks(parent_ref)
+        return free.intersection(IntervalSet([(first, last)], free.version)).count() == \
+            last - first + 1
+
+    def create(self,
+               prefix_length,
+               parent=None,
+               custom_properties=None,
+               ad_site_ref=None,
+               version=None,
+               properties=None,
+               discovery="",
+               save_comment="",
+               max_attempts=3):
+        # Plans a subnet, verifies it and creates it with Ranges.add(). The
+        # constraints select the parent, properties are more fields of the
+        # new range (customProperties, adSiteRef, ...).
+        # A block taken in the meantime makes the planner try again with
+        # the parent's fresh free blocks, up to max_attempts times.
+        for _ in range(max_attempts):
+            planned = self.plan(prefix_length, parent, custom_properties, ad_site_ref, version)
+            if planned is None:
+                raise PlanningError("No free /{0} below {1}"
+                                    .format(prefix_length, parent or "any range"))
+            parent_ref, subnet = planned
+            if not self.verify(parent_ref, subnet):
+                continue
+            family, first, last = parse_subnet(subnet)
+            if version is not None and family != version:
+                raise PlanningError("Planned {0} is not an IPv{1} subnet".format(subnet, version))
+            start, end = format_bounds(family, first, last)
+            range_ = {
+                'name': subnet,
+                'from': start,
+                'to': end,
+                'subnet': True,
+            }
+            range_.update(properties or {})
+            created = self.ranges_service.add(range_, discovery, save_comment)
+            node = self.tree.add(created, parent_ref)
+            node.loaded = True
+            self.free_blocks[parent_ref] = self.free_blocks[parent_ref] - \
+                IntervalSet([(first, last)], family)
+            return created
+        raise PlanningError("No free /{0} below {1} after {2} attempts"
+                            .format(prefix_length, parent or "any range", max_attempts))
@@ -0,0 +1,134 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Consistency checks over all ranges.
+#
+# audit_ranges() finds overlapping ranges, duplicates, ranges whose parentRef
+# isn't the smallest range containing them, orphans (parentRef not in the
+# listing) and the gaps between the children of each parent. It sorts the
+# ranges once and sweeps over them keeping the ranges that are still open
+# sorted by their end, O(n log n) plus the number of overlaps. Only the
+# bounds and refs of the ranges are kept, so it can consume a streamed
+# listing (Ranges.iter_get()) of hundreds of thousands of ranges.
+
+from bisect import bisect_left
+from bisect import insort
+from collections import defaultdict
+
+from menandmice.addresses import format_bounds
+from menandmice.addresses import range_bounds
+from menandmice.base import DEFAULT_PAGE_SIZE
+from menandmice.intervals import IntervalSet
+
+
+class RangeAudit(object):
+    def __init__(self):
+        # (ref, ref) pairs of ranges that overlap without one containing the other
+        self.overlaps = []
+        # (ref, ref) pairs of ranges with the same bounds
+        self.duplicates = []
+        # (ref, parentRef, ref of the smallest range containing it or None)
+        self.misparented = []
+        # (ref, parentRef) of ranges whose parent isn't in the listing
+        self.orphans = []
+        # (parentRef, first address, last address) not covered by any child
+        self.gaps = []
+        # (ref, error message) of ranges without usable bounds
+        self.invalid = []
+        self.count = 0
+
+    def __bool__(self):
+        # True when there is anything to fix, gaps are not errors
+        return bool(self.overlaps or self.duplicates or self.misparented or
+                    self.orphans or self.invalid)
+
+    __nonzero__ = __bool__
+
+
+def audit_ranges(ranges, gaps=True):
+    # ranges - any iterable of Ranges (or dicts with ref, from/to, parentRef)
+    audit = RangeAudit()
+    items = []
+    parents = {}
+    for range_ in ranges:
+        audit.count += 1
+        try:
+            version, first, last = range_bounds(range_)
+        except ValueError as e:
+            audit.invalid.append((range_.get('ref'), str(e)))
+            continue
+        ref = range_['ref']
+        parent_ref = range_.get('parentRef') or None
+        items.append((version, first, -last, ref))
+        parents[ref] = parent_ref
+
+    items.sort()
+    # the open ranges of the current family as (last, -first, ref), sorted
+    active = []
+    current_version = None
+    for version, first, negative_last, ref in items:
+        last = -negative_last
+        if version != current_version:
+            active = []
+            current_version = version
+        # drop the ranges that ended before this one starts
+        del active[:bisect_left(active, (first,))]
+        container = None
+        # partial overlaps end before this range, duplicates sort before
+        # the containers ending at the same address
+        for other_last, negative_other_first, other_ref in active:
+            if other_last < last:
+                audit.overlaps.append((other_ref, ref))
+            elif other_last == last and -negative_other_first == first:
+                audit.duplicates.append((other_ref, ref))
+            else:
+                # the open range ending first after this one is the innermost
+                # container, the ones after it contain it as well
+                container = other_ref
+                break
+        parent_ref = parents[ref]
+        if parent_ref is not None and parent_ref not in parents:
+            audit.orphans.append((ref, parent_ref))
+        elif parent_ref != container:
+            audit.misparented.append((ref, parent_ref, container))
+        insort(active, (last, -first, ref))
+
+    if gaps:
+        audit.gaps = find_gaps(items, parents)
+    return audit
+
+
+def find_gaps(items, parents):
+    bounds = dict((ref, (version, first, -negative_last))
+                  for version, first, negative_last, ref in items)
+    children = defaultdict(list)
+    for ref, parent_ref in parents.items():
+        if parent_ref in bounds and bounds[ref][0] == bounds[parent_ref][0]:
+            children[parent_ref].append(bounds[ref][1:])
+    result = []
+    for parent_ref in sorted(children, key=lambda ref: bounds[ref]):
+        version, first, last = bounds[parent_ref]
+        covered = IntervalSet(children[parent_ref], version)
+        uncovered = IntervalSet([(first, last)], version) - covered
+        for gap_first, gap_last in uncovered:
+            result.append((parent_ref,) + format_bounds(version, gap_first, gap_last))
+    return result
+
+
+def audit_service(ranges_service, page_size=DEFAULT_PAGE_SIZE, stream=True, gaps=True, **kwargs):
+    # audit_ranges() over the streamed listing of Ranges.get(**kwargs)
+    return audit_ranges(ranges_service.iter_get(page_size, stream, **kwargs), gaps)
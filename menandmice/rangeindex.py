@@ -0,0 +1,193 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Local address -> range index.
+#
+# Finds the most specific (smallest) range containing an address without a
+# IPAMRecords/<address>/Range call per address. The ranges of each address
+# family are flattened into sorted, disjoint segments, each owned by the
+# smallest range covering it, so a lookup is one bisect over the segment
+# starts. Adding, removing or refreshing ranges marks the family dirty and its
+# segments are rebuilt (O(n log n)) on the next lookup.
+
+import heapq
+import threading
+
+from bisect import bisect_right
+
+import requests
+
+from menandmice.addresses import address_to_int
+from menandmice.addresses import range_bounds
+from menandmice.concurrency import DEFAULT_MAX_WORKERS
+
+
+def build_segments(items):
+    # items - (first, last, ref) of one address family
+    # returns (starts, ends, refs) of the disjoint segments, each with the ref
+    # of the smallest item covering it (ties go to the lowest ref)
+    items = sorted(items)
+    points = sorted(set([first for first, _, _ in items] +
+                        [last + 1 for _, last, _ in items]))
+    starts = []
+    ends = []
+    refs = []
+    active = []
+    pos = 0
+    for point, next_point in zip(points, points[1:]):
+        while pos < len(items) and items[pos][0] <= point:
+            first, last, ref = items[pos]
+            heapq.heappush(active, (last - first, ref, last))
+            pos += 1
+        while active and active[0][2] < point:
+            heapq.heappop(active)
+        if not active:
+            continue
+        ref = active[0][1]
+        if refs and refs[-1] == ref and ends[-1] == point - 1:
+            ends[-1] = next_point - 1
+        else:
+            starts.append(point)
+            ends.append(next_point - 1)
+            refs.append(ref)
+    return starts, ends, refs
+
+
+class RangeIndex(object):
+    def __init__(self, ranges=()):
+        self.ranges = {}
+        self.bounds = {}
+        self._segments = {}
+        self._lock = threading.Lock()
+        self.update(ranges)
+
+    @classmethod
+    def load(cls, ranges_service, **kwargs):
+        # index of every range returned by Ranges.get(**kwargs), fetched page
+        # by page
+        return cls(ranges_service.iter_get(**kwargs))
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def __contains__(self, ref):
+        return ref in self.ranges
+
+    def __iter__(self):
+        return iter(list(self.ranges.values()))
+
+    def add(self, range_):
+        self.update([range_])
+
+    def update(self, ranges):
+        # adds ranges, or replaces the ones already indexed under the same ref
+        with self._lock:
+            for range_ in ranges:
+                ref = range_['ref']
+                old = self.bounds.get(ref)
+                bounds = range_bounds(range_)
+                self.ranges[ref] = range_
+                self.bounds[ref] = bounds
+                self._segments.pop(bounds[0], None)
+                if old is not None:
+                    self._segments.pop(old[0], None)
+
+    def remove(self, range_or_ref):
+        ref = range_or_ref if not hasattr(range_or_ref, 'get') else range_or_ref['ref']
+        with self._lock:
+            if ref not in self.ranges:
+                return False
+            del self.ranges[ref]
+            self._segments.pop(self.bounds.pop(ref)[0], None)
+            return True
+
+    def children(self, parent):
+        # the indexed ranges whose parentRef is parent (a ref or range)
+        parent_ref = parent if not hasattr(parent, 'get') else parent['ref']
+        return [range_ for range_ in list(self.ranges.values())
+                if range_.get('parentRef') == parent_ref]
+
+    def segments(self, version):
+        segments = self._segments.get(version)
+        if segments is None:
+            with self._lock:
+                segments = self._segments.get(version)
+                if segments is None:
+                    segments = build_segments(
+                        [(first, last, ref)
+                         for ref, (range_version, first, last) in self.bounds.items()
+                         if range_version == version])
+                    self._segments[version] = segments
+        return segments
+
+    def lookup_int(self, version, value):
+        # ref of the most specific range containing the address, or None
+        starts, ends, refs = self.segments(version)
+        index = bisect_right(starts, value) - 1
+        if index >= 0 and value <= ends[index]:
+            return refs[index]
+        return None
+
+    def lookup_ref(self, address):
+        return self.lookup_int(*address_to_int(address))
+
+    def lookup(self, address):
+        # the most specific range containing address, or None
+        ref = self.lookup_ref(address)
+        return None if ref is None else self.ranges.get(ref)
+
+    def lookup_many(self, addresses):
+        # {address: range or None} for many addresses
+        return dict((address, self.lookup(address)) for address in addresses)
+
+    def refresh(self, ranges_service, refs, max_workers=DEFAULT_MAX_WORKERS):
+        # Fetches refs again and updates the index with them, refs the server
+        # no longer knows (404) are removed. Other errors are raised after the
+        # ranges that could be fetched have been updated.
+        entities, errors = ranges_service.get_many(refs, max_workers)
+        self.update(entities.values())
+        error = None
+        for ref, e in errors.items():
+            response = getattr(e, 'response', None)
+            if isinstance(e, requests.exceptions.HTTPError) and \
+                    response is not None and response.status_code == 404:
+                self.remove(ref)
+            elif error is None:
+                error = e
+        if error is not None:
+            raise error
+        return entities
+
+    def remove_subtree(self, range_or_ref):
+        # removes a range and every indexed range below it
+        todo = [range_or_ref if not hasattr(range_or_ref, 'get') else range_or_ref['ref']]
+        while todo:
+            ref = todo.pop()
+            todo.extend(range_['ref'] for range_ in self.children(ref))
+            self.remove(ref)
+
+    def refresh_subranges(self, ranges_service, parent, **kwargs):
+        # replaces the indexed children of parent with its current subranges,
+        # children that are gone are removed with their subtree
+        parent_ref = ranges_service.ref_or_raise(parent)
+        subranges = ranges_service.get_subranges(parent_ref, **kwargs)
+        current = set(range_['ref'] for range_ in subranges)
+        for range_ in self.children(parent_ref):
+            if range_['ref'] not in current:
+                self.remove_subtree(range_)
+        self.update(subranges)
+        return subranges
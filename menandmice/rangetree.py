@@ -0,0 +1,197 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# In-memory range hierarchy.
+#
+# RangeTree.crawl() loads the tree below a set of root ranges breadth-first,
+# fetching the subranges of every range of a level concurrently on a bounded
+# pool of threads. The tree can be serialized with to_json() and restored
+# with from_json(), so later lookups need no server calls, and a single
+# subtree can be refreshed without crawling everything again.
+
+from collections import deque
+
+from menandmice import codec
+from menandmice.concurrency import DEFAULT_MAX_WORKERS
+from menandmice.concurrency import bounded_map
+from menandmice.ipam import Range
+
+
+class RangeNode(object):
+    __slots__ = ('range', 'parent', 'children', 'depth', 'loaded')
+
+    def __init__(self, range_, parent=None):
+        self.range = range_
+        self.parent = parent
+        self.children = []
+        self.depth = 0 if parent is None else parent.depth + 1
+        # True once the subranges of this range have been fetched
+        self.loaded = False
+
+    @property
+    def ref(self):
+        return self.range['ref']
+
+    def __repr__(self):
+        return "RangeNode({0!r}, children={1})".format(self.ref, len(self.children))
+
+
+def has_no_children(range_):
+    # only skip ranges the server says are empty, None means unknown
+    return range_.get('childRanges') in ([], 0)
+
+
+class RangeTree(object):
+    def __init__(self):
+        self.nodes = {}
+        self.roots = []
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, ref):
+        return ref in self.nodes
+
+    def __getitem__(self, ref):
+        return self.nodes[ref]
+
+    def get(self, ref):
+        node = self.nodes.get(ref)
+        return None if node is None else node.range
+
+    def add(self, range_, parent=None):
+        # adds range_ under parent (a RangeNode, a ref or None for a root)
+        if parent is not None and not isinstance(parent, RangeNode):
+            parent = self.nodes[parent]
+        node = RangeNode(range_, parent)
+        self.nodes[node.ref] = node
+        if parent is None:
+            self.roots.append(node)
+        else:
+            parent.children.append(node)
+        return node
+
+    def remove_children(self, ref):
+        # drops everything below ref and marks it as not loaded
+        node = self.nodes[ref]
+        todo = list(node.children)
+        while todo:
+            child = todo.pop()
+            todo.extend(child.children)
+            self.nodes.pop(child.ref, None)
+        node.children = []
+        node.loaded = False
+
+    @classmethod
+    def crawl(cls,
+              ranges_service,
+              roots=None,
+              max_depth=None,
+              max_workers=DEFAULT_MAX_WORKERS,
+              **kwargs):
+        # roots - ranges or refs to start from, None for the top level ranges
+        #         (the ones Ranges.get(**kwargs) returns without a parentRef)
+        # max_depth - levels below the roots to load, None for all
+        tree = cls()
+        if roots is None:
+            roots = [range_ for range_ in ranges_service.iter_get(**kwargs)
+                     if not range_.get('parentRef')]
+        else:
+            roots = [root if hasattr(root, 'get') else ranges_service.get(root)[0]
+                     for root in roots]
+        nodes = [tree.add(root) for root in roots]
+        tree.load(ranges_service, nodes, max_depth, max_workers)
+        return tree
+
+    def load(self, ranges_service, nodes, max_depth=None, max_workers=DEFAULT_MAX_WORKERS):
+        # fetches the subtrees below nodes breadth-first, one level at a time,
+        # max_depth counts the levels below nodes
+        level = list(nodes)
+        depth = 0
+        while level and (max_depth is None or depth < max_depth):
+            todo = []
+            for node in level:
+                if has_no_children(node.range):
+                    node.loaded = True
+                else:
+                    todo.append(node)
+            children = bounded_map(lambda node: list(ranges_service.iter_subranges(node.ref)),
+                                   todo,
+                                   max_workers,
+                                   ranges_service.client.release_session)
+            level = []
+            for node, subranges in zip(todo, children):
+                node.loaded = True
+                for range_ in subranges:
+                    if range_['ref'] not in self.nodes:
+                        level.append(self.add(range_, node))
+            depth += 1
+
+    def refresh_subtree(self,
+                        ranges_service,
+                        ref,
+                        max_depth=None,
+                        max_workers=DEFAULT_MAX_WORKERS):
+        # crawls the ranges below ref again, the rest of the tree is kept
+        self.remove_children(ref)
+        self.load(ranges_service, [self.nodes[ref]], max_depth, max_workers)
+        return self.nodes[ref]
+
+    def walk(self, ref=None):
+        # nodes depth first in tree order, below (and including) ref or all
+        stack = list(reversed(self.roots if ref is None else [self.nodes[ref]]))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def breadth_first(self, ref=None):
+        queue = deque(self.roots if ref is None else [self.nodes[ref]])
+        while queue:
+            node = queue.popleft()
+            yield node
+            queue.extend(node.children)
+
+    def ancestors(self, ref):
+        # ranges from the parent of ref up to its root
+        node = self.nodes[ref].parent
+        result = []
+        while node is not None:
+            result.append(node.range)
+            node = node.parent
+        return result
+
+    def descendants(self, ref):
+        return [node.range for node in self.walk(ref)][1:]
+
+    def ranges(self):
+        return [node.range for node in self.walk()]
+
+    def to_json(self):
+        # parents always precede their children
+        return codec.dumps([{'range': dict(node.range.items()),
+                             'parentRef': node.parent.ref if node.parent is not None else None,
+                             'loaded': node.loaded}
+                            for node in self.breadth_first()])
+
+    @classmethod
+    def from_json(cls, data, entity_class=Range):
+        tree = cls()
+        for entry in codec.loads(data):
+            node = tree.add(entity_class(entry['range']), entry['parentRef'])
+            node.loaded = entry['loaded']
+        return tree
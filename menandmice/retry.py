@@ -0,0 +1,184 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import random
+import threading
+import time
+
+import requests
+
+# Python 2 and 3 compatible
+from future.standard_library import install_aliases
+install_aliases()
+from urllib.parse import urlparse  # noqa: E402
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([500, 502, 503, 504])
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+class RetryPolicy(object):
+    # Retries failed requests with jittered exponential backoff.
+    #
+    # max_retries - number of retries after the first attempt (0 = never retry)
+    # backoff_factor - the n-th retry waits a random time between 0 and
+    #                  backoff_factor * 2^n seconds ("full jitter")
+    # max_backoff - upper bound of a single wait, also caps Retry-After
+    # methods - HTTP verbs that are retried, only idempotent verbs by default
+    #           since a POST that timed out may still have created objects
+    # statuses - HTTP status codes that are retried
+    def __init__(self,
+                 max_retries=3,
+                 backoff_factor=0.5,
+                 max_backoff=30.0,
+                 methods=IDEMPOTENT_METHODS,
+                 statuses=RETRY_STATUSES):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.methods = frozenset(m.upper() for m in methods)
+        self.statuses = frozenset(statuses)
+        self.sleep = time.sleep
+        self.stats = {'retries': 0, 'exhausted': 0}
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def can_retry(self, method, attempt):
+        return method.upper() in self.methods and attempt < self.max_retries
+
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(self.max_backoff, float(retry_after)))
+            except ValueError:
+                # Retry-After as an HTTP date, fall back to our own backoff
+                pass
+        return delay
+
+    def send(self, method, url, request, circuit_breaker=None):
+        # request - callable without arguments that performs the HTTP request
+        #           and returns a requests.Response
+        host = urlparse(url).netloc
+        attempt = 0
+        while True:
+            if circuit_breaker is not None:
+                circuit_breaker.before_request(host)
+            retry_after = None
+            try:
+                response = request()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if circuit_breaker is not None:
+                    circuit_breaker.record_failure(host)
+                if not self.can_retry(method, attempt):
+                    if attempt:
+                        self.count('exhausted')
+                    raise
+            except Exception:
+                # not retried, but a failure all the same (and the end of a
+                # half-open trial)
+                if circuit_breaker is not None:
+                    circuit_breaker.record_failure(host)
+                raise
+            else:
+                if response.status_code not in self.statuses:
+                    if circuit_breaker is not None:
+                        circuit_breaker.record_success(host)
+                    return response
+                if circuit_breaker is not None:
+                    circuit_breaker.record_failure(host)
+                if not self.can_retry(method, attempt):
+                    if attempt:
+                        self.count('exhausted')
+                    return response
+                retry_after = response.headers.get('Retry-After')
+                response.close()
+            self.count('retries')
+            self.sleep(self.backoff(attempt, retry_after))
+            attempt += 1
+
+
+class CircuitBreaker(object):
+    # Per-host circuit breaker. After failure_threshold consecutive failures
+    # the circuit for that host opens and requests fail fast with
+    # CircuitOpenError. After reset_timeout seconds a single trial request is
+    # let through (half-open), its outcome closes or re-opens the circuit.
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = time.time
+        self.stats = {'trips': 0, 'rejected': 0}
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def state(self, host):
+        with self._lock:
+            return self._host(host)['state']
+
+    def _host(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = {'state': CLOSED, 'failures': 0, 'opened_at': 0}
+        return self._hosts[host]
+
+    def before_request(self, host):
+        with self._lock:
+            circuit = self._host(host)
+            if circuit['state'] == CLOSED:
+                return
+            if (circuit['state'] == OPEN and
+                    self.clock() - circuit['opened_at'] >= self.reset_timeout):
+                circuit['state'] = HALF_OPEN
+                return
+            self.stats['rejected'] += 1
+        raise CircuitOpenError(
+            "Circuit breaker for {0} is open, not sending request".format(host))
+
+    def record_success(self, host):
+        with self._lock:
+            circuit = self._host(host)
+            circuit['state'] = CLOSED
+            circuit['failures'] = 0
+
+    def release(self, host):
+        # a request given up by the caller (cancelled) says nothing about the
+        # host: a half-open trial is returned without a verdict, the next
+        # request becomes the trial
+        with self._lock:
+            circuit = self._host(host)
+            if circuit['state'] == HALF_OPEN:
+                circuit['state'] = OPEN
+
+    def record_failure(self, host):
+        with self._lock:
+            circuit = self._host(host)
+            circuit['failures'] += 1
+            if (circuit['state'] == HALF_OPEN or
+                    (circuit['state'] == CLOSED and
+                     circuit['failures'] >= self.failure_threshold)):
+                circuit['state'] = OPEN
+                circuit['opened_at'] = self.clock()
+                self.stats['trips'] += 1
@@ -0,0 +1,105 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Subtree utilization computed locally.
+#
+# UtilizationRollup computes Ranges/<ref>/Statistics style numbers (used,
+# free, numInSubranges, percentInSubranges) for every range of a RangeTree
+# from the free address blocks of each range, one AvailableAddressBlocks call
+# per range instead of a Statistics call per range and refresh. A range's
+# free addresses are its own free blocks outside its subranges plus the free
+# addresses of the subranges. Free blocks and results are cached, after a
+# change mark_dirty() drops the range and the results of its ancestors, and
+# the next rollup() only recomputes those.
+
+import threading
+
+from menandmice.addresses import range_bounds
+from menandmice.concurrency import DEFAULT_MAX_WORKERS
+from menandmice.concurrency import bounded_map
+from menandmice.intervals import IntervalSet
+from menandmice.ipam import GetRangeStatisticsResponse
+
+
+class UtilizationRollup(object):
+    def __init__(self, ranges_service, tree, max_workers=DEFAULT_MAX_WORKERS):
+        self.ranges_service = ranges_service
+        self.tree = tree
+        self.max_workers = max_workers
+        # ref -> IntervalSet of the free addresses the server reported
+        self.free_blocks = {}
+        # ref -> GetRangeStatisticsResponse
+        self.statistics = {}
+        self._lock = threading.Lock()
+
+    def set_free_blocks(self, ref, blocks):
+        # use already known free blocks (AddressBlocks or an IntervalSet)
+        if not isinstance(blocks, IntervalSet):
+            blocks = IntervalSet.from_blocks(blocks, range_bounds(self.tree.get(ref))[0])
+        with self._lock:
+            self.free_blocks[ref] = blocks
+        self.mark_dirty(ref, blocks=False)
+
+    def mark_dirty(self, ref, blocks=True):
+        # the addresses of ref changed, blocks=False keeps its free blocks
+        # (only its subranges changed)
+        with self._lock:
+            if blocks:
+                self.free_blocks.pop(ref, None)
+            node = self.tree[ref]
+            while node is not None:
+                self.statistics.pop(node.ref, None)
+                node = node.parent
+
+    def fetch_free_blocks(self, refs):
+        def fetch(ref):
+            version = range_bounds(self.tree.get(ref))[0]
+            return IntervalSet.from_blocks(self.ranges_service.get_available_address_blocks(ref),
+                                           version)
+
+        results = bounded_map(fetch, refs, self.max_workers,
+                              self.ranges_service.client.release_session)
+        with self._lock:
+            self.free_blocks.update(zip(refs, results))
+
+    def rollup(self, ref=None):
+        # statistics of ref (or of every root, as a dict) and all ranges below
+        nodes = list(self.tree.walk(ref))
+        dirty = [node for node in nodes if node.ref not in self.statistics]
+        self.fetch_free_blocks([node.ref for node in dirty
+                                if node.ref not in self.free_blocks])
+        # reversed depth first order has the children before their parents
+        for node in reversed(dirty):
+            self.statistics[node.ref] = self.compute(node)
+        if ref is not None:
+            return self.statistics[ref]
+        return dict((node.ref, self.statistics[node.ref]) for node in self.tree.roots)
+
+    def compute(self, node):
+        version, first, last = range_bounds(node.range)
+        size = last - first + 1
+        area = IntervalSet.from_range(node.range)
+        in_subranges = IntervalSet.from_blocks([child.range for child in node.children],
+                                               version) & area
+        own_free = (self.free_blocks[node.ref] & area) - in_subranges
+        free = own_free.count() + sum(self.statistics[child.ref]['free']
+                                      for child in node.children)
+        num_in_subranges = in_subranges.count()
+        return GetRangeStatisticsResponse(used=size - free,
+                                          free=free,
+                                          numInSubranges=num_in_subranges,
+                                          percentInSubranges=100.0 * num_in_subranges / size)
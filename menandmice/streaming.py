@@ -0,0 +1,181 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import codecs
+import json
+import re
+
+# bytes read from the socket per chunk when streaming a response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER_CHARS = re.compile(r'[0-9.eE+-]*')
+
+# parser states
+OBJECT_START = 0
+KEY = 1
+COLON = 2
+VALUE = 3
+AFTER_VALUE = 4
+ARRAY_START = 5
+FIRST_ELEMENT = 6
+ELEMENT = 7
+AFTER_ELEMENT = 8
+DONE = 9
+
+
+class NeedMoreData(Exception):
+    pass
+
+
+class JSONArrayParser(object):
+    # Incremental (push) parser that extracts the elements of one array out of
+    # a JSON document, for example path=('result', 'dnsRecords') for
+    # {"result": {"dnsRecords": [...], "totalResults": 2}}
+    #
+    # Feed it the raw body chunk by chunk, every call returns the array
+    # elements that were completed by that chunk. Only the current element is
+    # buffered, so memory use is bound by the largest element instead of the
+    # size of the whole body. Values outside of the path are skipped.
+
+    def __init__(self, path):
+        self.path = tuple(path)
+        self.depth = 0
+        self.state = OBJECT_START
+        self.key = None
+        self.buf = u""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+
+    @property
+    def done(self):
+        return self.state == DONE
+
+    def feed(self, data):
+        if isinstance(data, bytes):
+            data = self.text_decoder.decode(data)
+        # drop everything that has already been consumed
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return self.parse()
+
+    def close(self):
+        self.buf = self.buf[self.pos:] + self.text_decoder.decode(b"", final=True)
+        self.pos = 0
+        self.eof = True
+        elements = self.parse()
+        if self.state != DONE:
+            raise KeyError("/".join(self.path))
+        return elements
+
+    def skip_whitespace(self):
+        self.pos = WHITESPACE.match(self.buf, self.pos).end()
+        if self.pos >= len(self.buf):
+            raise NeedMoreData()
+        return self.buf[self.pos]
+
+    def expect(self, chars):
+        char = self.skip_whitespace()
+        if char not in chars:
+            raise ValueError("Expected one of {0!r} at position {1}, found {2!r}".format(
+                chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        self.skip_whitespace()
+        try:
+            value, end = self.decoder.raw_decode(self.buf, self.pos)
+        except ValueError:
+            if self.eof:
+                raise
+            raise NeedMoreData()
+        # a number that runs up to the end of the buffer might continue in the
+        # next chunk ("8." + "25")
+        if not self.eof and NUMBER_CHARS.match(self.buf, end).end() >= len(self.buf):
+            raise NeedMoreData()
+        self.pos = end
+        return value
+
+    def parse(self):
+        elements = []
+        try:
+            while self.state != DONE:
+                self.step(elements)
+        except NeedMoreData:
+            if self.eof and self.state != DONE:
+                raise ValueError("Unexpected end of JSON document")
+        return elements
+
+    def step(self, elements):
+        if self.state == OBJECT_START:
+            self.expect("{")
+            self.state = KEY
+        elif self.state == KEY:
+            if self.expect('"}') == "}":
+                # the object ended without containing the path
+                raise KeyError("/".join(self.path))
+            self.pos -= 1
+            self.key = self.decode_value()
+            self.state = COLON
+        elif self.state == COLON:
+            self.expect(":")
+            self.state = VALUE
+        elif self.state == VALUE:
+            if self.key != self.path[self.depth]:
+                self.decode_value()
+                self.state = AFTER_VALUE
+            elif self.depth == len(self.path) - 1:
+                self.state = ARRAY_START
+            else:
+                self.depth += 1
+                self.state = OBJECT_START
+        elif self.state == AFTER_VALUE:
+            if self.expect(",}") == "}":
+                raise KeyError("/".join(self.path))
+            self.state = KEY
+        elif self.state == ARRAY_START:
+            self.expect("[")
+            self.state = FIRST_ELEMENT
+        elif self.state == FIRST_ELEMENT:
+            if self.skip_whitespace() == "]":
+                self.pos += 1
+                self.state = DONE
+            else:
+                self.state = ELEMENT
+        elif self.state == ELEMENT:
+            elements.append(self.decode_value())
+            self.state = AFTER_ELEMENT
+        elif self.state == AFTER_ELEMENT:
+            if self.expect(",]") == ",":
+                self.state = ELEMENT
+            else:
+                self.state = DONE
+
+
+def iter_json_array(chunks, path):
+    # generator version of JSONArrayParser for an iterable of chunks
+    parser = JSONArrayParser(path)
+    for chunk in chunks:
+        for element in parser.feed(chunk):
+            yield element
+        if parser.done:
+            return
+    for element in parser.close():
+        yield element
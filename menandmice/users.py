@@ -20,38 +20,32 @@ from menandmice.base import BaseService
 
 
 class Role(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(Role, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('description')
-        self.add_key('users', [])  # list of User()
-        self.add_key('groups', [])  # list of Group()
+    fields = ('ref',
+              'name',
+              'description',
+              ('users', list),  # list of User()
+              ('groups', list))  # list of Group()
 
 
 class User(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(User, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('password')
-        self.add_key('fullName')
-        self.add_key('description')
-        self.add_key('email')
-        self.add_key('authenticationType')
-        self.add_key('roles', [])  # list of Role()
-        self.add_key('groups', [])  # list of Group()
+    fields = ('ref',
+              'name',
+              'password',
+              'fullName',
+              'description',
+              'email',
+              'authenticationType',
+              ('roles', list),  # list of Role()
+              ('groups', list))  # list of Group()
 
 
 class Group(BaseObject):
-    def __init__(self, *args, **kwargs):
-        super(Group, self).__init__(*args, **kwargs)
-        self.add_key('ref')
-        self.add_key('name')
-        self.add_key('description')
-        self.add_key('adIntegrated')
-        self.add_key('groupMembers', [])   # list of User()
-        self.add_key('roles', [])   # list of Role()
+    fields = ('ref',
+              'name',
+              'description',
+              'adIntegrated',
+              ('groupMembers', list),  # list of User()
+              ('roles', list))  # list of Role()
 
 
 class Groups(BaseService):
@@ -62,7 +56,7 @@ class Groups(BaseService):
                                      get_response_entity_key="group",
                                      get_response_all_key="groups")
 
-    def add(self, group_input, save_comment=""):
+    def add(self, group_input, save_comment="", refs_only=False, max_workers=1):
         payload = {
             "saveComment": save_comment,
             "group": group_input
@@ -70,10 +64,7 @@ class Groups(BaseService):
         group_json = self.client.post("{0}{1}".format(self.client.baseurl,
                                                       self.url_base),
                                       payload)
-        group_return = []
-        for ref in group_json['result']['objRefs']:
-            group_return.append(self.get(ref)[0])
-        return group_return
+        return self.get_created(group_json['result']['objRefs'], refs_only, max_workers)
 
     def get_group_roles(self, group, **kwargs):
         group_ref = self.ref_or_raise(group)
@@ -82,8 +73,9 @@ class Groups(BaseService):
         role_response = self.client.get("{0}{1}/Roles{2}".format(self.client.baseurl,
                                                                  group_ref,
                                                                  query_string))
+        factory = self.entity_factory(Role)
         for role in role_response['result']['roles']:
-            all_roles.append(Role(role))
+            all_roles.append(factory(role))
         return all_roles
 
     def delete_group_role(self, group, role, save_comment=""):
@@ -115,8 +107,9 @@ class Groups(BaseService):
         role_response = self.client.get("{0}{1}/Users{2}".format(self.client.baseurl,
                                                                  group_ref,
                                                                  query_string))
+        factory = self.entity_factory(User)
         for user in role_response['result']['users']:
-            all_users.append(User(user))
+            all_users.append(factory(user))
         return all_users
 
     def delete_group_user(self, group, user, save_comment=""):
@@ -150,7 +143,7 @@ class Roles(BaseService):
                                     get_response_entity_key="role",
                                     get_response_all_key="roles")
 
-    def add(self, role, save_comment=""):
+    def add(self, role, save_comment="", refs_only=False, max_workers=1):
         payload = {
             "saveComment": save_comment,
             "role": role
@@ -158,10 +151,7 @@ class Roles(BaseService):
         role_json = self.client.post("{0}{1}".format(self.client.baseurl,
                                                      self.url_base),
                                      payload)
-        role_return = []
-        for ref in role_json['result']['objRefs']:
-            role_return.append(self.get(ref)[0])
-        return role_return
+        return self.get_created(role_json['result']['objRefs'], refs_only, max_workers)
 
     def get_role_groups(self, role, **kwargs):
         role_ref = self.ref_or_raise(role)
@@ -170,8 +160,9 @@ class Roles(BaseService):
         group_response = self.client.get("{0}{1}/Groups{2}".format(self.client.baseurl,
                                                                    role_ref,
                                                                    query_string))
+        factory = self.entity_factory(Group)
         for group in group_response['result']['groups']:
-            all_groups.append(Group(group))
+            all_groups.append(factory(group))
         return all_groups
 
     def get_role_users(self, role, **kwargs):
@@ -181,8 +172,9 @@ class Roles(BaseService):
         user_response = self.client.get("{0}{1}/Users{2}".format(self.client.baseurl,
                                                                  role_ref,
                                                                  query_string))
+        factory = self.entity_factory(User)
         for user in user_response['result']['users']:
-            all_users.append(User(user))
+            all_users.append(factory(user))
         return all_users
 
 
@@ -194,7 +186,7 @@ class Users(BaseService):
                                     get_response_entity_key="user",
                                     get_response_all_key="users")
 
-    def add(self, user, save_comment=""):
+    def add(self, user, save_comment="", refs_only=False, max_workers=1):
         payload = {
             "saveComment": save_comment,
             "user": user
@@ -202,10 +194,7 @@ class Users(BaseService):
         user_json = self.client.post("{0}{1}".format(self.client.baseurl,
                                                      self.url_base),
                                      payload)
-        user_return = []
-        for ref in user_json['result']['objRefs']:
-            user_return.append(self.get(ref)[0])
-        return user_return
+        return self.get_created(user_json['result']['objRefs'], refs_only, max_workers)
 
     def get_user_groups(self, user, **kwargs):
         user_ref = self.ref_or_raise(user)
@@ -214,8 +203,9 @@ class Users(BaseService):
         group_response = self.client.get("{0}{1}/Groups{2}".format(self.client.baseurl,
                                                                    user_ref,
                                                                    query_string))
+        factory = self.entity_factory(Group)
         for group in group_response['result']['groups']:
-            all_groups.append(Group(group))
+            all_groups.append(factory(group))
         return all_groups
 
     def get_user_roles(self, user, **kwargs):
@@ -225,8 +215,9 @@ class Users(BaseService):
         role_response = self.client.get("{0}{1}/Roles{2}".format(self.client.baseurl,
                                                                  user_ref,
                                                                  query_string))
+        factory = self.entity_factory(Role)
         for role in role_response['result']['roles']:
-            all_roles.append(Role(role))
+            all_roles.append(factory(role))
         return all_roles
 
     def delete_user_role(self, user, role, save_comment=""):
@@ -59,6 +59,11 @@ setup(
     license=license,
     install_requires=install_reqs,
     dependency_links=dep_links,
+    extras_require={
+        'async': ['aiohttp'],
+        'fast': ['orjson'],
+        'columnar': ['numpy', 'pandas'],
+    },
     test_suite="nose.collector",
     tests_require=["nose", "mock"],
     packages=find_packages(exclude=['tests'])
@@ -23,6 +23,11 @@ import unittest
 
 # utilities
 import os
+import time
+
+from menandmice.history import event_time
+from menandmice.ipam import AddressBlock
+from menandmice.ipam import Range
 
 # variables to allow integration testing with a real server
 MM_SERVER = os.getenv('MM_SERVER', 'testserver')
@@ -30,6 +35,30 @@ MM_USERNAME = os.getenv('MM_USERNAME', 'testusername')
 MM_PASSWORD = os.getenv('MM_USERNAME', 'testpassword')
 
 
+def make_range(ref, start=None, end=None, parent_ref=None, **kwargs):
+    range_ = Range(ref=ref, parentRef=parent_ref, **kwargs)
+    if start is not None:
+        range_['from'] = start
+    if end is not None:
+        range_['to'] = end
+    return range_
+
+
+def block(start, end):
+    return AddressBlock({'from': start, 'to': end})
+
+
+def timestamp(seconds):
+    # an Event timestamp as the server formats it
+    return time.strftime('%b %d, %Y %H:%M:%S', time.gmtime(seconds))
+
+
+def history_page(events, sortOrder=None, limit=None, offset=0):
+    # events as the History endpoint returns them for these query arguments
+    events = sorted(events, key=event_time, reverse=sortOrder == 'Descending')
+    return events[offset:None if limit is None else offset + limit]
+
+
 class BaseTest(unittest.TestCase):
 
     @property
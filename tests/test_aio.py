@@ -0,0 +1,463 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from mock import AsyncMock, MagicMock, call
+
+import asyncio
+import unittest
+
+import menandmice
+import requests
+
+from menandmice.concurrency import DeadlineExceeded
+from menandmice.retry import CircuitBreaker
+from menandmice.retry import RetryPolicy
+
+try:
+    import aiohttp  # noqa
+    from menandmice.aio import AsyncClient
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@unittest.skipUnless(HAS_AIOHTTP, "aiohttp is not installed")
+class TestAsyncClient(BaseTest):
+
+    def setUp(self):
+        super(TestAsyncClient, self).setUp()
+        self.async_client = AsyncClient(self.server, self.username, self.password)
+
+    def test_init(self):
+        client = self.async_client
+        self.assertEqual(client.baseurl, self.url_base)
+        self.assertIsInstance(client, menandmice.client.Client)
+        self.assertIsInstance(client.DNSZones, menandmice.dns.DNSZones)
+        self.assertIsInstance(client.DNSRecords, menandmice.dns.DNSRecords)
+        self.assertIsInstance(client.DNSViews, menandmice.dns.DNSViews)
+        self.assertIsInstance(client.Folders, menandmice.ipam.Folders)
+        self.assertIsInstance(client.Users, menandmice.users.Users)
+        self.assertIsInstance(client.Groups, menandmice.users.Groups)
+        self.assertIsInstance(client.Roles, menandmice.users.Roles)
+        self.assertIsInstance(client.IPAMRecords, menandmice.ipam.IPAMRecords)
+        self.assertIsInstance(client.Ranges, menandmice.ipam.Ranges)
+        self.assertIsInstance(client.Interfaces, menandmice.ipam.Interfaces)
+        self.assertIsInstance(client.Devices, menandmice.ipam.Devices)
+        self.assertIsInstance(client.ChangeRequests, menandmice.ipam.ChangeRequests)
+        self.assertEqual(client.DNSZones.client, client)
+
+    def test_get_200(self):
+        url = self.url_base + "fake"
+        self.async_client.request = AsyncMock(return_value=(200, "OK", {"result": 1}))
+
+        result = run(self.async_client.get(url))
+
+        self.async_client.request.assert_called_with("GET", url)
+        self.assertEqual(result, {"result": 1})
+
+    def test_get_204(self):
+        self.async_client.request = AsyncMock(return_value=(204, "No Content", None))
+        result = run(self.async_client.get(self.url_base + "fake"))
+        self.assertEqual(result, "No data to display")
+
+    def test_get_error(self):
+        error = {"error": {"code": 123, "message": "this is a test"}}
+        self.async_client.request = AsyncMock(return_value=(400, "Bad Request", error))
+
+        with self.assertRaises(requests.exceptions.HTTPError) as context:
+            run(self.async_client.get(self.url_base + "fake"))
+
+        self.assertEqual(str(context.exception), '123: this is a test')
+        self.assertEqual(context.exception.response.status_code, 400)
+
+    def test_get_error_no_json(self):
+        self.async_client.request = AsyncMock(return_value=(502, "Bad Gateway", None))
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            run(self.async_client.get(self.url_base + "fake"))
+
+    def test_post_put_delete(self):
+        url = self.url_base + "fake"
+        self.async_client.request = AsyncMock(return_value=(201, "Created", {"x": 1}))
+        self.assertEqual(run(self.async_client.post(url, {"a": "b"})), {"x": 1})
+        self.async_client.request.assert_called_with("POST", url, {"a": "b"})
+
+        self.async_client.request = AsyncMock(return_value=(204, "No Content", None))
+        self.assertEqual(run(self.async_client.put(url, {"a": "b"})),
+                         "Successfully updated!")
+        self.async_client.request.assert_called_with("PUT", url, {"a": "b"})
+
+        self.assertEqual(run(self.async_client.delete(url)), "Successfully removed!")
+        self.async_client.request.assert_called_with("DELETE", url)
+
+    def test_request(self):
+        url = self.url_base + "fake"
+        response = MagicMock()
+        response.status = 200
+        response.reason = "OK"
+        response.read = AsyncMock(return_value=b'{"result": {"x": 1}}')
+        session = MagicMock()
+        session.request.return_value.__aenter__.return_value = response
+        self.async_client.session = session
+
+        result = run(self.async_client.request("PUT", url, {"a": 1}))
+
+        session.request.assert_called_with("PUT", url, json={"a": 1})
+        self.assertEqual(result, (200, "OK", {"result": {"x": 1}}))
+
+    def test_request_other_error(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        client = AsyncClient(self.server, self.username, self.password, circuit_breaker=breaker)
+        client.send = AsyncMock(side_effect=ValueError("bad body"))
+
+        with self.assertRaises(ValueError):
+            run(client.request("GET", self.url_base + "fake"))
+
+        self.assertEqual(breaker.state(self.server), 'open')
+
+    def test_cancelled_requests(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        client = AsyncClient(self.server, self.username, self.password, circuit_breaker=breaker)
+
+        async def slow_send(method, url, payload=None):
+            await asyncio.sleep(1)
+
+        client.send = slow_send
+
+        async def cancel_all():
+            refs = ["DNSZones/{0}".format(i) for i in range(10)]
+            result = await client.DNSZones.get_many(refs, timeout=0.05)
+            # let the cancelled tasks finish
+            await asyncio.sleep(0.01)
+            return result
+
+        entities, errors = run(cancel_all())
+
+        self.assertEqual(len(errors), 10)
+        self.assertEqual(breaker.state(self.server), 'closed')
+
+    def test_cancelled_half_open_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure(self.server)
+        client = AsyncClient(self.server, self.username, self.password, circuit_breaker=breaker)
+
+        async def slow_send(method, url, payload=None):
+            await asyncio.sleep(1)
+
+        client.send = slow_send
+
+        with self.assertRaises(asyncio.TimeoutError):
+            run(asyncio.wait_for(client.request("GET", self.url_base + "fake"), 0.01))
+
+        # no verdict, the next request is the trial
+        self.assertEqual(breaker.state(self.server), 'open')
+        self.assertEqual(breaker.stats['trips'], 1)
+        client.send = AsyncMock(return_value=(200, "OK", {}, None))
+        run(client.request("GET", self.url_base + "fake"))
+        self.assertEqual(breaker.state(self.server), 'closed')
+
+    def test_close(self):
+        session = MagicMock()
+        session.close = AsyncMock()
+        self.async_client.session = session
+
+        async def use():
+            async with self.async_client as client:
+                self.assertIs(client, self.async_client)
+
+        run(use())
+        session.close.assert_called_with()
+        self.assertIsNone(self.async_client._session)
+
+    def test_service_get(self):
+        client = self.async_client
+        client.get = AsyncMock(return_value={'result': {'dnsZones': [{'ref': 'a'},
+                                                                     {'ref': 'b'}]}})
+
+        result = run(client.DNSZones.get(filter="x"))
+
+        client.get.assert_called_with("{0}DNSZones?filter=x".format(self.url_base))
+        self.assertEqual(result, [menandmice.dns.DNSZone(ref='a'),
+                                  menandmice.dns.DNSZone(ref='b')])
+        self.assertIsInstance(result[0], menandmice.dns.DNSZone)
+
+    def test_service_get_ref(self):
+        client = self.async_client
+        client.get = AsyncMock(return_value={'result': {'range': {'ref': 'Ranges/1'}}})
+
+        result = run(client.Ranges.get('Ranges/1'))
+
+        client.get.assert_called_with("{0}Ranges/1".format(self.url_base))
+        self.assertEqual(result, [menandmice.ipam.Range(ref='Ranges/1')])
+
+    def test_service_add(self):
+        client = self.async_client
+        client.post = AsyncMock(return_value={'result': {'objRefs': ['Users/1', 'Users/2']}})
+        client.get = AsyncMock(side_effect=[{'result': {'user': {'ref': 'Users/1'}}},
+                                            {'result': {'user': {'ref': 'Users/2'}}}])
+
+        result = run(client.Users.add({'name': 'test'}))
+
+        client.get.assert_has_calls([call("{0}Users/1".format(self.url_base)),
+                                     call("{0}Users/2".format(self.url_base))])
+        self.assertEqual([u['ref'] for u in result], ['Users/1', 'Users/2'])
+        self.assertIsInstance(result[0], menandmice.users.User)
+
+    def test_service_passthrough(self):
+        client = self.async_client
+        client.delete = AsyncMock(return_value="Successfully removed!")
+
+        result = run(client.DNSZones.delete('DNSZones/1'))
+
+        client.delete.assert_called_with("{0}DNSZones/1".format(self.url_base))
+        self.assertEqual(result, "Successfully removed!")
+
+    def test_get_records(self):
+        client = self.async_client
+        client.get = AsyncMock(return_value={'result': {'dnsRecords': [{'ref': 'r1'}]}})
+
+        result = run(client.DNSZones.get_records('DNSZones/1'))
+
+        client.get.assert_called_with("{0}DNSZones/1/DNSRecords".format(self.url_base))
+        self.assertEqual(result, [menandmice.dns.DNSRecord(ref='r1')])
+
+    def test_get_item_history(self):
+        client = self.async_client
+        client.get = AsyncMock(return_value={'result': {'events': [{'objRef': 'x'}]}})
+
+        result = run(client.DNSZones.get_history('DNSZones/1'))
+
+        client.get.assert_called_with("{0}DNSZones/1/History".format(self.url_base))
+        self.assertEqual(result, [menandmice.client.Event(objRef='x')])
+
+    def test_iter_ipam_records(self):
+        client = self.async_client
+        client.get = AsyncMock(side_effect=[
+            {'result': {'ipamRecords': [{'address': '10.0.0.1'}, {'address': '10.0.0.2'}]}},
+            {'result': {'ipamRecords': []}}])
+
+        async def collect():
+            return [r async for r in client.Ranges.iter_ipam_records('Ranges/1', page_size=2)]
+
+        result = run(collect())
+
+        self.assertEqual([r['address'] for r in result], ['10.0.0.1', '10.0.0.2'])
+        self.assertIsInstance(result[0], menandmice.ipam.IPAMRecord)
+        self.assertEqual(client.get.call_count, 2)
+
+    def test_get_all_objects(self):
+        client = self.async_client
+        objects = [{'objType': 'Devices', 'ref': 'Devices/{0}'.format(i)} for i in range(10)]
+
+        async def get(url):
+            if url.endswith('/Objects'):
+                return {'result': {'objects': objects}}
+            await asyncio.sleep(0.001)
+            return {'result': {'device': {'ref': url[len(self.url_base):]}}}
+
+        client.get = get
+
+        async def stream():
+            return [d async for d in client.Folders.iter_all_objects('Folders/1', 3)]
+
+        expected = [o['ref'] for o in objects]
+        result = run(client.Folders.get_all_objects('Folders/1'))
+        self.assertEqual([d['ref'] for d in result], expected)
+        result = run(client.Folders.get_all_objects('Folders/1', max_workers=2))
+        self.assertEqual([d['ref'] for d in result], expected)
+        self.assertEqual([d['ref'] for d in run(stream())], expected)
+
+    def test_get_many(self):
+        client = self.async_client
+
+        async def get(url):
+            ref = url[len(self.url_base):]
+            if ref == 'Devices/bad':
+                raise ValueError(ref)
+            await asyncio.sleep(1 if ref == 'Devices/slow' else 0)
+            return {'result': {'device': {'ref': ref}}}
+
+        client.get = get
+        refs = ['Devices/1', 'Devices/bad', 'Devices/1', 'Devices/slow', 'Devices/2']
+
+        entities, errors = run(client.Devices.get_many(refs, max_workers=2, timeout=0.1))
+
+        self.assertEqual(list(entities), ['Devices/1', 'Devices/2'])
+        self.assertEqual(list(errors), ['Devices/bad', 'Devices/slow'])
+        self.assertIsInstance(errors['Devices/bad'], ValueError)
+        self.assertIsInstance(errors['Devices/slow'], DeadlineExceeded)
+
+    def test_add_max_workers(self):
+        client = self.async_client
+        client.post = AsyncMock(return_value={'result': {'objRefs': ['Devices/{0}'.format(i)
+                                                                     for i in range(10)]}})
+        running = [0, 0]
+
+        async def get(url):
+            running[0] += 1
+            running[1] = max(running)
+            await asyncio.sleep(0.001)
+            running[0] -= 1
+            return {'result': {'device': {'ref': url[len(self.url_base):]}}}
+
+        client.get = get
+
+        result = run(client.Devices.add({'name': 'x'}, max_workers=3))
+        refs = run(client.Devices.add({'name': 'x'}, refs_only=True))
+
+        self.assertEqual([d['ref'] for d in result], ['Devices/{0}'.format(i) for i in range(10)])
+        self.assertEqual(running[1], 3)
+        self.assertEqual(refs, ['Devices/{0}'.format(i) for i in range(10)])
+
+    def test_get_ipam_records_columns(self):
+        client = self.async_client
+        client.get = AsyncMock(return_value={
+            'result': {'ipamRecords': [{'address': '10.0.0.1', 'state': 'Free'},
+                                       {'address': '10.0.0.2', 'state': 'Assigned'}]}})
+
+        result = run(client.Ranges.get_ipam_records_columns('Ranges/1', page_size=None))
+
+        self.assertEqual(len(result), 2)
+        self.assertEqual(list(result['address'].lo), [0x0a000001, 0x0a000002])
+        self.assertEqual(result['state'].categories, ['Free', 'Assigned'])
+
+    def test_get_stream(self):
+        body = b'{"result": {"ipamRecords": [{"address": "10.0.0.1"}, {"address": "10.0.0.2"}]}}'
+
+        async def iter_chunked(size):
+            for i in range(0, len(body), 7):
+                yield body[i:i + 7]
+
+        response = MagicMock()
+        response.status = 200
+        response.content.iter_chunked = iter_chunked
+        session = MagicMock()
+        session.request.return_value.__aenter__.return_value = response
+        self.async_client.session = session
+
+        async def collect():
+            return [r async for r in self.async_client.Ranges.iter_ipam_records(
+                'Ranges/1', page_size=None, stream=True)]
+
+        result = run(collect())
+
+        session.request.assert_called_with("GET", "{0}Ranges/1/IPAMRecords".format(self.url_base))
+        self.assertEqual(result, [menandmice.ipam.IPAMRecord(address="10.0.0.1"),
+                                  menandmice.ipam.IPAMRecord(address="10.0.0.2")])
+
+    def test_get_stream_retry(self):
+        breaker = CircuitBreaker()
+        client = AsyncClient(self.server, self.username, self.password,
+                             retry_policy=RetryPolicy(max_retries=2, backoff_factor=0),
+                             circuit_breaker=breaker)
+        unavailable = MagicMock()
+        unavailable.status = 503
+        unavailable.reason = "Service Unavailable"
+        unavailable.headers = {}
+        unavailable.read = AsyncMock(return_value=b'')
+        response = MagicMock()
+        response.status = 200
+
+        async def iter_chunked(size):
+            yield b'{"result": {"ipamRecords": [{"address": "10.0.0.1"}]}}'
+
+        response.content.iter_chunked = iter_chunked
+        contexts = [MagicMock(), MagicMock()]
+        contexts[0].__aenter__.return_value = unavailable
+        contexts[1].__aenter__.return_value = response
+        session = MagicMock()
+        session.request.side_effect = contexts
+        client.session = session
+
+        async def collect():
+            return [r async for r in client.get_stream(self.url_base + "Ranges/1/IPAMRecords",
+                                                       'ipamRecords')]
+
+        self.assertEqual(run(collect()), [{"address": "10.0.0.1"}])
+        self.assertEqual(session.request.call_count, 2)
+        self.assertEqual(client.retry_policy.stats['retries'], 1)
+        # both responses were closed
+        contexts[0].__aexit__.assert_called_once()
+        contexts[1].__aexit__.assert_called_once()
+
+    def test_get_stream_error(self):
+        response = MagicMock()
+        response.status = 404
+        response.reason = "Not Found"
+        response.headers = {}
+        response.read = AsyncMock(return_value=b'')
+        session = MagicMock()
+        session.request.return_value.__aenter__.return_value = response
+        self.async_client.session = session
+
+        async def collect():
+            url = self.url_base + "Ranges/9/IPAMRecords"
+            return [r async for r in self.async_client.get_stream(url, 'ipamRecords')]
+
+        with self.assertRaises(requests.exceptions.HTTPError) as context:
+            run(collect())
+        self.assertEqual(context.exception.response.status_code, 404)
+
+    def test_single_flight(self):
+        client = AsyncClient(self.server, self.username, self.password, single_flight=True)
+        calls = []
+
+        async def fetch(url):
+            calls.append(url)
+            await asyncio.sleep(0.01)
+            return {'result': {'range': {'ref': 'Ranges/1'}}}
+
+        client.fetch = fetch
+
+        async def many():
+            return await asyncio.gather(*[client.Ranges.get('Ranges/1') for _ in range(10)])
+
+        results = run(many())
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[menandmice.ipam.Range(ref='Ranges/1')]] * 10)
+        self.assertEqual(client.in_flight, {})
+
+    def test_single_flight_after_write(self):
+        client = AsyncClient(self.server, self.username, self.password, single_flight=True)
+        names = ["a.", "b."]
+
+        async def fetch(url):
+            name = names.pop(0)
+            await asyncio.sleep(0.01 if names else 0)
+            return {'result': {'dnsZone': {'name': name}}}
+
+        client.fetch = fetch
+        client.request_with_retry = AsyncMock(return_value=(204, "No Content", None))
+
+        async def read_write_read():
+            before = asyncio.ensure_future(client.DNSZones.get('DNSZones/1'))
+            await asyncio.sleep(0)
+            await client.DNSZones.update('DNSZones/1', {'name': "b."}, 'DNSZone', "", True)
+            after = await client.DNSZones.get('DNSZones/1')
+            return await before, after
+
+        before, after = run(read_write_read())
+
+        self.assertEqual(before[0]['name'], "a.")
+        self.assertEqual(after[0]['name'], "b.")
+        self.assertEqual(client.in_flight, {})
@@ -0,0 +1,308 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from mock import Mock
+
+import threading
+
+from menandmice.allocator import AllocationError
+from menandmice.allocator import RangeAllocator
+from menandmice.client import strip_empty
+from menandmice.ipam import IPAMRecord
+from menandmice.ipam import Range
+
+
+class FakeServer(object):
+    # IPAM records of 10.0.0.0/24 with the given addresses in use
+    def __init__(self, used=(), claimed_by_others=()):
+        self.used = set(used)
+        self.claimed_by_others = set(claimed_by_others)
+        # address -> token of the claiming allocator
+        self.tokens = {}
+        # addresses another allocator claims right after our claim
+        self.stolen = set()
+        self.gets = 0
+        self.lock = threading.Lock()
+        # called when the records of a load were read
+        self.on_records = None
+
+    def records(self, range_ref, page_size):
+        with self.lock:
+            used = set(self.used)
+        if self.on_records is not None:
+            self.on_records()
+        for i in range(256):
+            address = "10.0.0.{0}".format(i)
+            yield IPAMRecord(address=address,
+                             state="Assigned" if address in used else "Free",
+                             claimed=False)
+
+    def get(self, ref):
+        address = ref.split('/', 1)[1]
+        with self.lock:
+            self.gets += 1
+            used = address in self.used or address in self.claimed_by_others
+            token = self.tokens.get(address)
+        return [IPAMRecord(address=address, state="Free", claimed=used,
+                           customProperties={'AllocationToken': token})]
+
+    def update(self, ref, properties, obj_type, save_comment):
+        address = ref.split('/', 1)[1]
+        with self.lock:
+            if properties['claimed']:
+                self.used.add(address)
+                self.tokens[address] = properties['AllocationToken']
+                if address in self.stolen:
+                    self.tokens[address] = "other"
+            else:
+                self.used.discard(address)
+                self.tokens.pop(address, None)
+
+    def put(self, url, payload, sanitize_override=False):
+        if not sanitize_override:
+            payload = strip_empty(payload)
+        address = url.rsplit('/', 1)[1]
+        properties = payload['properties'][0]
+        with self.lock:
+            if not properties['claimed']:
+                self.used.discard(address)
+            if 'AllocationToken' in properties:
+                self.tokens[address] = properties['AllocationToken']
+
+
+class TestRangeAllocator(BaseTest):
+
+    def setUp(self):
+        super(TestRangeAllocator, self).setUp()
+        self.range = Range(ref="Ranges/1", name="10.0.0.0/24", subnet=True,
+                           **{'from': "10.0.0.0", 'to': "10.0.0.255"})
+
+    def make_client(self, server):
+        client = Mock()
+        client.Ranges.iter_ipam_records.side_effect = server.records
+        client.IPAMRecords.url_base = "IPAMRecords"
+        client.IPAMRecords.get.side_effect = server.get
+        client.IPAMRecords.update.side_effect = server.update
+        client.baseurl = "http://mm/mmws/api/"
+        client.put.side_effect = server.put
+        return client
+
+    def test_load(self):
+        server = FakeServer(used=["10.0.0.1", "10.0.0.2"])
+        allocator = RangeAllocator(self.make_client(server), self.range)
+
+        self.assertFalse(allocator.is_free("10.0.0.0"))
+        self.assertFalse(allocator.is_free("10.0.0.1"))
+        self.assertTrue(allocator.is_free("10.0.0.3"))
+        self.assertFalse(allocator.is_free("10.0.0.255"))
+        self.assertEqual(allocator.free_count(), 252)
+        with self.assertRaises(ValueError):
+            allocator.is_free("10.0.1.0")
+
+    def test_range_ref(self):
+        server = FakeServer()
+        client = self.make_client(server)
+        client.Ranges.get.return_value = [self.range]
+
+        allocator = RangeAllocator(client, "Ranges/1")
+
+        client.Ranges.get.assert_called_with("Ranges/1")
+        self.assertEqual(allocator.ref, "Ranges/1")
+
+    def test_too_large(self):
+        range_ = Range(ref="Ranges/6", **{'from': "2001:db8::", 'to': "2001:db8::ffff:ffff:ffff"})
+        with self.assertRaises(ValueError):
+            RangeAllocator(Mock(), range_)
+
+    def test_reserve_release(self):
+        allocator = RangeAllocator(self.make_client(FakeServer(used=["10.0.0.2"])), self.range)
+
+        self.assertEqual(allocator.reserve(3), ["10.0.0.1", "10.0.0.3", "10.0.0.4"])
+        allocator.release("10.0.0.3")
+        self.assertEqual(allocator.reserve(), ["10.0.0.3"])
+        self.assertEqual(allocator.reserve(), ["10.0.0.5"])
+
+        with self.assertRaises(AllocationError):
+            allocator.reserve(300)
+        # a failed reserve() doesn't keep anything reserved
+        self.assertEqual(allocator.free_count(), 249)
+
+    def test_allocate(self):
+        server = FakeServer(used=["10.0.0.1"])
+        client = self.make_client(server)
+        allocator = RangeAllocator(client, self.range, save_comment="deploy")
+
+        self.assertEqual(allocator.allocate(2), ["10.0.0.2", "10.0.0.3"])
+
+        client.IPAMRecords.update.assert_called_with("IPAMRecords/10.0.0.3",
+                                                     {'claimed': True,
+                                                      'AllocationToken': allocator.token},
+                                                     'IPAMRecord',
+                                                     "deploy")
+        self.assertEqual(server.used, set(["10.0.0.1", "10.0.0.2", "10.0.0.3"]))
+        client.Ranges.iter_ipam_records.assert_called_once_with("Ranges/1", 1000)
+
+    def test_allocate_conflicts(self):
+        server = FakeServer(claimed_by_others=["10.0.0.1", "10.0.0.3"])
+        allocator = RangeAllocator(self.make_client(server), self.range)
+
+        self.assertEqual(allocator.allocate(3), ["10.0.0.2", "10.0.0.4", "10.0.0.5"])
+        self.assertEqual(allocator.stats['conflicts'], 2)
+        self.assertEqual(allocator.stats['loads'], 1)
+
+    def test_allocate_lost_race(self):
+        # 10.0.0.1 is claimed by another allocator right after our claim
+        server = FakeServer()
+        server.stolen.add("10.0.0.1")
+        allocator = RangeAllocator(self.make_client(server), self.range)
+
+        self.assertEqual(allocator.allocate(2), ["10.0.0.2", "10.0.0.3"])
+        self.assertEqual(allocator.stats['conflicts'], 1)
+        self.assertEqual(server.tokens["10.0.0.1"], "other")
+
+    def test_allocate_reloads(self):
+        others = ["10.0.0.{0}".format(i) for i in range(1, 20)]
+        server = FakeServer(claimed_by_others=others)
+        client = self.make_client(server)
+        allocator = RangeAllocator(client, self.range, max_conflicts=4)
+        # the reload sees the addresses the others claimed in the meantime
+        server.used.update(others)
+
+        self.assertEqual(allocator.allocate(2), ["10.0.0.20", "10.0.0.21"])
+        self.assertEqual(allocator.stats['loads'], 2)
+        # the conflicts before the reload, then a read before and after each claim
+        self.assertLessEqual(server.gets, 6 + 2 * 2)
+
+    def test_reload_keeps_reservations(self):
+        server = FakeServer()
+        allocator = RangeAllocator(self.make_client(server), self.range)
+        # reserved by another thread, its claim isn't on the server yet
+        self.assertEqual(allocator.reserve(), ["10.0.0.1"])
+
+        allocator.load()
+
+        self.assertFalse(allocator.is_free("10.0.0.1"))
+        self.assertEqual(allocator.reserve(), ["10.0.0.2"])
+        allocator.release("10.0.0.1")
+        allocator.load()
+        self.assertTrue(allocator.is_free("10.0.0.1"))
+
+    def test_reload_keeps_claims_during_load(self):
+        server = FakeServer()
+        allocator = RangeAllocator(self.make_client(server), self.range)
+        claimed = []
+        # another thread claims an address after the load read the records
+        server.on_records = lambda: claimed.extend(allocator.allocate())
+
+        allocator.load()
+
+        self.assertEqual(claimed, ["10.0.0.1"])
+        self.assertFalse(allocator.is_free("10.0.0.1"))
+        server.on_records = None
+        allocator.load()
+        self.assertFalse(allocator.is_free("10.0.0.1"))
+
+    def test_unclaim(self):
+        server = FakeServer()
+        client = self.make_client(server)
+        allocator = RangeAllocator(client, self.range, save_comment="undo")
+        address = allocator.allocate()[0]
+
+        allocator.unclaim(address)
+
+        # the token is cleared on the server, not stripped from the request
+        self.assertEqual(server.tokens[address], "")
+        self.assertNotIn(address, server.used)
+        self.assertTrue(allocator.is_free(address))
+        url, payload = client.put.call_args[0]
+        self.assertEqual(url, "http://mm/mmws/api/IPAMRecords/10.0.0.1")
+        self.assertEqual(payload['saveComment'], "undo")
+
+        # an address claimed by someone else is only released locally
+        server.tokens[address] = "other"
+        server.used.add(address)
+        allocator.unclaim(address)
+        self.assertEqual(client.put.call_count, 1)
+
+    def test_allocate_concurrent(self):
+        server = FakeServer()
+        allocator = RangeAllocator(self.make_client(server), self.range)
+        results = []
+
+        def worker():
+            results.extend(allocator.allocate(10, max_workers=3))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 50)
+        self.assertEqual(len(set(results)), 50)
+        self.assertEqual(server.used, set(results))
+
+    def test_allocate_error(self):
+        server = FakeServer()
+        client = self.make_client(server)
+        client.IPAMRecords.update.side_effect = ValueError("down")
+        allocator = RangeAllocator(client, self.range)
+
+        with self.assertRaises(ValueError):
+            allocator.allocate(2)
+        self.assertEqual(allocator.free_count(), 254)
+
+    def test_allocate_error_unclaims(self):
+        server = FakeServer()
+        client = self.make_client(server)
+        allocator = RangeAllocator(client, self.range)
+
+        def update(ref, properties, obj_type, save_comment):
+            if ref == "IPAMRecords/10.0.0.3":
+                raise ValueError("down")
+            server.update(ref, properties, obj_type, save_comment)
+
+        client.IPAMRecords.update.side_effect = update
+        # 10.0.0.1 is taken, 10.0.0.2 gets claimed and the claim of 10.0.0.3 fails
+        server.claimed_by_others.add("10.0.0.1")
+        with self.assertRaises(ValueError) as context:
+            allocator.allocate(3)
+
+        self.assertEqual(server.used, set())
+        self.assertEqual(server.tokens, {"10.0.0.2": ""})
+        self.assertEqual(context.exception.leaked_addresses, [])
+        self.assertTrue(allocator.is_free("10.0.0.2"))
+
+    def test_allocate_error_leaks(self):
+        server = FakeServer()
+        client = self.make_client(server)
+        allocator = RangeAllocator(client, self.range)
+
+        def update(ref, properties, obj_type, save_comment):
+            if ref == "IPAMRecords/10.0.0.2":
+                # the server goes down
+                client.IPAMRecords.get.side_effect = ValueError("down")
+                raise ValueError("down")
+            server.update(ref, properties, obj_type, save_comment)
+
+        client.IPAMRecords.update.side_effect = update
+        with self.assertRaises(ValueError) as context:
+            allocator.allocate(2)
+
+        self.assertEqual(context.exception.leaked_addresses, ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(server.tokens, {"10.0.0.1": allocator.token})
@@ -22,6 +22,8 @@ import json
 
 from menandmice.base import BaseObject
 from menandmice.base import BaseService
+from menandmice.compact import compact_class
+from menandmice.dns import DNSRecord
 
 
 class TestBaseObject(BaseTest):
@@ -109,6 +111,73 @@ class TestBaseObject(BaseTest):
         self.assertEqual(result, "")
 
 
+class Nested(BaseObject):
+    fields = ('a',
+              'b')
+
+
+class Entity(BaseObject):
+    fields = ('ref',
+              ('state', 'Free'),
+              ('items', list),
+              ('nested', Nested))
+
+
+class SubEntity(Entity):
+    fields = Entity.fields + ('extra',)
+
+
+class TestBaseObjectFields(BaseTest):
+
+    def test_defaults(self):
+        obj = Entity()
+        self.assertEqual(obj, {'ref': None,
+                               'state': 'Free',
+                               'items': [],
+                               'nested': {'a': None, 'b': None}})
+        self.assertIsInstance(obj['nested'], Nested)
+
+    def test_data(self):
+        obj = Entity({'ref': 'Ranges/1', 'other': 1}, state='Assigned')
+        self.assertEqual(obj, {'ref': 'Ranges/1',
+                               'state': 'Assigned',
+                               'other': 1,
+                               'items': [],
+                               'nested': {'a': None, 'b': None}})
+
+    def test_factories_not_shared(self):
+        first = Entity()
+        second = Entity()
+        self.assertIsNot(first['items'], second['items'])
+        self.assertIsNot(first['nested'], second['nested'])
+
+    @patch.object(Entity, 'fields', ('ref', ('nested', Mock())))
+    def test_factory_only_for_missing(self):
+        Entity._schema = None
+        try:
+            factory = Entity.fields[1][1]
+            obj = Entity(ref='x', nested={'a': 1})
+            factory.assert_not_called()
+            self.assertEqual(obj['nested'], {'a': 1})
+
+            obj = Entity(ref='x')
+            factory.assert_called_once_with()
+        finally:
+            Entity._schema = None
+
+    def test_subclass(self):
+        self.assertEqual(sorted(SubEntity()), ['extra', 'items', 'nested', 'ref', 'state'])
+        self.assertEqual(sorted(Entity()), ['items', 'nested', 'ref', 'state'])
+        self.assertIs(SubEntity.schema().cls, SubEntity)
+
+    def test_add_key(self):
+        obj = Entity()
+        obj.add_key('state', 'Assigned')
+        obj.add_key('new', 1)
+        self.assertEqual(obj['state'], 'Free')
+        self.assertEqual(obj['new'], 1)
+
+
 class TestBaseService(BaseTest):
 
     def test_init(self):
@@ -648,6 +717,92 @@ class TestBaseService(BaseTest):
                                                                   expected_save_comment)
         self.assertEquals(result, expected_result)
 
+    def test_iter_get(self):
+        pages = [{'result': {'all': [{'ref': 1}, {'ref': 2}], 'totalResults': 5}},
+                 {'result': {'all': [{'ref': 3}, {'ref': 4}], 'totalResults': 5}},
+                 {'result': {'all': [{'ref': 5}], 'totalResults': 5}}]
+        mock_client = Mock()
+        mock_client.baseurl = self.url_base
+        mock_client.get.side_effect = pages
+
+        obj = BaseService(client=mock_client,
+                          url_base="DNSZones",
+                          entity_class=BaseObject,
+                          get_response_all_key='all')
+        result = obj.iter_get(page_size=2, filter="x")
+
+        # nothing is fetched until the generator is consumed
+        mock_client.get.assert_not_called()
+        self.assertEqual([e['ref'] for e in result], [1, 2, 3, 4, 5])
+        self.assertEqual(mock_client.get.call_count, 3)
+        url = mock_client.get.call_args_list[1][0][0]
+        self.assertTrue(url.startswith("{0}DNSZones?".format(self.url_base)))
+        self.assertIn("offset=2", url)
+        self.assertIn("limit=2", url)
+        self.assertIn("filter=x", url)
+
+    def test_iter_list_short_page(self):
+        mock_client = Mock()
+        mock_client.baseurl = self.url_base
+        mock_client.get.side_effect = [{'result': {'items': [{'a': 1}, {'a': 2}]}},
+                                       {'result': {'items': [{'a': 3}]}}]
+        obj = BaseService(client=mock_client)
+
+        result = list(obj.iter_list("Ranges/1/IPAMRecords", 'items', BaseObject, 2))
+
+        self.assertEqual(result, [{'a': 1}, {'a': 2}, {'a': 3}])
+        self.assertEqual(mock_client.get.call_count, 2)
+
+    def test_iter_list_limit_offset(self):
+        mock_client = Mock()
+        mock_client.baseurl = self.url_base
+        mock_client.get.side_effect = [{'result': {'items': [{'a': 1}, {'a': 2}]}},
+                                       {'result': {'items': [{'a': 3}]}}]
+        obj = BaseService(client=mock_client)
+
+        result = list(obj.iter_list("Ranges", 'items', BaseObject, 2, limit=3, offset=10))
+
+        self.assertEqual(len(result), 3)
+        urls = [c[0][0] for c in mock_client.get.call_args_list]
+        self.assertIn("offset=10", urls[0])
+        self.assertIn("limit=2", urls[0])
+        self.assertIn("offset=12", urls[1])
+        self.assertIn("limit=1", urls[1])
+
+    def test_iter_list_no_content(self):
+        mock_client = Mock()
+        mock_client.baseurl = self.url_base
+        mock_client.get.return_value = "No data to display"
+        obj = BaseService(client=mock_client)
+
+        self.assertEqual(list(obj.iter_list("Ranges", 'ranges', BaseObject)), [])
+
+    def test_iter_list_stream(self):
+        mock_client = Mock()
+        mock_client.baseurl = self.url_base
+        mock_client.get_stream.side_effect = [iter([{'a': 1}, {'a': 2}]),
+                                              iter([{'a': 3}])]
+        obj = BaseService(client=mock_client)
+
+        result = list(obj.iter_list("Ranges", 'ranges', BaseObject, 2, stream=True))
+
+        self.assertEqual(result, [{'a': 1}, {'a': 2}, {'a': 3}])
+        mock_client.get.assert_not_called()
+        self.assertEqual(mock_client.get_stream.call_count, 2)
+        self.assertEqual(mock_client.get_stream.call_args[0][1], 'ranges')
+
+    def test_iter_list_no_paging(self):
+        mock_client = Mock()
+        mock_client.baseurl = self.url_base
+        mock_client.get_stream.return_value = iter([{'a': 1}, {'a': 2}])
+        obj = BaseService(client=mock_client)
+
+        result = list(obj.iter_list("Ranges", 'ranges', BaseObject, None, stream=True))
+
+        self.assertEqual(len(result), 2)
+        mock_client.get_stream.assert_called_once_with("{0}Ranges".format(self.url_base),
+                                                       'ranges')
+
     def test_ref_or_raise_str(self):
         expected_ref_str = "DNSZone/123"
         obj = BaseService()
@@ -669,6 +824,13 @@ class TestBaseService(BaseTest):
         result = obj.ref_or_raise(expected_ref_dict, key=expected_ref_key)
         self.assertEquals(result, expected_ref_str)
 
+    def test_ref_or_raise_mapping(self):
+        expected_ref_str = "DNSRecords/123"
+        record = compact_class(DNSRecord)(ref=expected_ref_str)
+        obj = BaseService()
+        result = obj.ref_or_raise(record)
+        self.assertEqual(result, expected_ref_str)
+
     def test_ref_or_raise_raise(self):
         expected_ref_int = 123
         obj = BaseService()
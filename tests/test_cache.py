@@ -0,0 +1,216 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from mock import Mock, patch
+
+import menandmice
+
+from menandmice.cache import ResponseCache
+
+
+class TestResponseCache(BaseTest):
+
+    def setUp(self):
+        super(TestResponseCache, self).setUp()
+        self.now = 1000.0
+        self.cache = ResponseCache(maxsize=3, ttl=10)
+        self.cache.clock = lambda: self.now
+
+    def test_hit_miss(self):
+        self.assertIsNone(self.cache.get("DNSZones/1"))
+        self.cache.set("DNSZones/1", {"result": {"dnsZone": {"ref": "DNSZones/1"}}})
+
+        result = self.cache.get("DNSZones/1")
+
+        self.assertEqual(result, {"result": {"dnsZone": {"ref": "DNSZones/1"}}})
+        self.assertEqual(self.cache.stats['hits'], 1)
+        self.assertEqual(self.cache.stats['misses'], 1)
+
+    def test_returns_copy(self):
+        value = {"result": {"ranges": [{"ref": "Ranges/1"}]}}
+        self.cache.set("Ranges", value)
+        value["result"]["ranges"].append("changed")
+
+        result = self.cache.get("Ranges")
+        result["result"]["ranges"][0]["ref"] = "changed"
+
+        self.assertEqual(self.cache.get("Ranges"), {"result": {"ranges": [{"ref": "Ranges/1"}]}})
+
+    def test_ttl(self):
+        self.cache.set("DNSZones/1", {"a": 1})
+        self.now += 9.9
+        self.assertIsNotNone(self.cache.get("DNSZones/1"))
+        self.now += 0.1
+        self.assertIsNone(self.cache.get("DNSZones/1"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru(self):
+        for i in range(3):
+            self.cache.set("DNSZones/{0}".format(i), {"a": i})
+        # touch 0 so that 1 is the least recently used
+        self.cache.get("DNSZones/0")
+        self.cache.set("DNSZones/3", {"a": 3})
+
+        self.assertIsNone(self.cache.get("DNSZones/1"))
+        self.assertIsNotNone(self.cache.get("DNSZones/0"))
+        self.assertEqual(self.cache.stats['evictions'], 1)
+
+    def test_invalidate(self):
+        cache = ResponseCache(maxsize=100)
+        keys = ["DNSZones/1",
+                "DNSZones/1/Access",
+                "DNSZones/10",
+                "DNSZones?filter=x",
+                "DNSZones/2/DNSRecords?limit=5",
+                "DNSRecords/7",
+                "Ranges/3/IPAMRecords",
+                "Ranges/3/Subranges"]
+        for key in keys:
+            cache.set(key, {})
+
+        self.assertEqual(cache.invalidate("DNSZones/1"), 3)
+        self.assertEqual(sorted(cache._entries),
+                         sorted(["DNSZones/10",
+                                 "DNSZones/2/DNSRecords?limit=5",
+                                 "DNSRecords/7",
+                                 "Ranges/3/IPAMRecords",
+                                 "Ranges/3/Subranges"]))
+
+        # adding a record makes every record listing stale
+        cache.invalidate("DNSRecords")
+        self.assertNotIn("DNSZones/2/DNSRecords?limit=5", cache._entries)
+        self.assertNotIn("DNSRecords/7", cache._entries)
+
+        cache.invalidate("IPAMRecords/10.0.0.1")
+        self.assertNotIn("Ranges/3/IPAMRecords", cache._entries)
+
+        cache.invalidate("Ranges/9")
+        self.assertNotIn("Ranges/3/Subranges", cache._entries)
+        self.assertEqual(cache.stats['invalidations'], 7)
+
+    def test_set_after_invalidate(self):
+        generation = self.cache.generation
+        # a write lands while the GET is running
+        self.cache.invalidate("DNSZones/1")
+
+        self.assertFalse(self.cache.set("DNSZones/1", {"result": {}}, generation))
+        self.assertIsNone(self.cache.get("DNSZones/1"))
+        self.assertTrue(self.cache.set("DNSZones/1", {"result": {}}, self.cache.generation))
+
+
+class TestClientCache(BaseTest):
+
+    def setUp(self):
+        super(TestClientCache, self).setUp()
+        self.client = menandmice.client.Client(self.server,
+                                               self.username,
+                                               self.password,
+                                               cache=ResponseCache())
+
+    @patch('menandmice.client.requests.Session')
+    def test_get_cached(self, session):
+        json_obj = {"result": {"dnsZone": {"ref": "DNSZones/1", "name": "a."}}}
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = json_obj
+        self.client.session = session
+
+        first = self.client.DNSZones.get("DNSZones/1")
+        second = self.client.DNSZones.get("DNSZones/1")
+
+        self.assertEqual(first, second)
+        session.get.assert_called_once_with("{0}DNSZones/1".format(self.url_base))
+        self.assertEqual(self.client.cache.stats['hits'], 1)
+
+    @patch('menandmice.client.requests.Session')
+    def test_write_invalidates(self, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {"result": {"dnsZone": {}}}
+        session.put.return_value.status_code = 204
+        session.delete.return_value.status_code = 204
+        self.client.session = session
+
+        self.client.DNSZones.get("DNSZones/1")
+        self.client.DNSZones.update("DNSZones/1", {"name": "b."}, "DNSZone", "test", True)
+        self.client.DNSZones.get("DNSZones/1")
+        self.assertEqual(session.get.call_count, 2)
+
+        self.client.DNSZones.set_access("DNSZones/1", [{"identityRef": "Users/1"}],
+                                        "DNSZone", "test")
+        self.client.DNSZones.get("DNSZones/1")
+        self.assertEqual(session.get.call_count, 3)
+
+        self.client.DNSZones.delete("DNSZones/1")
+        self.client.DNSZones.get("DNSZones/1")
+        self.assertEqual(session.get.call_count, 4)
+
+    @patch('menandmice.client.requests.Session')
+    def test_add_invalidates(self, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {"result": {"users": [],
+                                                                 "user": {}}}
+        session.post.return_value.status_code = 201
+        session.post.return_value.json.return_value = {"result": {"objRefs": ["Users/2"]}}
+        self.client.session = session
+
+        self.client.Users.get()
+        self.client.Users.add({"name": "test"}, "test")
+        self.client.Users.get()
+
+        self.assertEqual(session.get.call_count, 3)
+
+    @patch('menandmice.client.requests.Session')
+    def test_failed_write_invalidates(self, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {"result": {"dnsZone": {}}}
+        session.put.side_effect = Exception("connection reset")
+        self.client.session = session
+
+        self.client.DNSZones.get("DNSZones/1")
+        with self.assertRaises(Exception):
+            self.client.DNSZones.update("DNSZones/1", {"name": "b."}, "DNSZone", "test", True)
+        self.client.DNSZones.get("DNSZones/1")
+
+        self.assertEqual(session.get.call_count, 2)
+
+    @patch('menandmice.client.requests.Session')
+    def test_write_during_get(self, session):
+        self.client.session = session
+        session.put.return_value.status_code = 204
+
+        def get(url):
+            # the zone is renamed while its GET is on the wire
+            self.client.DNSZones.update("DNSZones/1", {"name": "b."}, "DNSZone", "test", True)
+            response = Mock(status_code=200)
+            response.json.return_value = {"result": {"dnsZone": {"name": "a."}}}
+            return response
+
+        session.get.side_effect = get
+        self.client.DNSZones.get("DNSZones/1")
+
+        self.assertEqual(len(self.client.cache), 0)
+
+    def test_no_cache(self):
+        client = menandmice.client.Client(self.server, self.username, self.password)
+        self.assertIsNone(client.cache)
+        self.assertEqual(client.invalidate("DNSZones/1"), 0)
+        client.session = Mock()
+        client.session.get.return_value.status_code = 200
+        client.session.get.return_value.json.return_value = {}
+        client.get(self.url_base + "DNSZones")
+        client.get(self.url_base + "DNSZones")
+        self.assertEqual(client.session.get.call_count, 2)
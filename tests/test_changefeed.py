@@ -0,0 +1,183 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from base_test import history_page
+from base_test import timestamp
+from mock import Mock
+
+import os
+import shutil
+import tempfile
+import threading
+
+from menandmice.changefeed import ChangeFeed
+from menandmice.client import Event
+
+
+def event(obj_ref, seconds, text=""):
+    return Event(objRef=obj_ref, eventType="Modified", timestamp=timestamp(seconds),
+                 eventText=text)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestChangeFeed(BaseTest):
+
+    def setUp(self):
+        super(TestChangeFeed, self).setUp()
+        self.history = {"DNSZones/1": [], "Ranges/1": []}
+        self.client = Mock()
+        self.client.get_item_history.side_effect = self.get_history
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cursors.json")
+
+    def tearDown(self):
+        super(TestChangeFeed, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def get_history(self, ref, sortBy=None, sortOrder=None, limit=None, offset=0):
+        return history_page(self.history[ref], sortOrder, limit, offset)
+
+    def make_feed(self, **kwargs):
+        feed = ChangeFeed(self.client, sorted(self.history), min_interval=5,
+                          max_interval=40, **kwargs)
+        feed.clock = Clock()
+        return feed
+
+    def test_poll_order_and_dedup(self):
+        feed = self.make_feed()
+        received = []
+        feed.subscribe(received.append)
+        shared = event("DNSRecords/1", 20)
+        self.history["DNSZones/1"] = [event("DNSZones/1", 30), shared]
+        self.history["Ranges/1"] = [shared, event("Ranges/1", 10)]
+
+        events = feed.poll()
+
+        self.assertEqual([e['objRef'] for e in events],
+                         ["Ranges/1", "DNSRecords/1", "DNSZones/1"])
+        self.assertEqual(received, events)
+        self.assertEqual(feed.stats['duplicates'], 1)
+
+        # nothing new, and sources are not due yet
+        self.assertEqual(feed.poll(), [])
+        feed.clock.now += 5
+        self.assertEqual(feed.poll(), [])
+        self.assertEqual(self.client.get_item_history.call_count, 4)
+
+    def test_same_timestamp(self):
+        feed = self.make_feed()
+        self.history["Ranges/1"] = [event("Ranges/1", 10, "a")]
+        feed.poll()
+        self.history["Ranges/1"].append(event("Ranges/1", 10, "b"))
+
+        events = feed.poll(list(feed.sources.values()))
+
+        self.assertEqual([e['eventText'] for e in events], ["b"])
+
+    def test_adaptive_interval(self):
+        feed = self.make_feed()
+        source = feed.sources["Ranges/1"]
+        intervals = []
+        for _ in range(5):
+            feed.clock.now = source.next_poll
+            feed.poll()
+            intervals.append(source.interval)
+        self.assertEqual(intervals, [10, 20, 40, 40, 40])
+
+        self.history["Ranges/1"] = [event("Ranges/1", 10)]
+        feed.clock.now = source.next_poll
+        feed.poll()
+        self.assertEqual(source.interval, 5)
+        self.assertEqual(feed.next_poll(), 5)
+
+    def test_start(self):
+        self.history["Ranges/1"] = [event("Ranges/1", 10), event("Ranges/1", 100)]
+        feed = self.make_feed(start=50)
+        self.assertEqual([timestamp(100)], [e['timestamp'] for e in feed.poll()])
+
+    def test_checkpoint(self):
+        feed = self.make_feed(path=self.path)
+        self.history["Ranges/1"] = [event("Ranges/1", 10), event("Ranges/1", 20, "x")]
+        self.assertEqual(len(feed.poll()), 2)
+
+        restarted = self.make_feed(path=self.path)
+        self.history["Ranges/1"].append(event("Ranges/1", 30))
+
+        self.assertEqual([e['timestamp'] for e in restarted.poll()], [timestamp(30)])
+
+    def test_reads_since_cursor(self):
+        self.history["Ranges/1"] = [event("Ranges/1", i) for i in range(1, 301)]
+        feed = self.make_feed(start=250)
+
+        self.assertEqual(len(feed.poll([feed.sources["Ranges/1"]])), 51)
+        # newest first, the page reaching past the cursor is the last one
+        self.client.get_item_history.assert_called_once_with(
+            "Ranges/1", sortBy='timestamp', sortOrder='Descending', limit=100, offset=0)
+
+    def test_failed_callback_redelivers(self):
+        feed = self.make_feed()
+        self.history["Ranges/1"] = [event("Ranges/1", 10), event("Ranges/1", 20)]
+        received = []
+        feed.subscribe(received.append)
+        callback = feed.subscribe(Mock(side_effect=[None, ValueError("down")]))
+
+        with self.assertRaises(ValueError):
+            feed.poll()
+
+        callback.side_effect = None
+        self.assertEqual(len(feed.poll(list(feed.sources.values()))), 1)
+        # the first event was delivered once, the failed one twice
+        self.assertEqual([e['timestamp'] for e in received],
+                         [timestamp(10), timestamp(20), timestamp(20)])
+
+    def test_invalidate(self):
+        feed = self.make_feed(invalidate=True)
+        self.history["DNSZones/1"] = [event("DNSZones/1", 10)]
+
+        feed.poll()
+
+        self.client.invalidate.assert_called_once_with("DNSZones/1")
+
+    def test_iterate(self):
+        self.history["Ranges/1"] = [event("Ranges/1", 10)]
+        feed = ChangeFeed(self.client, ["Ranges/1"], min_interval=0.01)
+
+        received = []
+        for e in feed:
+            received.append(e)
+            threading.Timer(0.05, feed.stop).start()
+
+        self.assertEqual(len(received), 1)
+
+    def test_iterate_checkpoints_after_consumer(self):
+        self.history["Ranges/1"] = [event("Ranges/1", 10), event("Ranges/1", 20)]
+        feed = self.make_feed(path=self.path)
+
+        # the consumer stops after the first event of the batch
+        for e in feed:
+            break
+
+        restarted = self.make_feed(path=self.path)
+        self.assertEqual(len(restarted.poll()), 2)
@@ -21,6 +21,7 @@ from mock import patch
 import menandmice
 import requests
 import json
+import threading
 
 
 class TestAccessEntry(BaseObjectTest):
@@ -121,6 +122,54 @@ class TestClient(BaseTest):
         self.assertEqual(self.client.ChangeRequests.client, self.client)
         self.assertIsNotNone(self.client.logger)
 
+    def test_init_pool(self):
+        client = menandmice.client.Client(self.server,
+                                          self.username,
+                                          self.password,
+                                          pool_connections=2,
+                                          pool_maxsize=32,
+                                          pool_block=True)
+        self.assertEqual(client.adapter._pool_connections, 2)
+        self.assertEqual(client.adapter._pool_maxsize, 32)
+        self.assertEqual(client.adapter._pool_block, True)
+        self.assertIs(client.session.get_adapter(self.url_base), client.adapter)
+        self.assertIs(client.session.get_adapter("https://test/"), client.adapter)
+
+    def test_session_per_thread(self):
+        sessions = []
+
+        def worker():
+            sessions.append(self.client.session)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(set(id(s) for s in sessions)), 4)
+        for session in sessions:
+            self.assertEqual(session.auth, (self.username, self.password))
+            self.assertIs(session.get_adapter(self.url_base), self.client.adapter)
+        # the same thread always gets the same session back
+        self.assertIs(self.client.session, self.client.session)
+
+    @patch('menandmice.client.requests.adapters.HTTPAdapter.close')
+    def test_close(self, mock_adapter_close):
+        session = self.client.session
+        with patch.object(session, 'close') as mock_session_close:
+            self.client.close()
+            mock_session_close.assert_called_with()
+        mock_adapter_close.assert_called_with()
+        self.assertIsNot(self.client.session, session)
+
+    @patch('menandmice.client.Client.close')
+    def test_context_manager(self, mock_close):
+        with self.client as client:
+            self.assertIs(client, self.client)
+            mock_close.assert_not_called()
+        mock_close.assert_called_with()
+
     def test_new_dns_zone(self):
         dns_zone = self.client.new_dns_zone({'ref': 'test/123'}, name='abc')
         self.assertIsInstance(dns_zone, menandmice.dns.DNSZone)
@@ -303,6 +352,32 @@ class TestClient(BaseTest):
         sanitized = self.client.sanitize_dict(test_dict)
         self.assertEqual(sanitized, expected)
 
+    def test_sanitize_dict_keeps_false(self):
+        test_dict = {'enabled': False,
+                     'ttl': 0,
+                     'nested': {'none': None},
+                     'records': [{'comment': ''}]}
+        expected = {'enabled': False,
+                    'ttl': 0}
+        sanitized = self.client.sanitize_dict(test_dict)
+        self.assertEqual(sanitized, expected)
+
+    def test_sanitize_dict_not_modified(self):
+        record = menandmice.dns.DNSRecord(name="www", data="10.0.0.1")
+        clean = {'name': 'www', 'list': ['abc', {'a': 1}]}
+        test_dict = {'dnsRecords': [record, clean],
+                     'saveComment': ''}
+
+        sanitized = self.client.sanitize_dict(test_dict)
+
+        self.assertEqual(sanitized, {'dnsRecords': [{'name': 'www', 'data': '10.0.0.1'},
+                                                    clean]})
+        self.assertEqual(test_dict['saveComment'], '')
+        self.assertIsNone(record['ref'])
+        # nothing to remove, reused as-is
+        self.assertIs(sanitized['dnsRecords'][1], clean)
+        self.assertIs(self.client.sanitize_dict(clean), clean)
+
     @patch('menandmice.client.requests.Session')
     def test_get_200(self, session):
         url = "http://test.server.local/mmws/api/fake"
@@ -367,6 +442,46 @@ class TestClient(BaseTest):
 
         session.get.assert_called_with(url)
 
+    @patch('menandmice.client.requests.Session')
+    def test_get_stream(self, session):
+        url = "http://test.server.local/mmws/api/fake"
+        body = b'{"result": {"dnsRecords": [{"ref": "a"}, {"ref": "b"}], "totalResults": 2}}'
+
+        session.get.return_value.status_code = 200
+        session.get.return_value.iter_content.return_value = [body[:20], body[20:]]
+        self.client.session = session
+
+        result = self.client.get_stream(url, 'dnsRecords')
+
+        session.get.assert_not_called()
+        self.assertEqual(list(result), [{"ref": "a"}, {"ref": "b"}])
+        session.get.assert_called_with(url, stream=True)
+        session.get.return_value.close.assert_called_with()
+
+    @patch('menandmice.client.requests.Session')
+    def test_get_stream_204(self, session):
+        session.get.return_value.status_code = 204
+        self.client.session = session
+
+        result = list(self.client.get_stream("http://test/fake", 'dnsRecords'))
+
+        self.assertEqual(result, [])
+        session.get.return_value.close.assert_called_with()
+
+    @patch('menandmice.client.requests.Session')
+    def test_get_stream_error(self, session):
+        json_obj = {"error": {"code": 123, "message": "this is a test"}}
+
+        session.get.return_value.status_code = 400
+        session.get.return_value.json.return_value = json_obj
+        self.client.session = session
+
+        with self.assertRaises(requests.exceptions.HTTPError) as context:
+            list(self.client.get_stream("http://test/fake", 'dnsRecords'))
+
+        self.assertEqual(str(context.exception), '123: this is a test')
+        session.get.return_value.close.assert_called_with()
+
     @patch('menandmice.client.requests.Session')
     def test_post_201(self, session):
         url = "http://test.server.local/mmws/api/fake"
@@ -0,0 +1,130 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from mock import Mock, patch
+
+import menandmice
+import unittest
+
+from menandmice import codec
+from menandmice.codec import JSONCodec
+from menandmice.codec import OrjsonCodec
+from menandmice.codec import get_codec
+
+
+class FakeCodec(JSONCodec):
+    name = 'fake'
+    stdlib = False
+
+
+class TestCodec(BaseTest):
+
+    def tearDown(self):
+        super(TestCodec, self).tearDown()
+        codec.set_default_codec('json')
+
+    def test_json_codec(self):
+        json_codec = get_codec('json')
+        self.assertTrue(json_codec.stdlib)
+        self.assertEqual(json_codec.loads(b'{"a": [1, null]}'), {"a": [1, None]})
+        self.assertEqual(json_codec.loads('{"a": 1}'), {"a": 1})
+        self.assertEqual(json_codec.loads(json_codec.dumps_bytes({"a": "b"})), {"a": "b"})
+
+    @unittest.skipIf(codec.orjson is None, "orjson is not installed")
+    def test_orjson_codec(self):
+        fast = get_codec()
+        self.assertIsInstance(fast, OrjsonCodec)
+        self.assertFalse(fast.stdlib)
+        self.assertEqual(fast.loads(b'{"a": [1, null]}'), {"a": [1, None]})
+        self.assertEqual(fast.dumps({"a": 1}), '{"a":1}')
+
+    @patch('menandmice.codec.orjson', None)
+    def test_fallback(self):
+        self.assertIsInstance(get_codec('orjson'), JSONCodec)
+        self.assertNotIsInstance(get_codec(), OrjsonCodec)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            get_codec('yaml')
+
+    def test_default_codec(self):
+        fake = FakeCodec()
+        fake.loads = Mock(return_value={"ref": "DNSZones/1"})
+        fake.dumps = Mock(return_value='{}')
+        codec.set_default_codec(fake)
+
+        self.assertEqual(menandmice.base.BaseObject().to_json(), '{}')
+        self.assertEqual(menandmice.base.BaseObject().from_json('x'), {"ref": "DNSZones/1"})
+        self.assertEqual(self.client.DNSZones.build('x'), menandmice.dns.DNSZone(ref="DNSZones/1"))
+        self.assertIs(menandmice.client.Client(self.server,
+                                               self.username,
+                                               self.password).codec, fake)
+
+
+class TestClientCodec(BaseTest):
+
+    def setUp(self):
+        super(TestClientCodec, self).setUp()
+        self.client = menandmice.client.Client(self.server,
+                                               self.username,
+                                               self.password,
+                                               codec=FakeCodec())
+
+    def test_default_stdlib(self):
+        self.assertIsInstance(menandmice.client.Client(self.server,
+                                                       self.username,
+                                                       self.password).codec, JSONCodec)
+
+    @patch('menandmice.client.requests.Session')
+    def test_get_decodes_content(self, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.content = b'{"result": {"dnsZone": {"ref": "DNSZones/1"}}}'
+        self.client.session = session
+
+        result = self.client.DNSZones.get("DNSZones/1")
+
+        self.assertEqual(result, [menandmice.dns.DNSZone(ref="DNSZones/1")])
+        session.get.return_value.json.assert_not_called()
+
+    @patch('menandmice.client.requests.Session')
+    def test_error_decodes_content(self, session):
+        session.get.return_value.status_code = 400
+        session.get.return_value.content = b'{"error": {"code": 1, "message": "bad"}}'
+        self.client.session = session
+
+        with self.assertRaises(menandmice.client.requests.exceptions.HTTPError) as ctx:
+            self.client.get(self.url_base + "DNSZones")
+        self.assertEqual(str(ctx.exception), "1: bad")
+
+    @patch('menandmice.client.requests.Session')
+    def test_post_put_encode(self, session):
+        url = self.url_base + "DNSZones"
+        session.post.return_value.status_code = 201
+        session.post.return_value.content = b'{"result": {"ref": "DNSZones/1"}}'
+        session.put.return_value.status_code = 204
+        self.client.session = session
+
+        self.assertEqual(self.client.post(url, {"a": 1}), {"result": {"ref": "DNSZones/1"}})
+        session.post.assert_called_with(url,
+                                        data=b'{"a": 1}',
+                                        headers={'Content-Type': 'application/json'})
+
+        self.client.put(url, {"b": 2})
+        session.put.assert_called_with(url,
+                                       data=b'{"b": 2}',
+                                       headers={'Content-Type': 'application/json'})
@@ -0,0 +1,201 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from mock import patch
+
+import unittest
+
+from menandmice.columnar import ColumnarResult
+from menandmice.columnar import DNS_RECORD_COLUMNS
+from menandmice.columnar import NULL_INT
+from menandmice.columnar import parse_address
+from menandmice.columnar import parse_time
+
+try:
+    import numpy  # noqa
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+try:
+    import pandas  # noqa
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+ROWS = [
+    {"addrRef": "IPAMRecords/1", "address": "10.0.0.1", "state": "Assigned",
+     "usage": 9, "claimed": False, "lastSeenDate": "2020-01-02T03:04:05Z"},
+    {"addrRef": "IPAMRecords/2", "address": "2001:db8::1", "state": "Free",
+     "usage": 0, "claimed": True, "lastSeenDate": ""},
+    {"addrRef": "IPAMRecords/3", "address": "10.0.0.3", "state": "Assigned",
+     "usage": None, "claimed": None, "lastSeenDate": None, "ptrStatus": "OK"},
+]
+
+COLUMNS = (('addrRef', 'str'),
+           ('address', 'address'),
+           ('state', 'code'),
+           ('usage', 'int'),
+           ('claimed', 'bool'),
+           ('ptrStatus', 'code'),
+           ('lastSeenDate', 'time'))
+
+
+class TestColumnar(BaseTest):
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("10.1.2.3"), (4, 0, 0x0a010203))
+        self.assertEqual(parse_address("2001:db8::1"), (6, 0x20010db800000000, 1))
+
+    def test_parse_time(self):
+        self.assertEqual(parse_time("1970-01-01T00:01:00Z"), 60)
+        self.assertEqual(parse_time("1970-01-01 00:01:00.123"), 60)
+        self.assertEqual(parse_time("Jan 1, 1970 00:01:00"), 60)
+        self.assertEqual(parse_time(60), 60)
+        with self.assertRaises(ValueError):
+            parse_time("yesterday")
+
+    def test_parse_time_offset(self):
+        self.assertEqual(parse_time("2016-10-14T14:10:12+02:00"),
+                         parse_time("2016-10-14T12:10:12Z"))
+        self.assertEqual(parse_time("1970-01-01T00:01:00.5-0130"), 5460)
+        self.assertEqual(parse_time("1970-01-01T00:01:00.123456Z"), 60)
+
+    def test_columns(self):
+        result = ColumnarResult(COLUMNS, ROWS)
+
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result.names(), [name for name, _ in COLUMNS])
+        self.assertEqual(result['addrRef'].values,
+                         ["IPAMRecords/1", "IPAMRecords/2", "IPAMRecords/3"])
+        self.assertEqual(list(result['address'].versions), [4, 6, 4])
+        self.assertEqual(result['address'][0], 0x0a000001)
+        self.assertEqual(result['address'][1], 0x20010db8 << 96 | 1)
+        self.assertFalse(result['address'].ipv4_only)
+        self.assertEqual(list(result['state'].codes), [0, 1, 0])
+        self.assertEqual(result['state'].categories, ["Assigned", "Free"])
+        self.assertEqual(result['state'].code("Free"), 1)
+        self.assertEqual(result['state'].code("Claimed"), -1)
+        self.assertEqual(list(result['usage'].values), [9, 0, NULL_INT])
+        self.assertEqual(list(result['claimed'].values), [0, 1, -1])
+        self.assertEqual(list(result['ptrStatus'].codes), [-1, -1, 0])
+        self.assertEqual(list(result['lastSeenDate'].values), [1577934245, NULL_INT, NULL_INT])
+
+    def test_rows(self):
+        result = ColumnarResult(COLUMNS, ROWS)
+        self.assertEqual(list(result), [
+            {"addrRef": "IPAMRecords/1", "address": "10.0.0.1", "state": "Assigned",
+             "usage": 9, "claimed": False, "ptrStatus": None, "lastSeenDate": 1577934245},
+            {"addrRef": "IPAMRecords/2", "address": "2001:db8::1", "state": "Free",
+             "usage": 0, "claimed": True, "ptrStatus": None, "lastSeenDate": None},
+            {"addrRef": "IPAMRecords/3", "address": "10.0.0.3", "state": "Assigned",
+             "usage": None, "claimed": None, "ptrStatus": "OK", "lastSeenDate": None},
+        ])
+
+    def test_extend(self):
+        result = ColumnarResult(COLUMNS, ROWS[:1])
+        result.extend(iter(ROWS[1:]))
+        result.append({"address": "10.0.0.4"})
+        self.assertEqual(len(result), 4)
+        self.assertEqual(result.row(3)['address'], "10.0.0.4")
+        self.assertIsNone(result.row(3)['addrRef'])
+
+    def test_append_invalid_row(self):
+        result = ColumnarResult(COLUMNS, ROWS[:1])
+        rows = [{"addrRef": "IPAMRecords/4", "address": "10.0.0.4", "state": "Free",
+                 "lastSeenDate": "last week"},
+                {"addrRef": "IPAMRecords/5", "usage": 2 ** 64},
+                {"addrRef": "IPAMRecords/6", "ptrStatus": ["OK"]}]
+        for row in rows:
+            with self.assertRaises((ValueError, OverflowError, TypeError)):
+                result.append(row)
+
+        # nothing of the failed rows was kept, all columns still line up
+        self.assertEqual(set(len(column) for column in result.columns.values()), set([1]))
+        self.assertEqual(result['state'].categories, ["Assigned"])
+        result.append({"addrRef": "IPAMRecords/7"})
+        self.assertEqual(result.row(1)['addrRef'], "IPAMRecords/7")
+        self.assertIsNone(result.row(1)['address'])
+
+    def test_extend_invalid_row(self):
+        result = ColumnarResult(COLUMNS)
+        with self.assertRaises(ValueError):
+            result.extend(ROWS[:2] + [{"addrRef": "IPAMRecords/3", "lastSeenDate": "soon"}])
+        self.assertEqual(len(result), 2)
+        self.assertEqual(len(result['address'].hi), 2)
+
+    def test_many_codes(self):
+        result = ColumnarResult((('dnsZoneRef', 'code'),),
+                                ({"dnsZoneRef": "DNSZones/{0}".format(i)} for i in range(40000)))
+        self.assertEqual(result['dnsZoneRef'][39999], "DNSZones/39999")
+        self.assertEqual(result['dnsZoneRef'].code("DNSZones/39999"), 39999)
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_to_numpy(self):
+        ipv4_rows = [row for row in ROWS if row['address'] != "2001:db8::1"]
+        arrays = ColumnarResult(COLUMNS, ipv4_rows).to_numpy()
+        self.assertEqual(arrays['address'].dtype, numpy.uint64)
+        self.assertEqual(arrays['address'].tolist(), [0x0a000001, 0x0a000003])
+        self.assertEqual(arrays['state'].dtype, numpy.int32)
+        self.assertEqual(list(arrays['state'] == 0), [True, True])
+        self.assertEqual(arrays['usage'].tolist(), [9, NULL_INT])
+
+        # IPv6 addresses would be cut to their low 64 bits
+        with self.assertRaises(ValueError):
+            ColumnarResult(COLUMNS, ROWS).to_numpy()
+
+    @unittest.skipUnless(HAS_PANDAS, "pandas is not installed")
+    def test_to_pandas(self):
+        frame = ColumnarResult(COLUMNS, ROWS).to_pandas()
+        self.assertEqual(list(frame['state']), ["Assigned", "Free", "Assigned"])
+        self.assertTrue(frame['usage'].isna()[2])
+        self.assertTrue(frame['lastSeenDate'].isna()[1])
+
+
+class TestServiceColumns(BaseTest):
+
+    @patch('menandmice.client.requests.Session')
+    def test_get_ipam_records_columns(self, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {
+            "result": {"ipamRecords": ROWS, "totalResults": 3}}
+        self.client.session = session
+
+        result = self.client.Ranges.get_ipam_records_columns("Ranges/1")
+
+        session.get.assert_called_once_with(self.url_base + "Ranges/1/IPAMRecords?limit=1000")
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result['state'].categories, ["Assigned", "Free"])
+
+        # records of another range are appended to the same columns
+        self.client.Ranges.get_ipam_records_columns("Ranges/2", result=result)
+        self.assertEqual(len(result), 6)
+
+    @patch('menandmice.client.requests.Session')
+    def test_get_records_columns(self, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {
+            "result": {"dnsRecords": [{"ref": "DNSRecords/1", "type": "A", "ttl": 300},
+                                      {"ref": "DNSRecords/2", "type": "AAAA"}]}}
+        self.client.session = session
+
+        result = self.client.DNSZones.get_records_columns("DNSZones/1")
+
+        self.assertEqual(result.names(), [name for name, _ in DNS_RECORD_COLUMNS])
+        self.assertEqual(list(result['type'].codes), [0, 1])
+        self.assertEqual(list(result['ttl'].values), [300, NULL_INT])
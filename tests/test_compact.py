@@ -0,0 +1,164 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from mock import patch
+
+import menandmice
+import pickle
+
+from menandmice.base import BaseObject
+from menandmice.client import IdentityAccess
+from menandmice.compact import CompactRecord
+from menandmice.compact import compact_class
+from menandmice.dns import DNSRecord
+from menandmice.ipam import IPAMRecord
+from menandmice.ipam import Range
+
+
+class TestCompactRecord(BaseTest):
+
+    def test_class(self):
+        cls = compact_class(DNSRecord)
+        self.assertIs(compact_class(DNSRecord), cls)
+        self.assertTrue(issubclass(cls, CompactRecord))
+        self.assertEqual(cls.__name__, "CompactDNSRecord")
+        self.assertEqual(cls.fields, tuple(DNSRecord().keys()))
+        self.assertFalse(hasattr(cls(), '__dict__'))
+
+    def test_mapping(self):
+        data = {"ref": "Ranges/1", "from": "10.0.0.0", "to": "10.0.0.255"}
+        record = compact_class(Range)(data)
+
+        self.assertEqual(record['from'], "10.0.0.0")
+        self.assertIsNone(record['name'])
+        self.assertEqual(record.get('to'), "10.0.0.255")
+        self.assertEqual(record.get('unknown', 1), 1)
+        self.assertIn('subnet', record)
+        self.assertNotIn('unknown', record)
+        self.assertEqual(len(record), len(Range()))
+        self.assertEqual(sorted(record), sorted(Range()))
+        self.assertEqual(record, Range(data))
+        self.assertEqual(Range(data), record)
+        with self.assertRaises(KeyError):
+            record['unknown']
+
+    def test_extra_keys(self):
+        record = compact_class(IPAMRecord)(address="10.0.0.1", newField=[1])
+        self.assertEqual(record['newField'], [1])
+        self.assertIn('newField', record)
+        self.assertEqual(len(record), len(IPAMRecord()) + 1)
+        self.assertEqual(record.to_dict(), IPAMRecord(address="10.0.0.1", newField=[1]))
+
+    def test_conversion(self):
+        record = compact_class(IdentityAccess)(identityRef="Users/1")
+
+        entity = record.to_entity()
+        self.assertIsInstance(entity, IdentityAccess)
+        self.assertEqual(entity, IdentityAccess(identityRef="Users/1"))
+        # every access gets its own copy of a mutable default
+        self.assertIsNot(entity['accessEntries'], record['accessEntries'])
+        default = IdentityAccess()['accessEntries']
+        record['accessEntries'].append("entry")
+        self.assertEqual(record['accessEntries'], default)
+        self.assertEqual(compact_class(IdentityAccess)()['accessEntries'], default)
+
+        as_dict = record.to_dict()
+        self.assertIs(type(as_dict), dict)
+        self.assertEqual(as_dict, entity)
+        self.assertEqual(menandmice.codec.loads(record.to_json()), dict(entity))
+
+    def test_pickle(self):
+        record = compact_class(DNSRecord)(name="www", extra="x")
+        copy = pickle.loads(pickle.dumps(record))
+        self.assertIs(type(copy), type(record))
+        self.assertEqual(copy, record)
+
+    def test_clash(self):
+        class Bad(BaseObject):
+            def __init__(self, *args, **kwargs):
+                super(Bad, self).__init__(*args, **kwargs)
+                self.add_key('items')
+
+        with self.assertRaises(ValueError):
+            compact_class(Bad)
+
+
+class TestClientCompact(BaseTest):
+
+    def setUp(self):
+        super(TestClientCompact, self).setUp()
+        self.client = menandmice.client.Client(self.server,
+                                               self.username,
+                                               self.password,
+                                               compact=True)
+
+    @patch('menandmice.client.requests.Session')
+    def test_get(self, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {
+            "result": {"ranges": [{"ref": "Ranges/1"}, {"ref": "Ranges/2"}]}}
+        self.client.session = session
+
+        result = self.client.Ranges.get()
+
+        self.assertEqual([type(r) for r in result], [compact_class(Range)] * 2)
+        self.assertEqual(result, [Range(ref="Ranges/1"), Range(ref="Ranges/2")])
+
+    @patch('menandmice.client.requests.Session')
+    def test_list_methods(self, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {
+            "result": {"ipamRecords": [{"address": "10.0.0.1"}],
+                       "dnsRecords": [{"name": "www"}]}}
+        self.client.session = session
+
+        records = self.client.Ranges.get_ipam_records("Ranges/1")
+        iterated = list(self.client.Ranges.iter_ipam_records("Ranges/1"))
+        dns_records = self.client.DNSZones.get_records("DNSZones/1")
+
+        self.assertIsInstance(records[0], compact_class(IPAMRecord))
+        self.assertIsInstance(iterated[0], compact_class(IPAMRecord))
+        self.assertIsInstance(dns_records[0], compact_class(DNSRecord))
+        self.assertEqual(records[0]['address'], "10.0.0.1")
+
+    @patch('menandmice.client.requests.Session')
+    def test_round_trip(self, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {
+            "result": {"dnsRecords": [{"ref": "DNSRecords/1", "name": "www", "ttl": "60"}]}}
+        session.put.return_value.status_code = 204
+        session.post.return_value.status_code = 201
+        session.post.return_value.json.return_value = {"result": {"objRefs": ["DNSRecords/2"]}}
+        self.client.session = session
+
+        record = self.client.DNSZones.get_records("DNSZones/1")[0]
+        self.client.DNSRecords.update(record, {'ttl': "120"})
+        self.client.DNSRecords.add(record, refs_only=True)
+
+        self.assertEqual(session.put.call_args[0][0],
+                         "http://{0}/mmws/api/DNSRecords/1".format(self.server))
+        # sent as plain dicts, without the empty defaults
+        posted = session.post.call_args[1]['json']['dnsRecords']
+        self.assertIs(type(posted[0]), dict)
+        self.assertEqual(posted, [{"ref": "DNSRecords/1", "name": "www", "ttl": "60"}])
+
+    def test_default_off(self):
+        client = menandmice.client.Client(self.server, self.username, self.password)
+        self.assertFalse(client.compact)
+        self.assertIsInstance(client.Ranges.build({"ref": "Ranges/1"}), Range)
+        self.assertIs(client.Ranges.entity_factory(Range), Range)
@@ -0,0 +1,427 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from mock import Mock
+
+import threading
+import time
+
+import menandmice
+import requests
+
+from menandmice.concurrency import DeadlineExceeded
+from menandmice.concurrency import SingleFlight
+from menandmice.concurrency import bounded_map
+from menandmice.concurrency import iter_bounded
+from menandmice.concurrency import iter_ordered
+
+
+def run_threads(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+class TestSingleFlight(BaseTest):
+
+    def test_single_caller(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do("key", lambda: 123), (123, False))
+        self.assertEqual(flight.stats, {'calls': 1, 'shared': 0})
+
+    def test_coalesce(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            release.wait()
+            return {"result": 1}
+
+        def target():
+            return flight.do("key", func)
+
+        def release_later():
+            # wait until every other thread is queued behind the leader
+            while flight.stats['shared'] < 7:
+                time.sleep(0.001)
+            release.set()
+
+        releaser = threading.Thread(target=release_later)
+        releaser.start()
+        results, errors = run_threads(8, target)
+        releaser.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(errors, [None] * 8)
+        self.assertEqual([r[0] for r in results], [{"result": 1}] * 8)
+        self.assertTrue(all(r[1] for r in results))
+        self.assertEqual(flight.stats, {'calls': 1, 'shared': 7})
+
+    def test_shared_exception(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        error = ValueError("boom")
+
+        def func():
+            release.wait()
+            raise error
+
+        def release_later():
+            while flight.stats['shared'] < 3:
+                time.sleep(0.001)
+            release.set()
+
+        releaser = threading.Thread(target=release_later)
+        releaser.start()
+        results, errors = run_threads(4, lambda: flight.do("key", func))
+        releaser.join()
+
+        self.assertEqual(errors, [error] * 4)
+        # the key is released, the next call runs again
+        self.assertEqual(flight.do("key", lambda: 5), (5, False))
+
+    def test_forget(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def func():
+            started.set()
+            release.wait(5)
+            return 1
+
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", func)))
+        results = []
+        leader.start()
+        started.wait(5)
+
+        self.assertEqual(flight.forget(lambda key: key == "other"), 0)
+        self.assertEqual(flight.forget(lambda key: key == "key"), 1)
+        # a new call instead of joining the running one
+        self.assertEqual(flight.do("key", lambda: 2), (2, False))
+        release.set()
+        leader.join()
+
+        self.assertEqual(results, [(1, False)])
+        self.assertEqual(flight._calls, {})
+
+
+class TestBounded(BaseTest):
+
+    def test_bounded_map_order(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def func(item):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.001 * (item % 3))
+            with lock:
+                running[0] -= 1
+            return item * 2
+
+        self.assertEqual(bounded_map(func, range(30), 4), [i * 2 for i in range(30)])
+        self.assertLessEqual(running[1], 4)
+
+    def test_bounded_map_serial(self):
+        threads = set()
+
+        def func(item):
+            threads.add(threading.current_thread())
+            return item
+
+        self.assertEqual(bounded_map(func, [1, 2, 3], 1), [1, 2, 3])
+        self.assertEqual(threads, set([threading.current_thread()]))
+        self.assertEqual(bounded_map(func, [], 4), [])
+
+    def test_bounded_map_error(self):
+        def func(item):
+            if item == 5:
+                raise ValueError(item)
+            return item
+
+        with self.assertRaises(ValueError):
+            bounded_map(func, range(10), 3)
+
+    def test_iter_bounded_errors(self):
+        def func(item):
+            if item % 2:
+                raise ValueError(item)
+            return item
+
+        results = sorted(iter_bounded(func, range(6), 3), key=lambda r: r[0])
+
+        self.assertEqual([r[1] for r in results], [0, None, 2, None, 4, None])
+        self.assertEqual([type(r[2]) for r in results[1::2]], [ValueError] * 3)
+
+    def test_iter_bounded_timeout(self):
+        def func(item):
+            if item >= 2:
+                time.sleep(0.5)
+            return item
+
+        start = time.time()
+        results = list(iter_bounded(func, range(6), 2, timeout=0.1))
+
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(sorted(r[0] for r in results), [0, 1])
+
+    def test_iter_bounded_timeout_serial(self):
+        def func(item):
+            time.sleep(0.05)
+            return item
+
+        start = time.time()
+        results = list(iter_bounded(func, range(10), 1, timeout=0.01))
+
+        # the running call is not waited for either
+        self.assertEqual(results, [])
+        self.assertLess(time.time() - start, 0.04)
+
+        results = list(iter_bounded(func, range(10), 1, timeout=0.08))
+        self.assertEqual(results, [(0, 0, None)])
+
+    def test_iter_bounded_timeout_single_item(self):
+        def func(item):
+            time.sleep(0.2)
+            return item
+
+        start = time.time()
+        results = list(iter_bounded(func, [1], 8, timeout=0.02))
+
+        self.assertEqual(results, [])
+        self.assertLess(time.time() - start, 0.15)
+
+    def test_iter_ordered(self):
+        def func(item):
+            time.sleep(0.001 * (3 - item % 3))
+            return item
+
+        self.assertEqual(list(iter_ordered(func, range(20), 4)), list(range(20)))
+
+    def test_iter_ordered_error(self):
+        def func(item):
+            if item == 3:
+                raise ValueError(item)
+            return item
+
+        results = iter_ordered(func, range(10), 2)
+        self.assertEqual([next(results) for _ in range(3)], [0, 1, 2])
+        with self.assertRaises(ValueError):
+            next(results)
+
+    def test_iter_bounded_cleanup(self):
+        cleanup = Mock()
+        list(iter_bounded(lambda item: item, range(10), 3, cleanup))
+        self.assertEqual(cleanup.call_count, 3)
+
+
+class TestClientSingleFlight(BaseTest):
+
+    def test_get_coalesced(self):
+        client = menandmice.client.Client(self.server,
+                                          self.username,
+                                          self.password,
+                                          single_flight=True)
+        release = threading.Event()
+        url = self.url_base + "DNSZones/1"
+
+        def slow_get(url):
+            release.wait()
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {"result": {"dnsZone": {"ref": "DNSZones/1"}}}
+            return response
+
+        session = Mock()
+        session.get.side_effect = slow_get
+        client.new_session = Mock(return_value=session)
+
+        def release_later():
+            while client.single_flight.stats['shared'] < 5:
+                time.sleep(0.001)
+            release.set()
+
+        releaser = threading.Thread(target=release_later)
+        releaser.start()
+        results, errors = run_threads(6, lambda: client.DNSZones.get("DNSZones/1"))
+        releaser.join()
+
+        session.get.assert_called_once_with(url)
+        self.assertEqual(errors, [None] * 6)
+        self.assertEqual(results, [[menandmice.dns.DNSZone(ref="DNSZones/1")]] * 6)
+        # every caller got its own copy
+        self.assertEqual(len(set(id(r[0]) for r in results)), 6)
+
+    def test_get_after_write(self):
+        client = menandmice.client.Client(self.server,
+                                          self.username,
+                                          self.password,
+                                          single_flight=True)
+        started = threading.Event()
+        release = threading.Event()
+        names = ["a.", "b."]
+
+        def get(url):
+            response = Mock(status_code=200)
+            response.json.return_value = {"result": {"dnsZone": {"name": names.pop(0)}}}
+            if names:
+                # the first GET is still on the wire during the write
+                started.set()
+                release.wait(5)
+            return response
+
+        session = Mock()
+        session.get.side_effect = get
+        session.put.return_value.status_code = 204
+        client.new_session = Mock(return_value=session)
+        results = []
+        reader = threading.Thread(target=lambda: results.append(client.DNSZones.get("DNSZones/1")))
+        reader.start()
+        started.wait(5)
+
+        client.DNSZones.update("DNSZones/1", {"name": "b."}, "DNSZone", "test", True)
+        after = client.DNSZones.get("DNSZones/1")
+        release.set()
+        reader.join()
+
+        self.assertEqual(after[0]['name'], "b.")
+        self.assertEqual(results[0][0]['name'], "a.")
+        self.assertEqual(session.get.call_count, 2)
+
+    def test_default_off(self):
+        self.assertIsNone(self.client.single_flight)
+
+
+class TestReleaseSession(BaseTest):
+
+    def test_release_session(self):
+        session = self.client.session
+        self.assertEqual(self.client._sessions, [session])
+
+        self.client.release_session()
+
+        self.assertEqual(self.client._sessions, [])
+        self.assertIsNot(self.client.session, session)
+        # releasing without a session is fine
+        threading.Thread(target=self.client.release_session).start()
+
+
+class TestFolderObjects(BaseTest):
+
+    def setUp(self):
+        super(TestFolderObjects, self).setUp()
+        objects = []
+        for i in range(12):
+            obj_type = ("DNSZones", "Ranges", "Devices")[i % 3]
+            objects.append({'objType': obj_type, 'ref': "{0}/{1}".format(obj_type, i)})
+        self.client.get = Mock(return_value={'result': {'objects': objects}})
+        self.client.release_session = Mock()
+        self.refs = [o['ref'] for o in objects]
+        for name in ("DNSZones", "Ranges", "Devices"):
+            service = Mock()
+            service.get.side_effect = lambda ref: [{'ref': ref}]
+            setattr(self.client, name, service)
+
+    def test_get_all_objects(self):
+        result = self.client.Folders.get_all_objects("Folders/1")
+
+        self.client.get.assert_called_with("{0}Folders/1/Objects".format(self.url_base))
+        self.assertEqual([o['ref'] for o in result], self.refs)
+        self.assertEqual(self.client.Ranges.get.call_count, 4)
+
+    def test_get_all_objects_max_workers(self):
+        result = self.client.Folders.get_all_objects("Folders/1", max_workers=4)
+
+        self.assertEqual([o['ref'] for o in result], self.refs)
+        self.assertEqual(self.client.release_session.call_count, 4)
+
+    def test_iter_all_objects(self):
+        result = self.client.Folders.iter_all_objects("Folders/1", max_workers=3)
+
+        self.assertEqual([o['ref'] for o in result], self.refs)
+
+
+class TestGetMany(BaseTest):
+
+    def setUp(self):
+        super(TestGetMany, self).setUp()
+        self.client.release_session = Mock()
+        self.calls = []
+
+        def get(url):
+            self.calls.append(url)
+            ref = url[len(self.url_base):]
+            if ref == "DNSZones/bad":
+                raise ValueError(ref)
+            if ref == "DNSZones/slow":
+                time.sleep(0.5)
+            return {'result': {'dnsZone': {'ref': ref}}}
+
+        self.client.get = get
+
+    def test_get_many(self):
+        zone = menandmice.dns.DNSZone(ref="DNSZones/3")
+        refs = ["DNSZones/1", "DNSZones/2", "DNSZones/1", zone, "DNSZones/bad"]
+
+        entities, errors = self.client.DNSZones.get_many(refs, max_workers=3)
+
+        self.assertEqual(list(entities), ["DNSZones/1", "DNSZones/2", "DNSZones/3"])
+        self.assertIsInstance(entities["DNSZones/1"], menandmice.dns.DNSZone)
+        self.assertEqual(entities["DNSZones/2"]['ref'], "DNSZones/2")
+        self.assertEqual(list(errors), ["DNSZones/bad"])
+        self.assertIsInstance(errors["DNSZones/bad"], ValueError)
+        self.assertEqual(len(self.calls), 4)
+
+    def test_get_many_timeout(self):
+        refs = ["DNSZones/slow", "DNSZones/1"]
+
+        entities, errors = self.client.DNSZones.get_many(refs, max_workers=2, timeout=0.1)
+
+        self.assertEqual(list(entities), ["DNSZones/1"])
+        self.assertIsInstance(errors["DNSZones/slow"], DeadlineExceeded)
+        self.assertIsInstance(errors["DNSZones/slow"], requests.exceptions.Timeout)
+
+    def test_get_many_timeout_single_worker(self):
+        for refs, max_workers in ((["DNSZones/slow"], 8), (["DNSZones/slow", "DNSZones/1"], 1)):
+            start = time.time()
+            entities, errors = self.client.DNSZones.get_many(refs, max_workers=max_workers,
+                                                             timeout=0.1)
+
+            self.assertLess(time.time() - start, 0.4)
+            self.assertEqual(list(entities), [])
+            self.assertEqual(list(errors), refs)
+            self.assertIsInstance(errors["DNSZones/slow"], DeadlineExceeded)
+
+    def test_get_many_empty(self):
+        self.assertEqual(self.client.DNSZones.get_many([]), ({}, {}))
@@ -0,0 +1,237 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from base_test import history_page
+from base_test import timestamp
+from mock import Mock
+
+import os
+import requests
+import shutil
+import tempfile
+
+from menandmice.client import Event
+from menandmice.dns import DNSRecord
+from menandmice.dns import DNSZone
+from menandmice.dnssync import ZoneMirror
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError("{0} error".format(status_code), response=response)
+
+
+class FakeDNS(object):
+    def __init__(self):
+        self.zones = {}
+        self.records = {}
+        self.history = {}
+        self.record_calls = []
+        self.history_calls = []
+        # the server's clock, far from the local one
+        self.now = 1000000000
+        for i in range(1, 4):
+            self.add_zone(i)
+
+    def add_zone(self, i):
+        ref = "DNSZones/{0}".format(i)
+        self.zones[ref] = DNSZone(ref=ref, name="zone{0}.".format(i))
+        self.records[ref] = [DNSRecord(ref="DNSRecords/{0}{1}".format(i, n), dnsZoneRef=ref)
+                             for n in range(2)]
+        self.history[ref] = []
+        # created long before the mirror starts
+        self.event(ref, ref, "Created", seconds=self.now - 86400)
+
+    def client(self):
+        client = Mock()
+        client.DNSZones.iter_get.side_effect = lambda **kwargs: iter(list(self.zones.values()))
+        client.DNSZones.iter_records.side_effect = self.iter_records
+        client.get_item_history.side_effect = self.get_history
+        client.DNSRecords.get.side_effect = self.get_record
+        return client
+
+    def iter_records(self, ref):
+        self.record_calls.append(ref)
+        return iter(self.records[ref])
+
+    def get_history(self, ref, sortBy=None, sortOrder=None, limit=None, offset=0):
+        self.history_calls.append((ref, limit, offset))
+        if ref not in self.history:
+            raise http_error(404)
+        return history_page(self.history[ref], sortOrder, limit, offset)
+
+    def get_record(self, ref):
+        for records in self.records.values():
+            for record in records:
+                if record['ref'] == ref:
+                    return [record]
+        raise http_error(404)
+
+    def event(self, zone_ref, obj_ref, event_type="Modified", seconds=None):
+        if seconds is None:
+            self.now += 1
+            seconds = self.now
+        event = Event(objRef=obj_ref, eventType=event_type, timestamp=timestamp(seconds))
+        self.history[zone_ref].append(event)
+        return event
+
+
+class TestZoneMirror(BaseTest):
+
+    def setUp(self):
+        super(TestZoneMirror, self).setUp()
+        self.dns = FakeDNS()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "mirror.json")
+
+    def tearDown(self):
+        super(TestZoneMirror, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_snapshot(self):
+        mirror = ZoneMirror(self.dns.client(), zone_kwargs={'filter': "type:Master"})
+
+        result = mirror.sync()
+
+        self.assertEqual(sorted(result['added']), ["DNSZones/1", "DNSZones/2", "DNSZones/3"])
+        self.assertEqual(sorted(mirror.zones), ["DNSZones/1", "DNSZones/2", "DNSZones/3"])
+        self.assertEqual(mirror.records["DNSZones/2"], self.dns.records["DNSZones/2"])
+        self.assertEqual(mirror.watermark, self.dns.now - 86400)
+        mirror.client.DNSZones.iter_get.assert_called_with(filter="type:Master")
+
+    def test_incremental(self):
+        mirror = ZoneMirror(self.dns.client(), max_workers=2)
+        mirror.sync()
+        self.dns.record_calls = []
+
+        # a record changed in zone 1, zone 2 got a new record
+        self.dns.event("DNSZones/1", "DNSRecords/10")
+        self.dns.records["DNSZones/2"].append(DNSRecord(ref="DNSRecords/29",
+                                                        dnsZoneRef="DNSZones/2"))
+        self.dns.event("DNSZones/2", "DNSRecords/29", "Created")
+        # old events are ignored
+        self.dns.event("DNSZones/3", "DNSZones/3", seconds=self.dns.now - 2 * 86400)
+
+        result = mirror.sync()
+
+        self.assertEqual(result, {'added': [], 'changed': ["DNSZones/1", "DNSZones/2"],
+                                  'removed': []})
+        self.assertEqual(sorted(self.dns.record_calls), ["DNSZones/1", "DNSZones/2"])
+        self.assertEqual(len(mirror.records["DNSZones/2"]), 3)
+        self.assertEqual(mirror.watermark, self.dns.now)
+
+        # nothing changed since, the events read again are skipped
+        self.dns.record_calls = []
+        self.assertEqual(mirror.sync(), {'added': [], 'changed': [], 'removed': []})
+        self.assertEqual(self.dns.record_calls, [])
+        self.assertEqual(mirror.watermark, self.dns.now)
+
+    def test_history_read_newest_first(self):
+        mirror = ZoneMirror(self.dns.client(), history_refs=["DNSZones/1"], overlap=0)
+        mirror.sync()
+        self.dns.event("DNSZones/1", "DNSRecords/11")
+        mirror.sync()
+        for i in range(250):
+            self.dns.event("DNSZones/1", "DNSRecords/10", seconds=self.dns.now - 7200 - i)
+        self.dns.event("DNSZones/1", "DNSRecords/10")
+        self.dns.history_calls = []
+
+        self.assertEqual(len(mirror.fetch_events()), 2)
+        # the old events are never paged through
+        self.assertEqual(self.dns.history_calls, [("DNSZones/1", 100, 0)])
+
+    def test_duplicate_events(self):
+        self.dns.history["DNSViews/1"] = []
+        self.dns.history["DNSViews/2"] = []
+        mirror = ZoneMirror(self.dns.client(), history_refs=["DNSViews/1", "DNSViews/2"])
+        mirror.sync()
+        seconds = self.dns.now + 1
+        self.dns.event("DNSViews/1", "DNSZones/3", seconds=seconds)
+        self.dns.event("DNSViews/2", "DNSZones/3", seconds=seconds)
+
+        events = mirror.fetch_events()
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(mirror.sync()['changed'], ["DNSZones/3"])
+
+    def test_added_and_removed_zones(self):
+        mirror = ZoneMirror(self.dns.client())
+        mirror.sync()
+        del self.dns.zones["DNSZones/1"]
+        del self.dns.history["DNSZones/1"]
+        self.dns.add_zone(4)
+
+        result = mirror.sync()
+
+        self.assertEqual(result, {'added': ["DNSZones/4"], 'changed': [],
+                                  'removed': ["DNSZones/1"]})
+        self.assertEqual(sorted(mirror.records), ["DNSZones/2", "DNSZones/3", "DNSZones/4"])
+
+    def test_history_error(self):
+        mirror = ZoneMirror(self.dns.client())
+        mirror.sync()
+        watermark = mirror.watermark
+        self.dns.event("DNSZones/2", "DNSRecords/20")
+        mirror.client.get_item_history.side_effect = http_error(500)
+
+        self.assertRaises(requests.exceptions.HTTPError, mirror.sync)
+        self.assertEqual(mirror.watermark, watermark)
+
+        # the change is picked up once the server recovers
+        mirror.client.get_item_history.side_effect = self.dns.get_history
+        self.assertEqual(mirror.sync()['changed'], ["DNSZones/2"])
+
+    def test_record_zone_error(self):
+        mirror = ZoneMirror(self.dns.client())
+        mirror.sync()
+        watermark = mirror.watermark
+        self.dns.records["DNSZones/2"].append(DNSRecord(ref="DNSRecords/29",
+                                                        dnsZoneRef="DNSZones/2"))
+        self.dns.event("DNSZones/2", "DNSRecords/29", "Created")
+        mirror.client.DNSRecords.get.side_effect = http_error(500)
+
+        self.assertRaises(requests.exceptions.HTTPError, mirror.sync)
+        self.assertEqual(mirror.watermark, watermark)
+
+        mirror.client.DNSRecords.get.side_effect = self.dns.get_record
+        self.assertEqual(mirror.sync()['changed'], ["DNSZones/2"])
+
+    def test_record_deleted_since(self):
+        mirror = ZoneMirror(self.dns.client())
+        mirror.sync()
+        self.dns.event("DNSZones/2", "DNSRecords/29", "Created")
+
+        self.assertEqual(mirror.sync()['changed'], [])
+        self.assertEqual(mirror.watermark, self.dns.now)
+
+    def test_persistence(self):
+        mirror = ZoneMirror(self.dns.client(), path=self.path)
+        mirror.sync()
+        watermark = mirror.watermark
+        self.dns.record_calls = []
+
+        restarted = ZoneMirror(self.dns.client(), path=self.path)
+
+        self.assertEqual(restarted.watermark, watermark)
+        self.assertEqual(restarted.zones, mirror.zones)
+        self.assertIsInstance(restarted.records["DNSZones/1"][0], DNSRecord)
+        self.dns.event("DNSZones/3", "DNSRecords/31")
+        self.assertEqual(restarted.sync()['changed'], ["DNSZones/3"])
+        self.assertEqual(self.dns.record_calls, ["DNSZones/3"])
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
@@ -0,0 +1,170 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+
+import random
+
+from menandmice.intervals import IntervalSet
+from menandmice.intervals import best_fit_among
+from menandmice.intervals import merge_blocks
+from menandmice.intervals import normalize
+from menandmice.intervals import split_prefixes
+from menandmice.intervals import subtract_blocks
+from menandmice.ipam import AddressBlock
+from menandmice.ipam import IPAMRecord
+from menandmice.ipam import Range
+
+
+def to_set(intervals):
+    return set(value for first, last in intervals for value in range(first, last + 1))
+
+
+def random_set(rng):
+    intervals = []
+    for _ in range(rng.randrange(0, 12)):
+        first = rng.randrange(0, 300)
+        intervals.append((first, first + rng.randrange(0, 20)))
+    return IntervalSet(intervals)
+
+
+class TestIntervalSet(BaseTest):
+
+    def test_normalize(self):
+        self.assertEqual(normalize([(5, 9), (0, 2), (3, 4), (20, 30), (22, 25)]),
+                         [(0, 9), (20, 30)])
+        with self.assertRaises(ValueError):
+            normalize([(3, 2)])
+
+    def test_operations_match_sets(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            a = random_set(rng)
+            b = random_set(rng)
+            self.assertEqual(to_set(a | b), to_set(a) | to_set(b))
+            self.assertEqual(to_set(a & b), to_set(a) & to_set(b))
+            self.assertEqual(to_set(a - b), to_set(a) - to_set(b))
+            self.assertEqual(normalize((a - b).intervals), (a - b).intervals)
+            self.assertEqual((a & b).count(), len(to_set(a) & to_set(b)))
+
+    def test_from_blocks(self):
+        blocks = [AddressBlock({'from': "10.0.0.0", 'to': "10.0.0.127"}),
+                  AddressBlock({'from': "10.0.0.128", 'to': "10.0.0.255"}),
+                  "10.0.2.0/24"]
+        result = IntervalSet.from_blocks(blocks)
+
+        self.assertEqual(result.to_strings(), ["10.0.0.0-10.0.0.255", "10.0.2.0-10.0.2.255"])
+        self.assertEqual(result.count(), 512)
+        self.assertEqual(result.to_blocks(),
+                         [AddressBlock({'from': "10.0.0.0", 'to': "10.0.0.255"}),
+                          AddressBlock({'from': "10.0.2.0", 'to': "10.0.2.255"})])
+        with self.assertRaises(ValueError):
+            IntervalSet.from_blocks(["10.0.0.0/24", "2001:db8::/64"])
+
+    def test_ipv6_sparse(self):
+        range_ = Range(ref="Ranges/6", name="2001:db8::/64")
+        records = [IPAMRecord(address="2001:db8::{0:x}".format(i), state="Assigned")
+                   for i in range(1, 4)]
+        records.append(IPAMRecord(address="2001:db8::ffff", state="Free"))
+        records.append(IPAMRecord(address="2001:db8::1:0", state="Free", claimed=True))
+
+        used = IntervalSet.from_records(records)
+        free = used.complement(range_)
+
+        self.assertEqual(used.version, 6)
+        self.assertEqual(used.to_strings(), ["2001:db8::1-2001:db8::3",
+                                             "2001:db8::1:0-2001:db8::1:0"])
+        self.assertEqual(len(free.intervals), 3)
+        self.assertEqual(free.count(), 2 ** 64 - 4)
+        self.assertIn("2001:db8::4", free)
+        self.assertNotIn("2001:db8::2", free)
+        self.assertNotIn("10.0.0.1", free)
+        self.assertEqual(free.first_fit_address(), "2001:db8::")
+        self.assertEqual(free.first_fit_address(4, 4), "2001:db8::4")
+        self.assertEqual(free.first_fit_address(2 ** 16, 2 ** 16), "2001:db8::2:0")
+        self.assertEqual((free | used), IntervalSet.from_range(range_))
+        self.assertFalse(free & used)
+
+    def test_first_fit(self):
+        result = IntervalSet([(1, 3), (10, 40)])
+        self.assertEqual(result.first_fit(2), 1)
+        self.assertEqual(result.first_fit(4), 10)
+        self.assertEqual(result.first_fit(16, 16), 16)
+        self.assertIsNone(result.first_fit(32, 16))
+        self.assertIsNone(IntervalSet().first_fit(1))
+
+    def test_mixed_versions(self):
+        with self.assertRaises(ValueError):
+            IntervalSet.from_blocks(["10.0.0.0/24"]) | IntervalSet.from_blocks(["::/120"])
+
+
+class TestBlockAlgebra(BaseTest):
+
+    def test_split_prefixes(self):
+        self.assertEqual(split_prefixes(0, 255, 32), [(0, 24)])
+        self.assertEqual(split_prefixes(3, 16, 32), [(3, 32), (4, 30), (8, 29), (16, 32)])
+        self.assertEqual(split_prefixes(0, 2 ** 128 - 1, 128), [(0, 0)])
+        rng = random.Random(3)
+        for _ in range(100):
+            first = rng.randrange(0, 5000)
+            last = first + rng.randrange(0, 5000)
+            prefixes = split_prefixes(first, last, 32)
+            covered = normalize([(start, start + 2 ** (32 - length) - 1)
+                                 for start, length in prefixes])
+            self.assertEqual(covered, [(first, last)])
+            for start, length in prefixes:
+                self.assertEqual(start % 2 ** (32 - length), 0)
+
+    def test_subnets(self):
+        free = IntervalSet.from_blocks([AddressBlock({'from': "10.0.0.3", 'to': "10.0.1.255"})])
+
+        self.assertEqual(free.subnets()[:3], ["10.0.0.3/32", "10.0.0.4/30", "10.0.0.8/29"])
+        self.assertEqual(free.subnets()[-1], "10.0.1.0/24")
+        self.assertEqual(free.subnets(25), ["10.0.0.128/25", "10.0.1.0/25", "10.0.1.128/25"])
+        self.assertEqual(free.subnets(25, limit=1), ["10.0.0.128/25"])
+        self.assertEqual(IntervalSet.from_blocks(["2001:db8::/64"]).subnets(120, limit=2),
+                         ["2001:db8::/120", "2001:db8::100/120"])
+
+    def test_best_fit(self):
+        free = IntervalSet.from_blocks(["10.0.0.0/24", "10.0.4.0/26", "10.0.8.0/27",
+                                        "10.0.9.0/25"])
+
+        self.assertEqual(free.best_fit_subnet(27), "10.0.8.0/27")
+        self.assertEqual(free.best_fit_subnet(26), "10.0.4.0/26")
+        self.assertEqual(free.best_fit_subnet(25), "10.0.9.0/25")
+        self.assertEqual(free.best_fit_subnet(24), "10.0.0.0/24")
+        self.assertIsNone(free.best_fit_subnet(23))
+
+    def test_merge_subtract(self):
+        blocks = [AddressBlock({'from': "10.0.0.0", 'to': "10.0.0.99"}),
+                  AddressBlock({'from': "10.0.0.50", 'to': "10.0.0.255"}),
+                  AddressBlock({'from': "10.0.1.0", 'to': "10.0.1.9"})]
+
+        self.assertEqual(merge_blocks(blocks),
+                         [AddressBlock({'from': "10.0.0.0", 'to': "10.0.1.9"})])
+        self.assertEqual(subtract_blocks(blocks, ["10.0.0.0/25"]),
+                         [AddressBlock({'from': "10.0.0.128", 'to': "10.0.1.9"})])
+
+    def test_best_fit_among(self):
+        candidates = {"Ranges/1": IntervalSet.from_blocks(["10.0.0.0/22"]),
+                      "Ranges/2": IntervalSet.from_blocks(["10.1.0.0/24", "10.1.2.0/23"]),
+                      "Ranges/3": IntervalSet.from_blocks(["10.2.0.0/25"])}
+
+        self.assertEqual(best_fit_among(candidates, 24), ("Ranges/2", 0x0A010000))
+        self.assertEqual(best_fit_among(candidates, 22), ("Ranges/1", 0x0A000000))
+        self.assertEqual(best_fit_among(candidates, 26), ("Ranges/3", 0x0A020000))
+        self.assertIsNone(best_fit_among(candidates, 21))
@@ -0,0 +1,129 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from base_test import block
+from mock import Mock
+
+from menandmice.ipam import Range
+from menandmice.planner import PlanningError
+from menandmice.planner import SubnetPlanner
+from menandmice.rangetree import RangeTree
+
+
+class TestSubnetPlanner(BaseTest):
+
+    def setUp(self):
+        super(TestSubnetPlanner, self).setUp()
+        self.tree = RangeTree()
+        self.tree.add(Range({'ref': "Ranges/1", 'from': "10.0.0.0", 'to': "10.255.255.255"}))
+        self.tree.add(Range({'ref': "Ranges/2", 'from': "10.1.0.0", 'to': "10.1.255.255",
+                             'customProperties': {'Site': "east"}}), "Ranges/1")
+        self.tree.add(Range({'ref': "Ranges/3", 'from': "10.2.0.0", 'to': "10.2.255.255",
+                             'customProperties': {'Site': "west"}, 'adSiteRef': "ADSites/1"}),
+                      "Ranges/1")
+        self.tree.add(Range({'ref': "Ranges/4", 'from': "10.1.0.0", 'to': "10.1.0.255",
+                             'subnet': True}), "Ranges/2")
+        self.blocks = {
+            "Ranges/1": [block("10.0.0.0", "10.0.255.255"), block("10.3.0.0", "10.255.255.255")],
+            # 10.1.0.0/24 is the subnet, 10.1.1.0/24 is the only free /24
+            "Ranges/2": [block("10.1.1.0", "10.1.1.255"), block("10.1.4.0", "10.1.7.255")],
+            "Ranges/3": [block("10.2.0.0", "10.2.255.255")],
+            "Ranges/4": [block("10.1.0.10", "10.1.0.255")],
+        }
+        self.ranges = Mock()
+        self.ranges.get_available_address_blocks.side_effect = lambda ref: self.blocks[ref]
+        self.ranges.add.side_effect = lambda range_, discovery, comment: Range(
+            dict(range_, ref="Ranges/new"))
+        self.planner = SubnetPlanner(self.ranges, self.tree, max_workers=2)
+
+    def test_candidates(self):
+        def refs(nodes):
+            return [node.ref for node in nodes]
+
+        self.assertEqual(refs(self.planner.candidates()), ["Ranges/1", "Ranges/2", "Ranges/3"])
+        self.assertEqual(refs(self.planner.candidates("Ranges/2")), ["Ranges/2"])
+        self.assertEqual(refs(self.planner.candidates(custom_properties={'Site': "west"})),
+                         ["Ranges/3"])
+        self.assertEqual(refs(self.planner.candidates(ad_site_ref="ADSites/1")), ["Ranges/3"])
+
+    def test_plan(self):
+        self.assertEqual(self.planner.plan(24), ("Ranges/2", "10.1.1.0/24"))
+        self.assertEqual(self.planner.plan(22), ("Ranges/2", "10.1.4.0/22"))
+        self.assertEqual(self.planner.plan(24, custom_properties={'Site': "west"}),
+                         ("Ranges/3", "10.2.0.0/24"))
+        self.assertEqual(self.planner.plan(16, "Ranges/1"), ("Ranges/1", "10.0.0.0/16"))
+        self.assertIsNone(self.planner.plan(22, "Ranges/3", ad_site_ref="ADSites/2"))
+        # the subnet itself was never asked for its free blocks
+        self.assertEqual(self.ranges.get_available_address_blocks.call_count, 3)
+
+    def test_create(self):
+        created = self.planner.create(24, properties={'name': "vlan 12"}, save_comment="new")
+
+        self.ranges.add.assert_called_with({'name': "vlan 12",
+                                            'from': "10.1.1.0",
+                                            'to': "10.1.1.255",
+                                            'subnet': True}, "", "new")
+        self.assertEqual(created['ref'], "Ranges/new")
+        self.assertIs(self.tree["Ranges/new"].parent, self.tree["Ranges/2"])
+        # the next one comes from the local free space, checked once
+        calls = self.ranges.get_available_address_blocks.call_count
+        self.blocks["Ranges/2"] = [block("10.1.4.0", "10.1.7.255")]
+        self.assertEqual(self.planner.create(24)['from'], "10.1.4.0")
+        self.assertEqual(self.ranges.get_available_address_blocks.call_count, calls + 1)
+
+    def test_create_conflict(self):
+        self.planner.plan(24)
+        # someone took 10.1.1.0/24 in the meantime
+        self.blocks["Ranges/2"] = [block("10.1.4.0", "10.1.7.255")]
+
+        created = self.planner.create(24, "Ranges/2")
+
+        self.assertEqual(created['name'], "10.1.4.0/24")
+
+    def test_create_full(self):
+        self.blocks["Ranges/3"] = []
+        with self.assertRaises(PlanningError):
+            self.planner.create(24, "Ranges/3")
+
+    def test_mixed_families(self):
+        self.tree.add(Range({'ref': "Ranges/6", 'from': "2001:db8::",
+                             'to': "2001:db8:0:ffff:ffff:ffff:ffff:ffff"}))
+        self.blocks["Ranges/6"] = [block("2001:db8::", "2001:db8:0:ffff:ffff:ffff:ffff:ffff")]
+
+        # an IPv4 block can't hold a /64
+        self.assertEqual(self.planner.plan(64), ("Ranges/6", "2001:db8::/64"))
+        self.assertEqual(self.planner.plan(24), ("Ranges/2", "10.1.1.0/24"))
+        self.assertEqual(self.planner.plan(56, version=6), ("Ranges/6", "2001:db8::/56"))
+        self.assertIsNone(self.planner.plan(24, version=6))
+        self.assertIsNone(self.planner.plan(64, version=4))
+        self.assertEqual([node.ref for node in self.planner.candidates(version=6)],
+                         ["Ranges/6"])
+
+    def test_create_version(self):
+        self.tree.add(Range({'ref': "Ranges/6", 'from': "2001:db8::",
+                             'to': "2001:db8:0:ffff:ffff:ffff:ffff:ffff"}))
+        self.blocks["Ranges/6"] = [block("2001:db8::", "2001:db8:0:ffff:ffff:ffff:ffff:ffff")]
+        self.planner.plan(56, version=6)
+        # 2001:db8::/56 was taken in the meantime, the retry keeps the version
+        self.blocks["Ranges/6"] = [block("2001:db8:0:100::", "2001:db8:0:ffff:ffff:ffff:ffff:ffff")]
+
+        created = self.planner.create(56, version=6)
+
+        self.assertEqual(created['name'], "2001:db8:0:100::/56")
+        with self.assertRaises(PlanningError):
+            self.planner.create(24, version=6)
@@ -0,0 +1,99 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from base_test import make_range
+from mock import Mock
+
+from menandmice.ipam import Range
+from menandmice.rangeaudit import audit_ranges
+from menandmice.rangeaudit import audit_service
+
+
+class TestRangeAudit(BaseTest):
+
+    def setUp(self):
+        super(TestRangeAudit, self).setUp()
+        self.ranges = [
+            make_range("Ranges/1", "10.0.0.0", "10.0.255.255"),
+            make_range("Ranges/2", "10.0.0.0", "10.0.0.255", "Ranges/1"),
+            make_range("Ranges/3", "10.0.1.0", "10.0.1.255", "Ranges/1"),
+            make_range("Ranges/4", "10.0.3.0", "10.0.3.255", "Ranges/1"),
+            make_range("Ranges/5", "2001:db8::", "2001:db8::ffff"),
+            make_range("Ranges/6", "2001:db8::", "2001:db8::ff", "Ranges/5"),
+        ]
+
+    def test_clean(self):
+        audit = audit_ranges(self.ranges)
+
+        self.assertFalse(audit)
+        self.assertEqual(audit.count, 6)
+        self.assertEqual(audit.gaps, [("Ranges/1", "10.0.2.0", "10.0.2.255"),
+                                      ("Ranges/1", "10.0.4.0", "10.0.255.255"),
+                                      ("Ranges/5", "2001:db8::100", "2001:db8::ffff")])
+
+    def test_problems(self):
+        ranges = self.ranges + [
+            # overlaps Ranges/3 and /4
+            make_range("Ranges/7", "10.0.1.128", "10.0.3.127", "Ranges/1"),
+            # inside Ranges/2, but parented to Ranges/1
+            make_range("Ranges/8", "10.0.0.0", "10.0.0.63", "Ranges/1"),
+            make_range("Ranges/9", "10.0.3.0", "10.0.3.255", "Ranges/1"),
+            make_range("Ranges/10", "10.9.0.0", "10.9.0.255", "Ranges/404"),
+            Range(ref="Ranges/11", name="no bounds"),
+        ]
+
+        audit = audit_ranges(reversed(ranges))
+
+        self.assertTrue(audit)
+        self.assertEqual(sorted(audit.overlaps), [("Ranges/3", "Ranges/7"),
+                                                  ("Ranges/7", "Ranges/4"),
+                                                  ("Ranges/7", "Ranges/9")])
+        self.assertEqual(sorted(tuple(sorted(pair)) for pair in audit.duplicates),
+                         [("Ranges/4", "Ranges/9")])
+        self.assertIn(("Ranges/8", "Ranges/1", "Ranges/2"), audit.misparented)
+        self.assertEqual(audit.orphans, [("Ranges/10", "Ranges/404")])
+        self.assertEqual([ref for ref, _ in audit.invalid], ["Ranges/11"])
+        self.assertEqual(audit.count, 11)
+
+    def test_top_level_misparented(self):
+        audit = audit_ranges([make_range("Ranges/1", "10.0.0.0", "10.0.255.255"),
+                              make_range("Ranges/2", "10.0.1.0", "10.0.1.255")],
+                             gaps=False)
+
+        self.assertEqual(audit.misparented, [("Ranges/2", None, "Ranges/1")])
+        self.assertEqual(audit.gaps, [])
+
+    def test_audit_service(self):
+        ranges_service = Mock()
+        ranges_service.iter_get.return_value = iter(self.ranges)
+
+        audit = audit_service(ranges_service, 500, filter="type:range")
+
+        ranges_service.iter_get.assert_called_with(500, True, filter="type:range")
+        self.assertEqual(audit.count, 6)
+
+    def test_many(self):
+        ranges = [make_range("Ranges/0", "10.0.0.0", "10.255.255.255")]
+        for i in range(20000):
+            ranges.append(make_range("Ranges/{0}".format(i + 1),
+                                     "10.{0}.{1}.0".format(i >> 8, i & 255),
+                                     "10.{0}.{1}.255".format(i >> 8, i & 255),
+                                     "Ranges/0"))
+        audit = audit_ranges(ranges)
+        self.assertFalse(audit)
+        self.assertEqual(len(audit.gaps), 1)
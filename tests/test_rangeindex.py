@@ -0,0 +1,171 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from base_test import make_range
+from mock import Mock
+
+import random
+import requests
+
+from collections import OrderedDict
+
+from menandmice.addresses import address_to_int
+from menandmice.addresses import int_to_address
+from menandmice.addresses import parse_subnet
+from menandmice.addresses import range_bounds
+from menandmice.compact import compact_class
+from menandmice.ipam import Range
+from menandmice.rangeindex import RangeIndex
+from menandmice.rangeindex import build_segments
+
+
+class TestAddresses(BaseTest):
+
+    def test_address_to_int(self):
+        self.assertEqual(address_to_int("10.0.0.1"), (4, 0x0A000001))
+        self.assertEqual(address_to_int("::1"), (6, 1))
+        self.assertEqual(address_to_int("2001:db8::1"), (6, 0x20010DB8 << 96 | 1))
+        self.assertEqual(int_to_address(4, 0x0A000001), "10.0.0.1")
+        self.assertEqual(int_to_address(6, 0x20010DB8 << 96 | 1), "2001:db8::1")
+
+    def test_parse_subnet(self):
+        self.assertEqual(parse_subnet("10.1.2.3/8"), (4, 0x0A000000, 0x0AFFFFFF))
+        self.assertEqual(parse_subnet("10.0.0.1"), (4, 0x0A000001, 0x0A000001))
+        self.assertEqual(parse_subnet("2001:db8::/32"),
+                         (6, 0x20010DB8 << 96, (0x20010DB8 << 96) + 2 ** 96 - 1))
+        with self.assertRaises(ValueError):
+            parse_subnet("10.0.0.0/33")
+
+    def test_range_bounds(self):
+        self.assertEqual(range_bounds({'from': "10.0.0.0", 'to': "10.0.0.255"}),
+                         (4, 0x0A000000, 0x0A0000FF))
+        self.assertEqual(range_bounds(Range(name="10.0.0.0/24", subnet=True)),
+                         (4, 0x0A000000, 0x0A0000FF))
+        with self.assertRaises(ValueError):
+            range_bounds({'from': "10.0.0.0", 'to': "::1"})
+        with self.assertRaises(ValueError):
+            range_bounds(Range(name="servers"))
+
+
+class TestRangeIndex(BaseTest):
+
+    def setUp(self):
+        super(TestRangeIndex, self).setUp()
+        self.ranges = [make_range("Ranges/1", "10.0.0.0", "10.255.255.255"),
+                       make_range("Ranges/2", "10.1.0.0", "10.1.255.255", "Ranges/1"),
+                       make_range("Ranges/3", "10.1.2.0", "10.1.2.255", "Ranges/2"),
+                       make_range("Ranges/4", "10.1.2.128", "10.1.2.191", "Ranges/3"),
+                       make_range("Ranges/5", "10.2.0.0", "10.2.0.255", "Ranges/1"),
+                       make_range("Ranges/6", "2001:db8::", "2001:db8::ffff:ffff")]
+        self.index = RangeIndex(self.ranges)
+
+    def test_lookup(self):
+        index = self.index
+        self.assertEqual(len(index), 6)
+        self.assertEqual(index.lookup_ref("10.1.2.130"), "Ranges/4")
+        self.assertEqual(index.lookup_ref("10.1.2.192"), "Ranges/3")
+        self.assertEqual(index.lookup_ref("10.1.2.127"), "Ranges/3")
+        self.assertEqual(index.lookup_ref("10.1.3.0"), "Ranges/2")
+        self.assertEqual(index.lookup_ref("10.3.0.0"), "Ranges/1")
+        self.assertEqual(index.lookup_ref("10.255.255.255"), "Ranges/1")
+        self.assertIsNone(index.lookup_ref("11.0.0.0"))
+        self.assertIsNone(index.lookup_ref("9.255.255.255"))
+        self.assertEqual(index.lookup_ref("2001:db8::1"), "Ranges/6")
+        self.assertIsNone(index.lookup_ref("2001:db9::"))
+        self.assertIs(index.lookup("10.2.0.1"), self.ranges[4])
+        self.assertEqual(index.lookup_many(["10.2.0.1", "1.1.1.1"]),
+                         {"10.2.0.1": self.ranges[4], "1.1.1.1": None})
+
+    def test_lookup_matches_scan(self):
+        rng = random.Random(4)
+        items = []
+        for i in range(200):
+            first = rng.randrange(0, 10000)
+            items.append((first, first + rng.randrange(0, 500), "Ranges/{0}".format(i)))
+        starts, ends, refs = build_segments(items)
+        index = RangeIndex()
+        index._segments[4] = (starts, ends, refs)
+
+        for value in range(0, 10600, 7):
+            covering = sorted((last - first, ref) for first, last, ref in items
+                              if first <= value <= last)
+            expected = covering[0][1] if covering else None
+            self.assertEqual(index.lookup_int(4, value), expected)
+
+    def test_update_and_remove(self):
+        index = self.index
+        self.assertEqual(index.lookup_ref("10.1.2.130"), "Ranges/4")
+
+        index.remove("Ranges/4")
+        self.assertEqual(index.lookup_ref("10.1.2.130"), "Ranges/3")
+        self.assertFalse(index.remove("Ranges/4"))
+
+        index.add(make_range("Ranges/3", "10.1.4.0", "10.1.4.255", "Ranges/2"))
+        self.assertEqual(index.lookup_ref("10.1.2.130"), "Ranges/2")
+        self.assertEqual(index.lookup_ref("10.1.4.1"), "Ranges/3")
+
+    def test_compact_records(self):
+        cls = compact_class(Range)
+        index = RangeIndex(cls(range_) for range_ in self.ranges)
+        self.assertEqual(index.lookup_ref("10.1.2.130"), "Ranges/4")
+
+    def test_load(self):
+        ranges_service = Mock()
+        ranges_service.iter_get.return_value = iter(self.ranges)
+
+        index = RangeIndex.load(ranges_service, filter="type:subnet")
+
+        ranges_service.iter_get.assert_called_with(filter="type:subnet")
+        self.assertEqual(index.lookup_ref("10.2.0.1"), "Ranges/5")
+
+    def test_refresh(self):
+        not_found = requests.exceptions.HTTPError("not found", response=Mock(status_code=404))
+        ranges_service = Mock()
+        ranges_service.get_many.return_value = (
+            OrderedDict([("Ranges/5", make_range("Ranges/5", "10.2.0.0", "10.2.1.255"))]),
+            OrderedDict([("Ranges/4", not_found)]))
+
+        self.index.refresh(ranges_service, ["Ranges/4", "Ranges/5"], max_workers=2)
+
+        ranges_service.get_many.assert_called_with(["Ranges/4", "Ranges/5"], 2)
+        self.assertNotIn("Ranges/4", self.index)
+        self.assertEqual(self.index.lookup_ref("10.1.2.130"), "Ranges/3")
+        self.assertEqual(self.index.lookup_ref("10.2.1.1"), "Ranges/5")
+
+    def test_refresh_error(self):
+        ranges_service = Mock()
+        ranges_service.get_many.return_value = (OrderedDict(),
+                                                OrderedDict([("Ranges/4", ValueError())]))
+        with self.assertRaises(ValueError):
+            self.index.refresh(ranges_service, ["Ranges/4"])
+        self.assertIn("Ranges/4", self.index)
+
+    def test_refresh_subranges(self):
+        ranges_service = Mock()
+        ranges_service.ref_or_raise.side_effect = lambda ref: ref
+        ranges_service.get_subranges.return_value = [
+            make_range("Ranges/7", "10.3.0.0", "10.3.0.255", "Ranges/1"),
+            make_range("Ranges/5", "10.2.0.0", "10.2.0.255", "Ranges/1")]
+
+        self.index.refresh_subranges(ranges_service, "Ranges/1")
+
+        for ref in ("Ranges/2", "Ranges/3", "Ranges/4"):
+            self.assertNotIn(ref, self.index)
+        self.assertEqual(self.index.lookup_ref("10.3.0.1"), "Ranges/7")
+        self.assertEqual(self.index.lookup_ref("10.1.2.130"), "Ranges/1")
+        self.assertEqual(len(self.index), 4)
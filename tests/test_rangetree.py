@@ -0,0 +1,127 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from base_test import make_range
+from mock import Mock
+
+import pickle
+import threading
+import time
+
+from menandmice.ipam import Range
+from menandmice.rangetree import RangeTree
+
+
+class FakeRanges(object):
+    # 1 -> 2, 3; 2 -> 4, 5; 3 -> 6; 5 -> 7; 8 (a second root)
+    def __init__(self):
+        self.children = {"Ranges/1": ["Ranges/2", "Ranges/3"],
+                         "Ranges/2": ["Ranges/4", "Ranges/5"],
+                         "Ranges/3": ["Ranges/6"],
+                         "Ranges/5": ["Ranges/7"]}
+        self.parents = dict((child, parent) for parent, children in self.children.items()
+                            for child in children)
+        self.calls = []
+        self.threads = set()
+        self.client = Mock()
+
+    def iter_get(self, **kwargs):
+        return iter([make_range("Ranges/{0}".format(i),
+                                parent_ref=self.parents.get("Ranges/{0}".format(i)))
+                     for i in range(1, 9)])
+
+    def get(self, ref):
+        return [make_range(ref, parent_ref=self.parents.get(ref))]
+
+    def iter_subranges(self, ref):
+        self.calls.append(ref)
+        self.threads.add(threading.current_thread())
+        time.sleep(0.001)
+        return iter([make_range(child, parent_ref=ref) for child in self.children.get(ref, [])])
+
+
+class TestRangeTree(BaseTest):
+
+    def test_crawl(self):
+        ranges = FakeRanges()
+        tree = RangeTree.crawl(ranges, max_workers=4)
+
+        self.assertEqual([node.ref for node in tree.roots], ["Ranges/1", "Ranges/8"])
+        self.assertEqual(len(tree), 8)
+        self.assertEqual([node.ref for node in tree.walk()],
+                         ["Ranges/1", "Ranges/2", "Ranges/4", "Ranges/5", "Ranges/7",
+                          "Ranges/3", "Ranges/6", "Ranges/8"])
+        self.assertEqual(tree["Ranges/7"].depth, 3)
+        self.assertIs(tree["Ranges/7"].parent, tree["Ranges/5"])
+        self.assertEqual([r['ref'] for r in tree.ancestors("Ranges/7")],
+                         ["Ranges/5", "Ranges/2", "Ranges/1"])
+        self.assertEqual([r['ref'] for r in tree.descendants("Ranges/2")],
+                         ["Ranges/4", "Ranges/5", "Ranges/7"])
+        self.assertTrue(all(node.loaded for node in tree.walk()))
+        # every range was asked for its subranges exactly once
+        self.assertEqual(sorted(ranges.calls), sorted(tree.nodes))
+        self.assertGreater(len(ranges.threads), 1)
+
+    def test_crawl_roots_and_depth(self):
+        ranges = FakeRanges()
+        tree = RangeTree.crawl(ranges, roots=["Ranges/2"], max_depth=1)
+
+        self.assertEqual(sorted(tree.nodes), ["Ranges/2", "Ranges/4", "Ranges/5"])
+        self.assertTrue(tree["Ranges/2"].loaded)
+        self.assertFalse(tree["Ranges/5"].loaded)
+        self.assertEqual(ranges.calls, ["Ranges/2"])
+
+    def test_skip_empty(self):
+        ranges = FakeRanges()
+        root = make_range("Ranges/1", childRanges=[])
+        tree = RangeTree.crawl(ranges, roots=[root])
+
+        self.assertEqual(len(tree), 1)
+        self.assertTrue(tree["Ranges/1"].loaded)
+        self.assertEqual(ranges.calls, [])
+
+    def test_refresh_subtree(self):
+        ranges = FakeRanges()
+        tree = RangeTree.crawl(ranges)
+        ranges.children["Ranges/2"] = ["Ranges/4", "Ranges/9"]
+        ranges.calls = []
+
+        tree.refresh_subtree(ranges, "Ranges/2")
+
+        self.assertEqual(sorted(ranges.calls), ["Ranges/2", "Ranges/4", "Ranges/9"])
+        self.assertNotIn("Ranges/5", tree)
+        self.assertNotIn("Ranges/7", tree)
+        self.assertIn("Ranges/9", tree)
+        self.assertIn("Ranges/6", tree)
+        self.assertEqual([node.ref for node in tree["Ranges/2"].children],
+                         ["Ranges/4", "Ranges/9"])
+
+    def test_to_json(self):
+        tree = RangeTree.crawl(FakeRanges(), max_depth=2)
+
+        restored = RangeTree.from_json(tree.to_json())
+
+        self.assertEqual([n.ref for n in restored.walk()], [n.ref for n in tree.walk()])
+        self.assertEqual([n.loaded for n in restored.walk()], [n.loaded for n in tree.walk()])
+        self.assertIsInstance(restored.get("Ranges/5"), Range)
+        self.assertIs(restored["Ranges/5"].parent, restored["Ranges/2"])
+
+    def test_pickle(self):
+        tree = RangeTree.crawl(FakeRanges())
+        restored = pickle.loads(pickle.dumps(tree))
+        self.assertEqual([n.ref for n in restored.walk()], [n.ref for n in tree.walk()])
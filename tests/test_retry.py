@@ -0,0 +1,240 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from mock import Mock, patch
+
+import menandmice
+import requests
+
+from menandmice.retry import CircuitBreaker
+from menandmice.retry import CircuitOpenError
+from menandmice.retry import RetryPolicy
+
+
+def response(status_code, headers=None):
+    resp = Mock()
+    resp.status_code = status_code
+    resp.headers = headers or {}
+    return resp
+
+
+class TestRetryPolicy(BaseTest):
+
+    def setUp(self):
+        super(TestRetryPolicy, self).setUp()
+        self.policy = RetryPolicy(max_retries=3, backoff_factor=1, max_backoff=10)
+        self.policy.sleep = Mock()
+        self.url = self.url_base + "DNSZones"
+
+    def test_no_retry_on_success(self):
+        request = Mock(return_value=response(200))
+
+        result = self.policy.send('GET', self.url, request)
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(request.call_count, 1)
+        self.policy.sleep.assert_not_called()
+
+    def test_retry_status(self):
+        request = Mock(side_effect=[response(503), response(502), response(200)])
+
+        result = self.policy.send('GET', self.url, request)
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(self.policy.sleep.call_count, 2)
+        self.assertEqual(self.policy.stats, {'retries': 2, 'exhausted': 0})
+
+    def test_retry_connection_error(self):
+        request = Mock(side_effect=[requests.exceptions.ConnectionError(), response(200)])
+
+        result = self.policy.send('DELETE', self.url, request)
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(self.policy.stats['retries'], 1)
+
+    def test_retry_exhausted(self):
+        request = Mock(side_effect=requests.exceptions.ConnectionError())
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.policy.send('GET', self.url, request)
+
+        self.assertEqual(request.call_count, 4)
+        self.assertEqual(self.policy.stats, {'retries': 3, 'exhausted': 1})
+
+    def test_retry_exhausted_returns_last_response(self):
+        request = Mock(return_value=response(500))
+
+        result = self.policy.send('PUT', self.url, request)
+
+        self.assertEqual(result.status_code, 500)
+        self.assertEqual(request.call_count, 4)
+
+    def test_no_retry_post(self):
+        request = Mock(side_effect=[response(503), response(201)])
+
+        result = self.policy.send('POST', self.url, request)
+
+        self.assertEqual(result.status_code, 503)
+        self.assertEqual(request.call_count, 1)
+
+    def test_no_retry_client_error(self):
+        request = Mock(side_effect=[response(404), response(200)])
+
+        result = self.policy.send('GET', self.url, request)
+
+        self.assertEqual(result.status_code, 404)
+
+    def test_backoff(self):
+        for attempt in range(8):
+            delay = self.policy.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(10, 2 ** attempt))
+
+    def test_backoff_retry_after(self):
+        self.assertGreaterEqual(self.policy.backoff(0, "5"), 5)
+        self.assertLessEqual(self.policy.backoff(0, "500"), 10)
+        self.assertLessEqual(self.policy.backoff(0, "Wed, 21 Oct 2015 07:28:00 GMT"), 1)
+
+
+class TestCircuitBreaker(BaseTest):
+
+    def setUp(self):
+        super(TestCircuitBreaker, self).setUp()
+        self.now = 1000.0
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        self.breaker.clock = lambda: self.now
+
+    def test_trip(self):
+        for _ in range(2):
+            self.breaker.record_failure('host')
+        self.assertEqual(self.breaker.state('host'), 'closed')
+        self.breaker.before_request('host')
+
+        self.breaker.record_failure('host')
+
+        self.assertEqual(self.breaker.state('host'), 'open')
+        self.assertEqual(self.breaker.state('other'), 'closed')
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request('host')
+        self.assertEqual(self.breaker.stats, {'trips': 1, 'rejected': 1})
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure('host')
+        self.breaker.record_failure('host')
+        self.breaker.record_success('host')
+        self.breaker.record_failure('host')
+        self.assertEqual(self.breaker.state('host'), 'closed')
+
+    def test_half_open(self):
+        for _ in range(3):
+            self.breaker.record_failure('host')
+
+        self.now += 30
+        self.breaker.before_request('host')
+        self.assertEqual(self.breaker.state('host'), 'half-open')
+        # only a single trial request is let through
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request('host')
+
+        self.breaker.record_failure('host')
+        self.assertEqual(self.breaker.state('host'), 'open')
+        self.assertEqual(self.breaker.stats['trips'], 2)
+
+        self.now += 30
+        self.breaker.before_request('host')
+        self.breaker.record_success('host')
+        self.assertEqual(self.breaker.state('host'), 'closed')
+
+    def test_release(self):
+        self.breaker.release('host')
+        self.assertEqual(self.breaker.state('host'), 'closed')
+        for _ in range(3):
+            self.breaker.record_failure('host')
+        self.now += 30
+        self.breaker.before_request('host')
+
+        self.breaker.release('host')
+
+        self.assertEqual(self.breaker.state('host'), 'open')
+        self.assertEqual(self.breaker.stats['trips'], 1)
+        # the next request is let through as the trial
+        self.breaker.before_request('host')
+        self.assertEqual(self.breaker.state('host'), 'half-open')
+
+    def test_policy_fails_fast(self):
+        policy = RetryPolicy(max_retries=10)
+        policy.sleep = Mock()
+        request = Mock(return_value=response(503))
+
+        with self.assertRaises(CircuitOpenError):
+            policy.send('GET', 'http://host/mmws/api/Ranges', request, self.breaker)
+
+        # the circuit opened after 3 failures, no further requests were sent
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(self.breaker.state('host'), 'open')
+
+    def test_policy_other_errors(self):
+        policy = RetryPolicy(max_retries=10)
+        request = Mock(side_effect=requests.exceptions.ChunkedEncodingError())
+        for _ in range(3):
+            self.breaker.record_failure('host')
+        self.now += 30
+
+        # a failed half-open trial re-opens the circuit instead of blocking it
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            policy.send('GET', 'http://host/mmws/api/Ranges', request, self.breaker)
+        self.assertEqual(self.breaker.state('host'), 'open')
+        self.assertEqual(request.call_count, 1)
+
+        self.now += 30
+        policy.send('GET', 'http://host/mmws/api/Ranges', Mock(return_value=response(200)),
+                    self.breaker)
+        self.assertEqual(self.breaker.state('host'), 'closed')
+
+
+class TestClientRetry(BaseTest):
+
+    @patch('menandmice.client.requests.Session')
+    def test_client_retries(self, session):
+        url = self.url_base + "fake"
+        policy = RetryPolicy(max_retries=2)
+        policy.sleep = Mock()
+        client = menandmice.client.Client(self.server,
+                                          self.username,
+                                          self.password,
+                                          retry_policy=policy)
+        ok = response(200)
+        ok.json.return_value = {"result": 1}
+        session.get.side_effect = [response(503), ok]
+        client.session = session
+
+        self.assertEqual(client.get(url), {"result": 1})
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(policy.stats['retries'], 1)
+
+    @patch('menandmice.client.requests.Session')
+    def test_client_default_no_retry(self, session):
+        error = response(503)
+        error.json.return_value = {"error": {"code": 1, "message": "unavailable"}}
+        session.get.return_value = error
+        self.client.session = session
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.client.get(self.url_base + "fake")
+        self.assertEqual(session.get.call_count, 1)
@@ -0,0 +1,91 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+from base_test import block
+from mock import Mock
+
+from menandmice.ipam import GetRangeStatisticsResponse
+from menandmice.ipam import Range
+from menandmice.rangetree import RangeTree
+from menandmice.rollup import UtilizationRollup
+
+
+class TestUtilizationRollup(BaseTest):
+
+    def setUp(self):
+        super(TestUtilizationRollup, self).setUp()
+        # 10.0.0.0/22 with two /24 subnets, one of them with a /26 inside
+        self.tree = RangeTree()
+        self.tree.add(Range({'ref': "Ranges/1", 'from': "10.0.0.0", 'to': "10.0.3.255"}))
+        self.tree.add(Range({'ref': "Ranges/2", 'from': "10.0.0.0", 'to': "10.0.0.255"}),
+                      "Ranges/1")
+        self.tree.add(Range({'ref': "Ranges/3", 'from': "10.0.1.0", 'to': "10.0.1.255"}),
+                      "Ranges/1")
+        self.tree.add(Range({'ref': "Ranges/4", 'from': "10.0.1.0", 'to': "10.0.1.63"}),
+                      "Ranges/3")
+        self.blocks = {
+            # everything outside the subnets is free
+            "Ranges/1": [block("10.0.2.0", "10.0.3.255")],
+            # 100 used
+            "Ranges/2": [block("10.0.0.100", "10.0.0.255")],
+            # 10.0.1.64/26 used, the rest free
+            "Ranges/3": [block("10.0.1.128", "10.0.1.255")],
+            # 4 used
+            "Ranges/4": [block("10.0.1.4", "10.0.1.63")],
+        }
+        self.ranges = Mock()
+        self.ranges.get_available_address_blocks.side_effect = lambda ref: self.blocks[ref]
+        self.rollup = UtilizationRollup(self.ranges, self.tree, max_workers=2)
+
+    def test_rollup(self):
+        stats = self.rollup.rollup()
+
+        self.assertEqual(list(stats), ["Ranges/1"])
+        self.assertEqual(self.rollup.statistics["Ranges/4"],
+                         GetRangeStatisticsResponse(used=4, free=60, numInSubranges=0,
+                                                    percentInSubranges=0.0))
+        self.assertEqual(self.rollup.statistics["Ranges/3"],
+                         GetRangeStatisticsResponse(used=68, free=188, numInSubranges=64,
+                                                    percentInSubranges=25.0))
+        self.assertEqual(self.rollup.statistics["Ranges/2"]['used'], 100)
+        self.assertEqual(stats["Ranges/1"],
+                         GetRangeStatisticsResponse(used=168, free=856, numInSubranges=512,
+                                                    percentInSubranges=50.0))
+        self.assertEqual(self.ranges.get_available_address_blocks.call_count, 4)
+
+    def test_recompute_dirty_branch(self):
+        self.rollup.rollup()
+        self.ranges.get_available_address_blocks.reset_mock()
+        self.blocks["Ranges/4"] = [block("10.0.1.8", "10.0.1.63")]
+
+        self.rollup.mark_dirty("Ranges/4")
+        stats = self.rollup.rollup("Ranges/1")
+
+        self.ranges.get_available_address_blocks.assert_called_once_with("Ranges/4")
+        self.assertEqual(stats['used'], 172)
+        self.assertEqual(self.rollup.statistics["Ranges/3"]['used'], 72)
+        self.assertEqual(self.rollup.statistics["Ranges/2"]['used'], 100)
+
+    def test_set_free_blocks(self):
+        self.rollup.rollup()
+        self.ranges.get_available_address_blocks.reset_mock()
+
+        self.rollup.set_free_blocks("Ranges/2", [block("10.0.0.0", "10.0.0.255")])
+
+        self.assertEqual(self.rollup.rollup("Ranges/1")['used'], 68)
+        self.assertEqual(self.ranges.get_available_address_blocks.call_count, 0)
@@ -0,0 +1,71 @@
+# Licensed to the Encore Technologies ("Encore") under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from base_test import BaseTest
+
+import json
+
+from menandmice.streaming import JSONArrayParser
+from menandmice.streaming import iter_json_array
+
+
+class TestJSONArrayParser(BaseTest):
+
+    def setUp(self):
+        super(TestJSONArrayParser, self).setUp()
+        records = [{"ref": "DNSRecords/{0}".format(i),
+                    "name": u"hést{0}".format(i),
+                    "ttl": i * 1000,
+                    "enabled": True,
+                    "comment": None} for i in range(20)]
+        self.expected = records + [7, 8.25, -1e-05, "x", False, []]
+        self.doc = {"result": {"other": {"dnsRecords": [1], "s": "\"}]"},
+                               "dnsRecords": self.expected,
+                               "totalResults": 26}}
+        self.body = json.dumps(self.doc, indent=2).encode('utf-8')
+
+    def chunks(self, size):
+        return [self.body[i:i + size] for i in range(0, len(self.body), size)]
+
+    def test_all_chunk_sizes(self):
+        for size in range(1, 64):
+            result = list(iter_json_array(self.chunks(size), ('result', 'dnsRecords')))
+            self.assertEqual(result, self.expected, msg="chunk size = {}".format(size))
+
+    def test_feed_returns_completed_elements(self):
+        parser = JSONArrayParser(('result', 'dnsRecords'))
+        self.assertEqual(parser.feed(b'{"result": {"dnsRecords": [{"a": 1}, {"b"'), [{"a": 1}])
+        self.assertEqual(parser.feed(b': 2}, 12'), [{"b": 2}])
+        self.assertEqual(parser.feed(b'3]'), [123])
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.close(), [])
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array([b'{"result": {"ipamRecords": [ ]}}'],
+                                              ('result', 'ipamRecords'))), [])
+
+    def test_missing_key(self):
+        with self.assertRaises(KeyError):
+            list(iter_json_array([b'{"result": {"ranges": []}}'], ('result', 'ipamRecords')))
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"result": {"ranges": [1, 2'], ('result', 'ranges')))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"result": {"ranges": [1 2]}}'], ('result', 'ranges')))
@@ -127,6 +127,34 @@ class TestGroups(BaseTest):
         mock_get.assert_has_calls(expected_get_calls)
         self.assertEquals(results, expected_results)
 
+    @patch("menandmice.users.Groups.get")
+    def test_add_refs_only(self, mock_get):
+        mock_client = Mock()
+        mock_client.baseurl = self.url_base
+        mock_client.post.return_value = {'result': {'objRefs': ["ref1", "ref2"]}}
+
+        obj = Groups(client=mock_client)
+        results = obj.add("test group", refs_only=True)
+
+        mock_get.assert_not_called()
+        self.assertEquals(results, ["ref1", "ref2"])
+
+    @patch("menandmice.users.Groups.get")
+    def test_add_max_workers(self, mock_get):
+        expected_get_refs = ["ref{0}".format(i) for i in range(20)]
+        mock_client = Mock()
+        mock_client.baseurl = self.url_base
+        mock_client.post.return_value = {'result': {'objRefs': expected_get_refs}}
+        mock_get.side_effect = lambda ref: ["get_" + ref]
+
+        obj = Groups(client=mock_client)
+        results = obj.add("test group", max_workers=4)
+
+        self.assertEquals(mock_get.call_count, 20)
+        self.assertEquals(results, ["get_" + ref for ref in expected_get_refs])
+        # every worker thread released its session
+        self.assertEquals(mock_client.release_session.call_count, 4)
+
     @patch("menandmice.users.Groups.make_query_str")
     @patch("menandmice.users.Groups.ref_or_raise")
     def test_get_group_roles(self, mock_ref_or_raise, mock_make_query_str):